@@ -4,4 +4,8 @@ if [[ "${1}" == "celery" ]]; then
   celery --app=tasks.tasks:broker worker -l INFO -c "${TASKS}"
 elif [[ "${1}" == "flower" ]]; then
   celery --app=tasks.tasks:broker flower
+elif [[ "${1}" == "runner" ]]; then
+  python -m tasks.runner
+elif [[ "${1}" == "judge" ]]; then
+  python -m judge.app --port 8888
 fi
\ No newline at end of file
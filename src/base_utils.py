@@ -1,7 +1,7 @@
 import asyncio
 from asyncio import CancelledError, AbstractEventLoop
 from functools import wraps
-from typing import TypeVar, Callable, Coroutine
+from typing import TypeVar, Callable, Coroutine, Iterable, Iterator
 
 from base_schemas import SBase
 from base_models import BaseModel
@@ -74,6 +74,19 @@ def sync_compatible(async_func: Callable[..., Coroutine[T, T, RT]]) -> Callable[
     return wrapper
 
 
+def chunked(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    """Splits iterable into lists of size items, the last one can be shorter"""
+    chunk: list[T] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
 def model_to_pydantic(model: BaseModel, pd_model: TM) -> TM:
     """Converts ORM model to Pydantic model"""
     return pd_model.model_validate(model, from_attributes=True)
@@ -1,3 +1,4 @@
+from contextvars import ContextVar
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
 import logging
 
@@ -15,23 +16,32 @@ async_session_maker: async_sessionmaker = async_sessionmaker(async_engine, expir
 
 
 class DatabaseManager(metaclass=Singleton):
-    """Manages database connection for better performance"""
+    """
+    Manages database connection for better performance.
+    Session is stored per asyncio task, so concurrent tasks of one event loop
+    (ex: several check batches of the checker runner) do not share it
+    """
 
     def __init__(self):
-        self._session: AsyncSession | None = None
+        self._session_var: ContextVar[AsyncSession | None] = ContextVar("db_session", default=None)
         self._session_factory: async_sessionmaker = async_session_maker
 
+    @property
+    def _session(self) -> AsyncSession | None:
+        return self._session_var.get()
+
     async def __aenter__(self) -> AsyncSession:
         logger.info("Enter in context")
-        self._session = self._session_factory()
-        return self._session
+        session: AsyncSession = self._session_factory()
+        self._session_var.set(session)
+        return session
 
     async def __aexit__(self, exc_type, exc, tb) -> None:
         if isinstance(exc_type, Exception):
             await self.rollback()
 
         await self._session.close()
-        self._session = None
+        self._session_var.set(None)
         logger.info("Exit from context")
 
     async def commit(self) -> None:
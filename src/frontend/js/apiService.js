@@ -52,6 +52,51 @@ export class ApiService {
     });
     }
 
+    /**
+     * Reads objects streamed by server as NDJSON (one json per line) while they arrive,
+     * so the whole response is never buffered in browser
+     * @param url relative url with output=ndjson
+     * @param onRows called with list of objects parsed from every received chunk
+     * @returns {Promise<number|null>} amount of received objects, null on error
+     */
+    static async requestNdjson(url, onRows) {
+        let received = 0;
+
+        try {
+            const response = await fetch(url, {headers: {"Accept": "application/x-ndjson"}});
+            if (!response.ok) {
+                throw new Error(`Status: ${response.status}`);
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            // incomplete line at the end of chunk waits for the next one
+            let tail = "";
+
+            while (true) {
+                const {done, value} = await reader.read();
+                tail += done ? decoder.decode() : decoder.decode(value, {stream: true});
+
+                const lines = tail.split("\n");
+                tail = done ? "" : lines.pop();
+
+                const rows = lines.filter((line) => line !== "").map((line) => JSON.parse(line));
+                if (rows.length > 0) {
+                    received += rows.length;
+                    onRows(rows);
+                }
+
+                if (done) {
+                    return received;
+                }
+            }
+        } catch (error) {
+            console.log(error);
+            Alert.error("Something went wrong...");
+            return null;
+        }
+    }
+
     static handleError(err) {
         /**
          * err - response from server or in-code error
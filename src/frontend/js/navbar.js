@@ -27,6 +27,27 @@ export class Navbar {
                 return e;
             }
 
+            // listings are streamed, so the whole table is not sent in one json response,
+            // rows are added to textarea as they arrive
+            if (url.includes("output=ndjson")) {
+                this.outputTextarea.clear();
+
+                ApiService.requestNdjson(url, (rows) => {
+                    this.outputTextarea.addLines(rows.map((p) => Formatter.objToUrl(p)));
+                })
+                    .then((received) => {
+                        if (received === null) {
+                            return;
+                        }
+                        if (received > 0) {
+                            Alert.success("Done.");
+                        } else {
+                            Alert.warning("There are no proxies in database");
+                        }
+                    });
+                return;
+            }
+
             ApiService.request(url, '', "GET")
                 .then((data) => {
                     if (data.length > 0) {
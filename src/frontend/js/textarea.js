@@ -26,9 +26,8 @@ export class Textarea {
      * @param lines lines to insert
      */
     addLines(lines) {
-        for (const line of lines) {
-            this.addLine(line);
-        }
+        // one update of textarea for all lines
+        this.$elem.val(this.$elem.val() + lines.map((line) => `${line}\n`).join(""));
     }
 
     /**
@@ -0,0 +1,80 @@
+############################################################################
+# Lightweight judge server for http(s) checks.
+# Echoes request headers and caller's ip, so checker can verify that proxy
+# actually forwarded the request. Run it next to the workers:
+# $ python -m judge.app --port 8888
+# and put its public url into checker.yaml judges list
+############################################################################
+
+import argparse
+import logging
+import ssl
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# payload of throughput checks is sent by chunks of preallocated zeros
+BYTES_CHUNK = bytes(64 * 1024)
+MAX_BYTES = 100 * 1024 * 1024
+
+
+async def echo(request: web.Request) -> web.Response:
+    """Returns httpbin-like json with headers and ip of the caller (proxy ip if request was proxied)"""
+    return web.json_response({
+        "args": dict(request.query),
+        "headers": dict(request.headers),
+        "origin": request.remote,
+        "url": str(request.url),
+    })
+
+
+async def stream_bytes(request: web.Request) -> web.StreamResponse:
+    """Streams n zero bytes, used by throughput checks (see checker_config["throughput"])"""
+    try:
+        size: int = int(request.match_info["n"])
+    except ValueError:
+        raise web.HTTPBadRequest(text="n must be integer")
+
+    if not 0 <= size <= MAX_BYTES:
+        raise web.HTTPBadRequest(text=f"n must be between 0 and {MAX_BYTES}")
+
+    response: web.StreamResponse = web.StreamResponse(headers={"Content-Type": "application/octet-stream"})
+    response.content_length = size
+    await response.prepare(request)
+
+    while size > 0:
+        chunk: bytes = BYTES_CHUNK if size >= len(BYTES_CHUNK) else BYTES_CHUNK[:size]
+        await response.write(chunk)
+        size -= len(chunk)
+
+    await response.write_eof()
+    return response
+
+
+def create_app() -> web.Application:
+    app: web.Application = web.Application()
+    app.router.add_get("/get", echo)
+    app.router.add_get("/ip", echo)
+    app.router.add_get("/bytes/{n}", stream_bytes)
+    return app
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Judge server for proxy checks")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--certfile", default=None, help="enables https if set together with --keyfile")
+    parser.add_argument("--keyfile", default=None)
+    args: argparse.Namespace = parser.parse_args()
+
+    ssl_context: ssl.SSLContext | None = None
+    if args.certfile and args.keyfile:
+        ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ssl_context.load_cert_chain(args.certfile, args.keyfile)
+
+    # access log is disabled, because every check makes a request
+    web.run_app(create_app(), host=args.host, port=args.port, ssl_context=ssl_context, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+############################################################################
+# Bulk import of big proxy dumps (millions of lines).
+# Parsed rows are streamed into temporary staging table by COPY (asyncpg copy_records_to_table),
+# then staging table is merged into proxy table by one INSERT ... SELECT ... ON CONFLICT statement.
+# Imported proxies are not checked, start check with /proxies/continue_check
+#
+# Usage: cd src && python -m proxy_processing.bulk_import dump.txt [--chunk-size 10000]
+############################################################################
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import AsyncIterable, AsyncIterator, Any, Callable, Awaitable
+
+from sqlalchemy import Table, Column, MetaData, String, Boolean, select, func, or_, not_, literal_column, Select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from database import db_manager
+from proxy_processing.models import ProxyModel
+from proxy_processing.repository import PROXY_KEY_COLUMNS, PROTOCOL_COLUMNS, proxy_key
+from proxy_processing.utils import parse_proxy_dict_from_string
+
+logger = logging.getLogger(__name__)
+
+# rows in one COPY
+COPY_CHUNK_SIZE = 10000
+
+STAGING_COLUMNS: tuple[str, ...] = (*PROXY_KEY_COLUMNS, *PROTOCOL_COLUMNS)
+
+# staging table lives until the end of import transaction, it has own metadata,
+# so it is never created by migrations
+staging_table: Table = Table(
+    "proxy_import",
+    MetaData(),
+    Column("ip", String(length=253)),
+    Column("port", String(length=5)),
+    Column("username", String(length=256)),
+    Column("password", String(length=256)),
+    *(Column(p, Boolean) for p in PROTOCOL_COLUMNS),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+
+def to_record(line: str) -> tuple | None:
+    """Converts proxy string to staging row, None if it is invalid"""
+    if isinstance(proxy := parse_proxy_dict_from_string(line), str):
+        return
+
+    return *proxy_key(proxy), *(True if proxy.get(p) else None for p in PROTOCOL_COLUMNS)
+
+
+def build_merge() -> Select:
+    """
+    Builds one statement which merges staging table into proxy table:
+    duplicates of dump are grouped, new proxies are inserted,
+    existing proxies get new protocols (known ones are kept, unchanged rows are not written).
+    Returns amount of inserted and updated rows
+    """
+    table: Table = ProxyModel.__table__
+
+    grouped: Select = select(
+        *(staging_table.c[name] for name in PROXY_KEY_COLUMNS),
+        *(func.bool_or(staging_table.c[p]).label(p) for p in PROTOCOL_COLUMNS),
+        func.timezone("utc", func.now()).label("added_at"),
+    ).group_by(*(staging_table.c[name] for name in PROXY_KEY_COLUMNS))
+
+    insert = pg_insert(table).from_select([*STAGING_COLUMNS, "added_at"], grouped)
+    merged = insert.on_conflict_do_update(
+        index_elements=list(PROXY_KEY_COLUMNS),
+        set_={p: func.coalesce(insert.excluded[p], table.c[p]) for p in PROTOCOL_COLUMNS},
+        where=or_(*(insert.excluded[p] & table.c[p].is_not(True) for p in PROTOCOL_COLUMNS)),
+    ).returning(
+        # xmax of just inserted row is 0
+        literal_column("xmax = 0").label("inserted")
+    ).cte("merged")
+
+    return select(
+        func.count().filter(merged.c.inserted).label("new"),
+        func.count().filter(not_(merged.c.inserted)).label("updated"),
+    )
+
+
+async def copy_records(connection: AsyncConnection, records: list[tuple]) -> None:
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        staging_table.name, records=records, columns=STAGING_COLUMNS
+    )
+
+
+async def import_lines(lines: AsyncIterable[str], chunk_size: int = COPY_CHUNK_SIZE) -> dict[str, int]:
+    """
+    Imports proxies in one transaction, only chunk_size parsed rows are kept in memory
+    :param lines: proxy strings, empty lines are skipped
+    :return: {"new": int, "updated": int, "invalid": int}
+    """
+    invalid: int = 0
+    records: list[tuple] = []
+    started_at: float = time.perf_counter()
+
+    async with db_manager as session:
+        connection: AsyncConnection = await session.connection()
+        await connection.run_sync(staging_table.create)
+
+        async for line in lines:
+            if not (line := line.strip()):
+                continue
+
+            if (record := to_record(line)) is None:
+                invalid += 1
+                continue
+
+            records.append(record)
+            if len(records) >= chunk_size:
+                await copy_records(connection, records)
+                records = []
+
+        if records:
+            await copy_records(connection, records)
+
+        counts: dict[str, Any] = dict((await session.execute(build_merge())).mappings().one())
+        await session.commit()
+
+    counts["invalid"] = invalid
+    logger.info(f"Imported proxies in {time.perf_counter() - started_at:.1f}s: {counts}")
+    return counts
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Splits stream of bytes into lines, so file is never read into memory as a whole"""
+    tail: bytes = b""
+    async for chunk in chunks:
+        *lines, tail = (tail + chunk).split(b"\n")
+        for line in lines:
+            yield line.decode(errors="replace")
+
+    if tail:
+        yield tail.decode(errors="replace")
+
+
+async def read_chunks(read: Callable[[int], Awaitable[bytes]], size: int = 1 << 20) -> AsyncIterator[bytes]:
+    """
+    Reads stream by chunks of size bytes
+    :param read: async read function of file, ex: UploadFile.read
+    """
+    while chunk := await read(size):
+        yield chunk
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Bulk import of proxy dump")
+    parser.add_argument("path", help="text file with one proxy per line")
+    parser.add_argument("--chunk-size", type=int, default=COPY_CHUNK_SIZE, help="rows in one COPY")
+    args: argparse.Namespace = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    with open(args.path, "rb") as file:
+        lines: AsyncIterator[str] = iter_lines(read_chunks(lambda size: asyncio.to_thread(file.read, size)))
+        counts: dict[str, int] = asyncio.run(import_lines(lines, args.chunk_size))
+
+    print(f"new: {counts['new']}, updated: {counts['updated']}, invalid: {counts['invalid']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,22 @@
 import asyncio
+import random
 import struct
 import traceback
 from functools import partial
 from typing import Coroutine
 import logging
+import time
 import aiohttp
-from aiohttp_proxy import ProxyConnector
 
 from configs.config import checker_config
-from proxy_processing.utils import on_timeout, mark_and_measure_latency
+from proxy_processing.utils import on_timeout, mark_and_measure_latency, mark_phase
+from proxy_processing.timeouts import get_adaptive_timeout
+from proxy_processing.retry import CheckFailed, Outcome
 from proxy_processing.models import Protocol, ProxyModel
+from proxy_processing.context import CheckerContext, checker_context
+from proxy_processing.stats import checker_stats
+from proxy_processing.dns import dns_cache, format_host
+from proxy_processing import socks_engine
 from base_utils import sync_compatible
 
 SOCKS4_REQUEST_GRANTED = 0x5A
@@ -25,15 +32,26 @@ SOCKS5_ATYP_DOMAINNAME = 0x03
 SOCKS5_ATYP_IPV6 = 0x04
 SOCKS5_REPLY_SUCCEEDED = 0x00
 
+# SOCKS5 greeting (no auth) followed by empty line.
+# socks5 server answers greeting, socks4 server rejects unknown version,
+# http server can not parse request line and answers with status line
+SNIFF_PROBE = b"\x05\x01\x00\r\n\r\n"
+SNIFF_SOCKS4_REPLY_VERSION = 0x00
+
 logger = logging.getLogger(__name__)
 
+# result of check function, see mark_and_measure_latency
+CheckResult = tuple[bool, str, float, dict[str, float]]
+
 
-class UnsupportedError(Exception):
+class UnsupportedError(CheckFailed):
     """Custom class for handling various errors during bytes check"""
-    pass
 
+    def __init__(self, details: str = ""):
+        super().__init__(Outcome.protocol_mismatch, details)
 
-@on_timeout(timeout=checker_config["timeout"], retries=checker_config["retries"])
+
+@on_timeout(timeout=get_adaptive_timeout("socks4"), retries=checker_config["retries"])
 @mark_and_measure_latency("socks4")
 async def check_socks4_proxy(
         host: str,
@@ -59,6 +77,7 @@ async def check_socks4_proxy(
     try:
         # open connection with proxy server
         reader, writer = await asyncio.open_connection(host, port)
+        mark_phase("connect")
 
         # create field UserID
         user_id = b""
@@ -77,6 +96,7 @@ async def check_socks4_proxy(
 
         # get response
         response = await reader.read(8)
+        mark_phase("handshake")
 
         if len(response) < 2:
             # not enough data to read the status
@@ -92,16 +112,15 @@ async def check_socks4_proxy(
 
         return status == SOCKS4_REQUEST_GRANTED
 
-    except asyncio.TimeoutError:
-        return False
-    except (ConnectionRefusedError, OSError):
-        return False
+    except (asyncio.TimeoutError, OSError):
+        # classified and retried by on_timeout
+        raise
     except Exception:
         logger.exception(f"Error with proxy socks4://{host}:{port}")
         return False
 
 
-@on_timeout(timeout=checker_config["timeout"], retries=checker_config["retries"])
+@on_timeout(timeout=get_adaptive_timeout("socks5"), retries=checker_config["retries"])
 @mark_and_measure_latency("socks5")
 async def check_socks5_proxy(host: str, port: int, username=None, password=None) -> bool:
     """
@@ -132,6 +151,7 @@ async def check_socks5_proxy(host: str, port: int, username=None, password=None)
     try:
         # create connection to proxy server
         reader, writer = await asyncio.open_connection(host, port)
+        mark_phase("connect")
 
         # send SOCKS5 hello
         if username and password:
@@ -165,7 +185,7 @@ async def check_socks5_proxy(host: str, port: int, username=None, password=None)
             auth_response = await reader.read(2)
             auth_version, auth_status = struct.unpack("!BB", auth_response)
             if auth_status != 0:
-                raise UnsupportedError("Auth error")
+                raise CheckFailed(Outcome.auth_failure, "Auth error")
 
         elif chosen_auth != SOCKS5_AUTH_NONE:
             raise UnsupportedError("Unsupported auth method")
@@ -180,6 +200,7 @@ async def check_socks5_proxy(host: str, port: int, username=None, password=None)
 
         # get response
         response = await reader.read(4)
+        mark_phase("handshake")
         version, reply, _, _ = struct.unpack("!BBBB", response)
 
         if version != SOCKS5_VERSION:
@@ -204,108 +225,359 @@ async def check_socks5_proxy(host: str, port: int, username=None, password=None)
 
         return reply == SOCKS5_REPLY_SUCCEEDED
 
-    except asyncio.TimeoutError:
-        return False
-    except (ConnectionRefusedError, OSError, UnsupportedError, struct.error):
-        return False
+    except (asyncio.TimeoutError, OSError, CheckFailed):
+        # classified and retried by on_timeout
+        raise
+    except struct.error:
+        raise UnsupportedError("Malformed socks5 response")
     except Exception:
         logger.exception(f"Error with proxy socks5://{host}:{port}")
         return False
 
 
-@on_timeout(timeout=checker_config["timeout"], retries=checker_config["retries"])
+# the first attempt of pre-filter is required, otherwise every proxy is unreachable
+if checker_config["prefilter_retries"] < 1:
+    raise ValueError(f"prefilter_retries must be at least 1, got {checker_config['prefilter_retries']}")
+
+# socks checkers of selected engine, streams based checkers above are the fallback
+if checker_config["socks_engine"] == "protocol":
+    socks4_checker, socks5_checker = socks_engine.check_socks4_proxy, socks_engine.check_socks5_proxy
+else:
+    socks4_checker, socks5_checker = check_socks4_proxy, check_socks5_proxy
+
+
+def choose_judge(protocol: str) -> tuple[str, bool]:
+    """
+    Returns url of random judge of protocol from checker_config["judges"]
+    and whether its certificate is verified
+    Judge is url string or mapping {"url": str, "verify": bool}, ex: self-signed local judge
+    """
+    judge: str | dict = random.choice(checker_config["judges"][protocol])
+    if isinstance(judge, str):
+        return judge, True
+
+    return judge["url"], judge.get("verify", True)
+
+
 async def check_http_proxy(
         host: str,
         port: int,
         username: str = None,
         password: str = None,
-        secured: bool = False
+        secured: bool = False,
+        context: CheckerContext = checker_context
 ) -> bool:
     """
-    http(s) proxy checker function. Tries to get http(s)://httpbin.org/get
+    http(s) proxy checker function. Tries to get url of random judge from checker_config["judges"] (see choose_judge)
+    Uses long-lived session from checker context instead of creating a new one on every attempt
+    Phases are marked by trace callbacks of the session (see CheckerContext):
+        * connect - connection to proxy, for https it includes CONNECT tunnel and TLS handshake
+        * ttfb - from established connection to response headers
     """
     protocol = "https" if secured else "http"
 
-    proxy_url = f"{protocol}://{host}:{port}"
+    # http and https proxies are both accessed by http, https one is checked by CONNECT tunnel to https url
+    proxy_url = f"http://{format_host(host)}:{port}"
+    proxy_auth: aiohttp.BasicAuth | None = None
     if username and password:
-        proxy_url = f"{protocol}://{username}:{password}@{host}:{port}"
+        proxy_auth = aiohttp.BasicAuth(username, password)
 
-    async with aiohttp.ClientSession(connector=ProxyConnector.from_url(proxy_url)) as session:
-        try:
-            # add custom header to test that http proxy actually proxies our request or just return its own
-            async with session.get(
-                    f"{protocol}://httpbin.org/get",
-                    headers={"X-Test": "check me"},
-                    timeout=5
-            ) as response:
-                if response.status == 200:
-                    # if it's bugged or some unknown gateway
-                    return "check me" in await response.text()
-                else:
-                    return False
-        except (aiohttp.ClientError, asyncio.TimeoutError):
-            return False
-        except Exception:
-            logger.exception(f"Error with proxy {protocol}://{host}:{port}")
-            return False
+    judge_url, verify = choose_judge(protocol)
+
+    try:
+        # add custom header to test that http proxy actually proxies our request or just return its own
+        async with context.session.get(
+                judge_url,
+                proxy=proxy_url,
+                proxy_auth=proxy_auth,
+                headers={"X-Test": "check me"},
+                # True - SSL context of the session
+                ssl=verify
+        ) as response:
+            if response.status == 200:
+                # if it's bugged or some unknown gateway
+                return "check me" in await response.text()
+            elif response.status == 407:
+                raise CheckFailed(Outcome.auth_failure, "Proxy authentication required")
+            else:
+                return False
+    except (aiohttp.ClientError, asyncio.TimeoutError, OSError, CheckFailed):
+        # classified and retried by on_timeout
+        raise
+    except Exception:
+        logger.exception(f"Error with proxy {protocol}://{host}:{port}")
+        return False
 
 
 # register both variations of the same function
-check_https_proxy = mark_and_measure_latency("https")(
-    partial(
-        check_http_proxy,
-        secured=True)
+# every protocol has its own timeout, so decorators are applied separately
+check_https_proxy = on_timeout(timeout=get_adaptive_timeout("https"), retries=checker_config["retries"])(
+    mark_and_measure_latency("https")(
+        partial(
+            check_http_proxy,
+            secured=True)
+    )
+)
+check_http_proxy = on_timeout(timeout=get_adaptive_timeout("http"), retries=checker_config["retries"])(
+    mark_and_measure_latency("http")(check_http_proxy)
 )
-check_http_proxy = mark_and_measure_latency("http")(check_http_proxy)
 
 
-@sync_compatible
-async def check_proxy(proxy_model: ProxyModel) -> ProxyModel:
-    """Runs checks on proxy, updates database and returns updated ProxyModel"""
-    if proxy_model.protocols_list:
-        protocols: list[str] = proxy_model.protocols_list
+async def open_reachable(host: str, port: int) -> tuple[asyncio.StreamReader, asyncio.StreamWriter] | None:
+    """
+    Cheap connect-only pre-filter. Most of imported proxies are dead,
+    so we drop them with short timeout before running protocol handshakes.
+    Refused connection is final, only timeouts are retried.
+    Opened connection is returned, so it can be reused by sniff_protocols
+    :param host: ip string
+    :param port: port integer
+    :return: connection (reader, writer) if proxy accepted it, None if proxy is unreachable
+    """
+    checker_stats.incr("prefilter:checked")
+
+    for attempt in range(checker_config["prefilter_retries"]):
+        if attempt:
+            checker_stats.incr("prefilter:retries")
+
+        try:
+            connection: tuple[asyncio.StreamReader, asyncio.StreamWriter] = await asyncio.wait_for(
+                asyncio.open_connection(host, port),
+                checker_config["prefilter_timeout"]
+            )
+        except asyncio.TimeoutError:
+            checker_stats.incr("prefilter:timeouts")
+            continue
+        except (ConnectionRefusedError, OSError):
+            checker_stats.incr("prefilter:refused")
+            break
+
+        checker_stats.incr("prefilter:reachable")
+        return connection
+
+    checker_stats.incr("prefilter:unreachable")
+
+
+async def check_reachable(host: str, port: int) -> bool:
+    """
+    Connect-only pre-filter (see open_reachable), connection is closed immediately
+    :return: True if proxy accepted TCP connection
+    """
+    if (connection := await open_reachable(host, port)) is None:
+        return False
+
+    connection[1].close()
+    return True
+
+
+async def sniff_protocols(
+        host: str,
+        port: int,
+        connection: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None = None
+) -> list[str]:
+    """
+    Guesses protocol of proxy using only one connection instead of running all checkers.
+    Sends SNIFF_PROBE and classifies endpoint by the first bytes of reply:
+        * 0x05 = socks5 method selection reply
+        * 0x00 = socks4 reply (VN is always 0x00)
+        * HTTP/ = http status line, proxy can be http or https (CONNECT)
+    Result is only a hint: protocol family which answered, other protocols of the same port are
+    checked by check_proxy if this family works
+    :param host: ip string
+    :param port: port integer
+    :param connection: not used connection to proxy (ex: from open_reachable), it is closed after sniff
+    :return: list of protocols to check first, all protocols if endpoint was not classified,
+        empty list if connection was refused
+    """
+    all_protocols: list[str] = [p.value for p in list(Protocol)]
+
+    if connection is not None:
+        reader, writer = connection
     else:
-        protocols: list[str] = [p.value for p in list(Protocol)]
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), checker_config["timeout"])
+        except asyncio.TimeoutError:
+            return all_protocols
+        except (ConnectionRefusedError, OSError):
+            # nobody listens, so full checks will fail too
+            return []
 
-    # create params for checker functions
-    params = {
-        "host": proxy_model.ip,
-        "port": int(proxy_model.port),
-    }
+    try:
+        writer.write(SNIFF_PROBE)
+        await writer.drain()
 
-    # optional
-    if proxy_model.username != "":
-        params["username"] = proxy_model.username
-        params["password"] = proxy_model.password
+        response: bytes = await asyncio.wait_for(reader.read(16), checker_config["timeout"])
+    except (asyncio.TimeoutError, ConnectionError, OSError):
+        response = b""
+    finally:
+        writer.close()
+
+    if response.startswith(b"HTTP/"):
+        return [Protocol.http.value, Protocol.https.value]
+    elif len(response) >= 2 and response[0] == SOCKS5_VERSION:
+        return [Protocol.socks5.value]
+    elif len(response) >= 2 and response[0] == SNIFF_SOCKS4_REPLY_VERSION:
+        return [Protocol.socks4.value]
+
+    # closed without answer or unknown reply, so we can not guess
+    logger.debug(f"Failed to sniff protocol of {host}:{port}, reply: {response!r}")
+    return all_protocols
 
+
+async def measure_throughput(
+        proxy_model: ProxyModel,
+        host: str,
+        protocol: str,
+        context: CheckerContext = checker_context
+) -> float | None:
+    """
+    Downloads payload from checker_config["throughput"]["url"] through working protocol of alive proxy.
+    http(s) proxies use shared session of checker context, socks ones get session from context too
+    (see CheckerContext.create_socks_session).
+    Only body transfer is timed, so latency of proxy does not affect the result
+    :param host: address of proxy resolved by dns_cache
+    :param protocol: protocol which passed the check
+    :return: bytes/s or None if download failed
+    """
+    throughput_config: dict = checker_config["throughput"]
+    proxy_address: str = f"{proxy_model.credentials}{format_host(host)}:{proxy_model.port}"
+
+    # session of socks proxy is closed after download
+    socks: bool = protocol in (Protocol.socks4.value, Protocol.socks5.value)
+
+    if socks:
+        session: aiohttp.ClientSession = context.create_socks_session(f"{protocol}://{proxy_address}")
+        request_params: dict = {}
+    else:
+        session: aiohttp.ClientSession = context.session
+        request_params: dict = {"proxy": f"http://{format_host(host)}:{proxy_model.port}"}
+        if proxy_model.username:
+            request_params["proxy_auth"] = aiohttp.BasicAuth(proxy_model.username, proxy_model.password)
+
+    size: int = 0
+    try:
+        async with asyncio.timeout(throughput_config["timeout"]):
+            async with session.get(throughput_config["url"], **request_params) as response:
+                if response.status != 200:
+                    checker_stats.incr("throughput:failed")
+                    return
+
+                started_at: float = time.perf_counter()
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    size += len(chunk)
+                elapsed: float = time.perf_counter() - started_at
+    except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+        logger.debug(f"Failed to measure throughput of {proxy_model} after {size} bytes: {e!r}")
+        checker_stats.incr("throughput:failed")
+        return
+    finally:
+        if socks:
+            await session.close()
+
+    checker_stats.incr("throughput:measured")
+    return size / max(elapsed, 1e-6)
+
+
+async def run_checks(protocols: list[str], params: dict, context: CheckerContext) -> list[CheckResult | Exception]:
+    """
+    Runs checks of protocols together
+    :param params: host, port and optional username, password of proxy
+    :return: results of checks or exceptions raised by them
+    """
     # creating coro pool with checkers
     background_tasks: list[Coroutine] = []
 
     if protocols.count("http"):
-        background_tasks.append(check_http_proxy(**params))
+        background_tasks.append(check_http_proxy(**params, context=context))
 
     if protocols.count("https"):
-        background_tasks.append(check_https_proxy(**params))
+        background_tasks.append(check_https_proxy(**params, context=context))
 
     if protocols.count("socks4"):
-        background_tasks.append(check_socks4_proxy(**params))
+        background_tasks.append(socks4_checker(**params))
 
     if protocols.count("socks5"):
-        background_tasks.append(check_socks5_proxy(**params))
+        background_tasks.append(socks5_checker(**params))
+
+    # ex: (True, 'socks4', 0.27976512908935547, {'connect': 0.1, 'handshake': 0.17})
+    # which means that check function succeed to connect via socks4 proto with 0.279... seconds latency
+    return await asyncio.gather(*background_tasks, return_exceptions=True)
+
+
+@sync_compatible
+async def check_proxy(proxy_model: ProxyModel, context: CheckerContext = checker_context) -> ProxyModel:
+    """
+    Runs checks on proxy, updates database and returns updated ProxyModel
+    :param proxy_model: proxy to check
+    :param context: long-lived resources of the worker (http session, SSL context)
+    """
+    # hostname is resolved once for all protocol checks and their retries
+    try:
+        host: str | None = await dns_cache.resolve(proxy_model.ip)
+    except OSError as e:
+        logger.debug(f"{proxy_model} {e}")
+        host: str | None = None
+
+    # protocols checked only if one of `protocols` works
+    rest: list[str] = []
+
+    # connection of pre-filter, sniff reuses it instead of connecting again
+    connection: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None = None
+    if host is not None and checker_config["prefilter"]:
+        connection = await open_reachable(host, int(proxy_model.port))
+
+    if host is None:
+        # proxy can not be reached without address
+        protocols: list[str] = []
+    elif checker_config["prefilter"] and connection is None:
+        # nobody answers, so protocol checks are useless
+        protocols: list[str] = []
+    elif proxy_model.protocols_list:
+        protocols: list[str] = proxy_model.protocols_list
+    elif checker_config["sniff"]:
+        # one connection to find out protocol family, it is checked first.
+        # One port can serve several protocols, so the rest are checked if the family works
+        protocols: list[str] = await sniff_protocols(host, int(proxy_model.port), connection)
+        rest: list[str] = [p.value for p in list(Protocol) if protocols and p.value not in protocols]
+    else:
+        protocols: list[str] = [p.value for p in list(Protocol)]
+
+    if connection is not None:
+        # protocol checks open their own connections
+        connection[1].close()
+
+    # create params for checker functions
+    params = {
+        "host": host,
+        "port": int(proxy_model.port),
+    }
+
+    # optional
+    if proxy_model.username != "":
+        params["username"] = proxy_model.username
+        params["password"] = proxy_model.password
 
     # run together all coroutines
     logger.debug(f"Run {protocols} for {proxy_model}")
-    # ex: (True, 'socks4', 0.27976512908935547)
-    # which means that check function succeed to connect via socks4 proto with 0.279... seconds latency
-    result: list[tuple[bool, str, float] | Exception] = await asyncio.gather(*background_tasks, return_exceptions=True)
+    result: list[CheckResult | Exception] = await run_checks(protocols, params, context)
+
+    if rest and any(isinstance(r, tuple) and r[0] for r in result):
+        logger.debug(f"Run {rest} for {proxy_model}")
+        result += await run_checks(rest, params, context)
 
     logger.debug(f"Got result {result} for {proxy_model}")
 
     working_protocols: list[str] = []
+
+    # the fastest successful check, latency and phases of one check are stored together
+    fastest: CheckResult | None = None
+
     for r in result:
         if isinstance(r, TimeoutError):
             logger.debug(f"{proxy_model} Timeout")
             continue
+        elif isinstance(r, CheckFailed):
+            logger.debug(f"{proxy_model} check failed: {r.outcome.value}")
+            continue
         elif isinstance(r, Exception):
             tb_str = traceback.format_exception(etype=type(r), value=r, tb=r.__traceback__)
             traceback_str = "".join(tb_str)
@@ -313,22 +585,38 @@ async def check_proxy(proxy_model: ProxyModel) -> ProxyModel:
             continue
 
         assert type(r) is tuple
-        assert len(r) == 3
+        assert len(r) == 4
 
-        # Ex: ("socks4", True)
+        # Ex: (True, "socks4", 100.0, {"connect": 40.0, "handshake": 60.0})
         if r[0]:
             working_protocols.append(r[1])
-            # sets minimal latency
-            proxy_model.latency = r[2] if proxy_model.latency is None else min(proxy_model.latency, r[2])
+            if fastest is None or r[2] < fastest[2]:
+                fastest = r
+
+    if fastest is not None:
+        # ex: {"connect": 40.0, "handshake": 60.0}, http(s) checks have ttfb instead of handshake
+        phases: dict[str, float] = fastest[3]
+
+        proxy_model.latency = fastest[2]
+        proxy_model.connect_time = phases.get("connect")
+        proxy_model.handshake_time = phases.get("handshake")
+        proxy_model.ttfb = phases.get("ttfb")
+    else:
+        proxy_model.connect_time = proxy_model.handshake_time = proxy_model.ttfb = None
 
     # update proxy status
     if working_protocols:
         proxy_model.protocols_list = working_protocols
         proxy_model.status = "alive"
 
+        # bandwidth is measured only for alive proxies, it is much more expensive than liveness check
+        if checker_config["throughput"]["enabled"]:
+            proxy_model.throughput = await measure_throughput(proxy_model, host, fastest[1], context)
+
     else:
         proxy_model.status = "dead"
         proxy_model.protocols_list = []
+        proxy_model.throughput = None
 
     logger.debug(f"Working protocols for {proxy_model.credentials_ip_port} are {proxy_model.protocols_list}")
     return proxy_model
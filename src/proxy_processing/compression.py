@@ -0,0 +1,90 @@
+import asyncio
+import zlib
+from typing import AsyncIterable, AsyncIterator
+
+import brotli
+
+# supported content encodings in order of preference, brotli is better for text files
+ENCODINGS: tuple[str, ...] = ("br", "gzip")
+IDENTITY = "identity"
+
+# brotli quality 11 (default) is too slow for streaming, 5 is close to it for text and many times faster
+BROTLI_QUALITY = 5
+GZIP_LEVEL = 6
+
+
+def choose_encoding(accept_encoding: str | None) -> str:
+    """
+    Chooses encoding from Accept-Encoding header, ex: "gzip, deflate, br;q=0.9"
+    Encoding with the highest q wins, equal ones are chosen in order of ENCODINGS
+    :return: "br", "gzip" or "identity"
+    """
+    if not accept_encoding:
+        return IDENTITY
+
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, *params = (part.strip() for part in item.split(";"))
+        weight: float = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.lower()] = weight
+
+    candidates: list[tuple[float, int, str]] = []
+    for index, encoding in enumerate(ENCODINGS):
+        weight: float = weights.get(encoding, weights.get("*", 0.0))
+        if weight > 0:
+            candidates.append((weight, -index, encoding))
+
+    return max(candidates)[2] if candidates else IDENTITY
+
+
+class StreamCompressor:
+    """Incremental compressor, output of every chunk can be sent immediately"""
+
+    def __init__(self, encoding: str):
+        self.encoding: str = encoding
+
+        if encoding == "br":
+            self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+        elif encoding == "gzip":
+            # wbits 16 + 15 writes gzip header and trailer
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        elif encoding == IDENTITY:
+            self._compressor = None
+        else:
+            raise ValueError(f"Unknown encoding: {encoding}")
+
+    def compress(self, data: bytes) -> bytes:
+        if self._compressor is None:
+            return data
+        if self.encoding == "br":
+            # flush makes compressed data of this chunk available to client
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self._compressor is None:
+            return b""
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+async def compress_stream(chunks: AsyncIterable[bytes], encoding: str) -> AsyncIterator[bytes]:
+    """Compresses chunks in worker thread, so event loop is not blocked by compression"""
+    compressor: StreamCompressor = StreamCompressor(encoding)
+
+    async for chunk in chunks:
+        if encoding == IDENTITY:
+            yield chunk
+        elif compressed := await asyncio.to_thread(compressor.compress, chunk):
+            yield compressed
+
+    if tail := compressor.finish():
+        yield tail
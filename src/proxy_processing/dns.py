@@ -0,0 +1,120 @@
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+
+from configs.config import checker_config
+from proxy_processing.stats import checker_stats
+
+logger = logging.getLogger(__name__)
+
+
+def is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+def format_host(host: str) -> str:
+    """Wraps IPv6 address in brackets, so it can be used in url or host:port string"""
+    return f"[{host}]" if ":" in host else host
+
+
+class DNSCache:
+    """
+    Process-wide async resolver of proxy hostnames.
+    Addresses are cached for ttl seconds, failed lookups for negative_ttl seconds,
+    so dead hostnames from provider lists are not resolved on every check.
+    Concurrent lookups of the same hostname share one request to system resolver.
+    Hits, misses and failures are published in checker stats with "dns:" prefix
+    """
+
+    def __init__(self, ttl: float = 300, negative_ttl: float = 60, timeout: float = 5, max_size: int = 100_000):
+        self.ttl: float = ttl
+        self.negative_ttl: float = negative_ttl
+        self.timeout: float = timeout
+        self.max_size: int = max_size
+
+        # hostname -> (expires at, address or None if lookup failed)
+        self._cache: dict[str, tuple[float, str | None]] = {}
+        self._pending: dict[str, asyncio.Future] = {}
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def _store(self, host: str, address: str | None) -> None:
+        if len(self._cache) >= self.max_size:
+            now: float = time.monotonic()
+            self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+
+            # still full, drop the oldest half (dict keeps insertion order)
+            if len(self._cache) >= self.max_size:
+                for key in list(self._cache)[:self.max_size // 2]:
+                    del self._cache[key]
+
+        ttl: float = self.ttl if address is not None else self.negative_ttl
+        self._cache[host] = (time.monotonic() + ttl, address)
+
+    def _on_lookup_done(self, host: str, future: asyncio.Future) -> None:
+        if self._pending.get(host) is future:
+            del self._pending[host]
+
+        if not future.cancelled():
+            self._store(host, future.result())
+
+    async def _lookup(self, host: str) -> str | None:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        try:
+            infos: list = await asyncio.wait_for(
+                loop.getaddrinfo(host, None, type=socket.SOCK_STREAM),
+                self.timeout
+            )
+        except (asyncio.TimeoutError, OSError) as e:
+            logger.debug(f"Failed to resolve {host}: {e!r}")
+            return
+
+        # IPv4 first, most of proxies are not reachable by IPv6
+        infos.sort(key=lambda info: info[0] != socket.AF_INET)
+        return infos[0][4][0] if infos else None
+
+    async def resolve(self, host: str) -> str:
+        """
+        Returns ip address of host, ip addresses are returned as is
+        :raises socket.gaierror: if host can not be resolved (also for cached failures)
+        """
+        if is_ip_address(host):
+            return host
+
+        host = host.lower()
+
+        if (cached := self._cache.get(host)) is not None and cached[0] > time.monotonic():
+            checker_stats.incr("dns:hits")
+            address: str | None = cached[1]
+        elif (pending := self._pending.get(host)) is not None and pending.get_loop() is asyncio.get_running_loop():
+            checker_stats.incr("dns:hits")
+            address: str | None = await asyncio.shield(pending)
+        else:
+            checker_stats.incr("dns:misses")
+            future: asyncio.Future = asyncio.ensure_future(self._lookup(host))
+            future.add_done_callback(lambda f: self._on_lookup_done(host, f))
+            self._pending[host] = future
+
+            # lookup is finished and cached even if this check is cancelled
+            address: str | None = await asyncio.shield(future)
+
+        if address is None:
+            checker_stats.incr("dns:failures")
+            raise socket.gaierror(socket.EAI_NONAME, f"Can not resolve {host}")
+
+        return address
+
+
+# one cache per worker process
+dns_cache: DNSCache = DNSCache(
+    checker_config["dns_cache_ttl"],
+    checker_config["dns_negative_ttl"],
+    checker_config["dns_timeout"]
+)
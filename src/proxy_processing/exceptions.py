@@ -34,3 +34,7 @@ class CheckIsRunningError(ProxyProcessingError):
     def __init__(self):
         super().__init__(details="You cannot purge database during active check.")
 
+
+class CheckRunNotFoundError(ProxyProcessingError):
+    def __init__(self):
+        super().__init__(status.HTTP_404_NOT_FOUND, "Check run not found")
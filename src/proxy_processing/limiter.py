@@ -0,0 +1,146 @@
+import asyncio
+import ipaddress
+from collections import deque, defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, TypeVar, Hashable
+
+from configs.config import checker_config
+
+T = TypeVar("T")
+
+
+class KeyedLimiter:
+    """
+    Limits amount of simultaneous work per key (ex: per ip).
+    Waiters of the same key are served in FIFO order.
+    Keys without active work are removed, so memory depends only on running checks.
+    limit <= 0 means unlimited
+    """
+
+    def __init__(self, limit: int):
+        self.limit: int = limit
+
+        self._active: dict[Hashable, int] = {}
+        self._waiters: dict[Hashable, deque[asyncio.Future]] = {}
+
+    def active(self, key: Hashable) -> int:
+        return self._active.get(key, 0)
+
+    async def _acquire(self, key: Hashable) -> None:
+        if self._active.get(key, 0) < self.limit:
+            self._active[key] = self._active.get(key, 0) + 1
+            return
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(future)
+        try:
+            # slot is passed by release(), so active counter is already incremented for us
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # slot was passed right before cancellation, give it to the next one
+                self._release(key)
+            elif future in (waiters := self._waiters.get(key, ())):
+                waiters.remove(future)
+                if not waiters:
+                    del self._waiters[key]
+            raise
+
+    def _release(self, key: Hashable) -> None:
+        waiters: deque[asyncio.Future] | None = self._waiters.get(key)
+
+        # pass slot to the first waiter
+        while waiters:
+            future: asyncio.Future = waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                if not waiters:
+                    del self._waiters[key]
+                return
+
+        self._waiters.pop(key, None)
+        self._active[key] -= 1
+        if not self._active[key]:
+            del self._active[key]
+
+    @asynccontextmanager
+    async def acquire(self, key: Hashable) -> AsyncIterator[None]:
+        if self.limit <= 0:
+            yield
+            return
+
+        await self._acquire(key)
+        try:
+            yield
+        finally:
+            self._release(key)
+
+
+def subnet_key(ip: str, prefix: int = 24, prefix6: int = 64) -> str:
+    """
+    Returns subnet of ip, ex: 1.2.3.4 -> 1.2.3.0/24, 2001:db8::1 -> 2001:db8::/64.
+    Hostnames are returned as is, pass resolved address to group them by subnet
+    :param prefix: prefix of IPv4 subnet
+    :param prefix6: prefix of IPv6 subnet, one host usually gets the whole /64
+    """
+    try:
+        address: ipaddress.IPv4Address | ipaddress.IPv6Address = ipaddress.ip_address(ip)
+    except ValueError:
+        return ip
+
+    return str(ipaddress.ip_network(f"{address}/{prefix if address.version == 4 else prefix6}", strict=False))
+
+
+class HostLimiter:
+    """
+    Limits simultaneous checks per ip and per subnet,
+    so dozens of ports on the same ip or many ips from one /24 do not hit their rate limits
+    """
+
+    def __init__(self, per_host: int, per_subnet: int, subnet_prefix: int = 24, subnet_prefix6: int = 64):
+        self.hosts: KeyedLimiter = KeyedLimiter(per_host)
+        self.subnets: KeyedLimiter = KeyedLimiter(per_subnet)
+        self.subnet_prefix: int = subnet_prefix
+        self.subnet_prefix6: int = subnet_prefix6
+
+    def subnet_key(self, ip: str) -> str:
+        return subnet_key(ip, self.subnet_prefix, self.subnet_prefix6)
+
+    @asynccontextmanager
+    async def acquire(self, ip: str) -> AsyncIterator[None]:
+        """
+        :param ip: ip address of proxy, resolve hostname before,
+            otherwise every hostname is limited separately even if it points to the same ip
+        """
+        # ip is always acquired first, so there is no deadlock
+        async with self.hosts.acquire(ip):
+            async with self.subnets.acquire(self.subnet_key(ip)):
+                yield
+
+
+def interleave_by_key(items: list[T], key: Callable[[T], Hashable]) -> list[T]:
+    """
+    Orders items round-robin by key, ex: [a1, a2, a3, b1] -> [a1, b1, a2, a3]
+    Work is started in this order, so one busy key does not occupy the head of the queue
+    """
+    groups: dict[Hashable, deque[T]] = defaultdict(deque)
+    for item in items:
+        groups[key(item)].append(item)
+
+    result: list[T] = []
+    queues: list[deque[T]] = list(groups.values())
+    while queues:
+        for queue in queues:
+            result.append(queue.popleft())
+        queues = [q for q in queues if q]
+
+    return result
+
+
+# one limiter per worker process, so limits hold across all batches checked by its event loop
+host_limiter: HostLimiter = HostLimiter(
+    checker_config["per_host_limit"],
+    checker_config["per_subnet_limit"],
+    checker_config["subnet_prefix"],
+    checker_config["subnet_prefix6"]
+)
@@ -4,6 +4,7 @@ from typing import Annotated
 from datetime import datetime
 from enum import Enum
 from base_models import BaseModel, int_primary_key
+from proxy_processing.dns import format_host
 
 
 class Protocol(Enum):
@@ -29,10 +30,13 @@ class ProxyModel(BaseModel):
 
     __table_args__ = (
         Index('idx_proxy_ip_port_username_password', 'ip', 'port', 'username', 'password', unique=True),
+        # keyset pagination of proxies with status (ex: alive) by id
+        Index('ix_proxy_status_id', 'status', 'id'),
     )
 
     id: Mapped[int_primary_key]
-    ip: Mapped[str] = mapped_column(String(length=15), nullable=False, index=True)
+    # IPv4, IPv6 or hostname (up to 253 chars)
+    ip: Mapped[str] = mapped_column(String(length=253), nullable=False, index=True)
     port: Mapped[str] = mapped_column(String(length=5))  # 0-65536
 
     username: Mapped[proxy_credential]  # auth credentials
@@ -52,20 +56,32 @@ class ProxyModel(BaseModel):
     location: Mapped[bool] = mapped_column(String(length=128), nullable=True)
     latency: Mapped[float] = mapped_column(nullable=True)
 
+    # phases of the fastest successful check, ms
+    connect_time: Mapped[float] = mapped_column(nullable=True, comment="TCP connect to proxy, ms")
+    handshake_time: Mapped[float] = mapped_column(nullable=True, comment="SOCKS negotiation, ms")
+    ttfb: Mapped[float] = mapped_column(nullable=True, comment="Time to first byte of http(s) response, ms")
+
+    throughput: Mapped[float] = mapped_column(nullable=True, comment="Download speed through proxy, bytes/s")
+
     @property
     def credentials(self) -> str:
         """Returns username:password@ string"""
         return f"{self.username}:{self.password}@" if self.username != "" else ""
 
+    @property
+    def host(self) -> str:
+        """Returns IP, IPv6 is wrapped in brackets to be used in urls"""
+        return format_host(self.ip)
+
     @property
     def ip_port(self) -> str:
         """Returns IP:port string"""
-        return f"{self.ip}:{self.port}"
+        return f"{self.host}:{self.port}"
 
     @property
     def credentials_ip_port(self) -> str:
         """Returns user:password@IP:port string"""
-        return f"{self.credentials}{self.ip}:{self.port}"
+        return f"{self.credentials}{self.host}:{self.port}"
 
     @property
     def proto(self) -> str:
@@ -134,3 +150,33 @@ class ProxyModel(BaseModel):
         """Returns full proxy_processing url"""
         return f"{self.proto}{self.credentials}{self.ip_port}"
 
+
+class RunStatus(Enum):
+    """Enumerate of statuses of check run"""
+    running = "running"
+    finished = "finished"
+    stopped = "stopped"
+
+
+class CheckRunModel(BaseModel):
+    """
+    Summary of one check run (add, rerun or continue check).
+    Live progress of running check is stored in redis hash (see proxy_processing.runs),
+    counters are written here when run is finished or stopped
+    """
+    __tablename__ = "check_run"
+
+    id: Mapped[int_primary_key]
+    kind: Mapped[str] = mapped_column(String(length=16), nullable=False)  # add / rerun / continue
+    status: Mapped[RunStatus] = mapped_column(nullable=False, default=RunStatus.running, index=True)
+
+    enqueued: Mapped[int] = mapped_column(nullable=False, default=0)
+    finished: Mapped[int] = mapped_column(nullable=False, default=0)
+    alive: Mapped[int] = mapped_column(nullable=False, default=0)
+    dead: Mapped[int] = mapped_column(nullable=False, default=0)
+
+    created_at: Mapped[datetime] = mapped_column(nullable=False, default=datetime.utcnow)
+    finished_at: Mapped[datetime] = mapped_column(nullable=True)
+
+    def __repr__(self) -> str:
+        return f"CheckRun {self.id} ({self.kind}, {self.status})"
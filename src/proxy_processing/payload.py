@@ -0,0 +1,59 @@
+from typing import Any
+
+from sqlalchemy import Row
+
+from proxy_processing.models import ProxyModel
+
+# Compact check message of one proxy, so worker does not read database before check:
+# [id, ip, port, username, password, known protocols, requested protocol]
+# Old messages [id, requested protocol] are still accepted, such proxies are loaded from database
+CheckPayload = list[Any]
+
+# columns needed to build payload, see row_to_payload
+PAYLOAD_COLUMNS = (
+    ProxyModel.id,
+    ProxyModel.ip,
+    ProxyModel.port,
+    ProxyModel.username,
+    ProxyModel.password,
+    ProxyModel.socks5,
+    ProxyModel.socks4,
+    ProxyModel.https,
+    ProxyModel.http,
+)
+
+
+def to_payload(proxy_model: ProxyModel, protocol: str | None) -> CheckPayload:
+    return [
+        proxy_model.id,
+        proxy_model.ip,
+        proxy_model.port,
+        proxy_model.username or "",
+        proxy_model.password or "",
+        proxy_model.protocols_list,
+        protocol
+    ]
+
+
+def row_to_payload(row: Row, protocol: str | None) -> CheckPayload:
+    """Builds payload from row of PAYLOAD_COLUMNS"""
+    return to_payload(ProxyModel(**row._asdict()), protocol)
+
+
+def is_embedded(payload: CheckPayload) -> bool:
+    """False for old [id, protocol] messages"""
+    return len(payload) > 2
+
+
+def from_payload(payload: CheckPayload) -> ProxyModel:
+    """Builds transient model with fields needed by checker, results are written back by id"""
+    proxy_id, ip, port, username, password, protocols, _ = payload
+
+    proxy_model: ProxyModel = ProxyModel(id=proxy_id, ip=ip, port=port, username=username, password=password)
+    proxy_model.protocols_list = protocols
+    return proxy_model
+
+
+def get_id_and_protocol(payload: CheckPayload) -> tuple[int, str | None]:
+    """Returns (id, requested protocol) of payload of any format"""
+    return payload[0], payload[-1]
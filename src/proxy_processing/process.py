@@ -1,29 +1,71 @@
+import asyncio
 import logging
-from redis import Redis
+from datetime import datetime
+from redis.asyncio import Redis as AsyncRedis
 
-from redis_manager.conn_manager import get_conn
+from configs.config import checker_config
+from redis_manager.conn_manager import get_async_conn
 from proxy_processing.repository import get_model_by_id
 from proxy_processing.models import ProxyModel
 from proxy_processing.check import check_proxy
+from proxy_processing.stats import checker_stats
+from proxy_processing.retry import retry_scope
+from proxy_processing.results import result_buffer
+from proxy_processing.progress import mark_started, mark_finished
+from proxy_processing.runs import finish_run_if_done
+from proxy_processing.payload import CheckPayload, from_payload, is_embedded, get_id_and_protocol
+from proxy_processing.limiter import host_limiter, interleave_by_key
+from proxy_processing.dns import dns_cache
 from proxy_processing import repository as proxy_db
 
 logger = logging.getLogger(__name__)
 
 
-def process_proxy(proxy_id: int, protocol: str | None) -> None:
+def get_good_proxy_str(proxy_model: ProxyModel, protocol: str | None) -> str | None:
+    """
+    After check, we decide what return to user
+    :param proxy_model: checked proxy
+    :param protocol: protocol requested by client, None if client asked to find alive protocols
+    :return: proxy string to push in good_proxies list or None if there is nothing to return
+    """
+    if proxy_model.status != "alive":
+        return
+
+    if protocol is not None and proxy_model.protocols_list.count(protocol):
+        # client gave proxy with working protocol
+        return proxy_model.get_with_proto(protocol)
+    elif protocol is None:
+        # client asked server to find alive protocols, and we did it
+        return str(proxy_model)
+
+    # proxy is alive, but client gave it with unsupported proto
+    return
+
+
+async def get_limit_address(proxy_model: ProxyModel) -> str:
+    """Returns address which checks of proxy are limited by, hostname is resolved through dns cache"""
+    try:
+        return await dns_cache.resolve(proxy_model.ip)
+    except OSError:
+        # check_proxy marks it dead without connecting
+        return proxy_model.ip
+
+
+async def process_proxy(proxy_id: int, protocol: str | None) -> None:
     """
         Runs check(s) for proxy with proxy_id:
         if alive:
             from working results chooses the best proto (socks5 > socks4 > https > http) and pushes in redis
         else:
             updates database with 'dead' sign and sets all protocols to False
+        The whole pipeline is one coroutine, run it on the loop of the worker (see tasks.lifecycle)
     :param proxy_id: proxy id from database
     :param protocol: protocol to check, if None - checks all available protocols
     :return: None
     """
 
     # get proxy model by id
-    proxy_model: ProxyModel | None = get_model_by_id(proxy_id)
+    proxy_model: ProxyModel | None = await get_model_by_id(proxy_id)
 
     logger.debug(f"Started check for {proxy_model} with protocol {protocol if protocol else 'to find'}")
 
@@ -32,28 +74,111 @@ def process_proxy(proxy_id: int, protocol: str | None) -> None:
         logger.warning("Proxy with id %s is None", str(proxy_id))
         return
 
-    # runs checks for all available protocols
-    proxy_model: ProxyModel = check_proxy(proxy_model)
+    # runs checks for all available protocols, host is shared with checks of batches
+    with retry_scope():
+        async with host_limiter.acquire(await get_limit_address(proxy_model)):
+            proxy_model: ProxyModel = await check_proxy(proxy_model)
 
     logger.debug(f"Updated data about {proxy_model} ({proxy_model.status})")
-    proxy_db.update_with_check_timestamp(proxy_model)
-
-    # after check, we decide what return to user
-    if proxy_model.status == "alive":
-        if protocol is not None and proxy_model.protocols_list.count(protocol):
-            # client gave proxy with working protocol
-            proxy_str: str = proxy_model.get_with_proto(protocol)
-        elif protocol is None:
-            # client asked server to find alive protocols, and we did it
-            proxy_str: str = str(proxy_model)
-        else:
-            # proxy is alive, but client gave it with unsupported proto
-            return
+    proxy_model.last_check_at = datetime.utcnow()
+    await result_buffer.add(proxy_model)
 
+    if (proxy_str := get_good_proxy_str(proxy_model, protocol)) is not None:
         logger.debug(f"Good proxy: {proxy_str}")
 
         # redis
-        redis_conn: Redis = get_conn()
-        redis_conn.rpush("good_proxies", proxy_str)
+        redis_conn: AsyncRedis = get_async_conn()
+        await redis_conn.rpush("good_proxies", proxy_str)
+        await redis_conn.aclose()
     else:
         logger.debug(f"Bad proxy: {proxy_model}")
+
+    # publish pipeline counters of this worker
+    await checker_stats.flush()
+
+
+async def process_proxies_batch(proxies: list[CheckPayload], tracked: bool = True, run_id: int | None = None) -> None:
+    """
+    Runs checks for a chunk of proxies concurrently in one event loop.
+    Amount of proxies checked at the same time is limited by checker_config["concurrency"],
+    and per ip / subnet by checker_config["per_host_limit"] and checker_config["per_subnet_limit"]
+    in all batches of the worker process (see proxy_processing.limiter.host_limiter).
+    Proxies with embedded payload are checked without reading database, only results are written back
+    :param proxies: list of payloads (see proxy_processing.payload) or old (proxy id, requested protocol or None)
+    :param tracked: proxies were enqueued by tasks.tasks.enqueue_checks,
+        so started and finished checks are counted in progress (see proxy_processing.progress)
+    :param run_id: check run of these proxies, they are counted in its progress too (see proxy_processing.runs)
+    :return: None
+    """
+    # proxy id -> requested protocol
+    requested: dict[int, str | None] = dict(get_id_and_protocol(p) for p in proxies)
+
+    proxy_models: list[ProxyModel] = [from_payload(p) for p in proxies if is_embedded(p)]
+
+    # one query for the whole chunk instead of one per proxy
+    if ids_to_load := [p[0] for p in proxies if not is_embedded(p)]:
+        proxy_models += await proxy_db.get_models_by_ids(ids_to_load)
+
+    redis_conn: AsyncRedis = get_async_conn()
+
+    if len(proxy_models) != len(requested):
+        logger.warning("%s proxies from batch were not found", len(requested) - len(proxy_models))
+        if tracked:
+            await mark_started(redis_conn, len(requested) - len(proxy_models), run_id)
+            await mark_finished(redis_conn, amount=len(requested) - len(proxy_models), run_id=run_id)
+
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(checker_config["concurrency"])
+
+    # start checks round-robin by subnets, so one big subnet does not occupy the head of the queue
+    proxy_models = interleave_by_key(proxy_models, lambda m: host_limiter.subnet_key(m.ip))
+
+    async def process(proxy_model: ProxyModel) -> None:
+        # hostname is limited by its address, check_proxy gets it from dns cache then
+        address: str = await get_limit_address(proxy_model)
+
+        # host limit is acquired first, so checks waiting for busy host do not hold global slots
+        checked: bool = False
+        try:
+            async with host_limiter.acquire(address):
+                async with semaphore:
+                    if tracked:
+                        await mark_started(redis_conn, run_id=run_id)
+                    await check_proxy(proxy_model)
+                    checked = True
+        finally:
+            # failed check has no result to write
+            if tracked and not checked:
+                await mark_finished(redis_conn, run_id=run_id)
+
+        # results are written in bulk by write-behind buffer, it counts them as finished after write
+        proxy_model.last_check_at = datetime.utcnow()
+        await result_buffer.add(proxy_model, tracked, run_id)
+
+        # push good proxy asap, do not wait for the whole batch
+        if (proxy_str := get_good_proxy_str(proxy_model, requested[proxy_model.id])) is not None:
+            logger.debug(f"Good proxy: {proxy_str}")
+            await redis_conn.rpush("good_proxies", proxy_str)
+
+    logger.debug(f"Started batch check for {len(proxy_models)} proxies")
+
+    # retries of this batch share one budget, other batches of the loop have their own
+    with retry_scope():
+        results: list[None | Exception] = await asyncio.gather(
+            *(process(m) for m in proxy_models),
+            return_exceptions=True
+        )
+
+    for proxy_model, r in zip(proxy_models, results):
+        if isinstance(r, Exception):
+            logger.error("Error during check of %s: %s", proxy_model, r)
+
+    # the last batch of the run closes it
+    if tracked and run_id is not None:
+        await finish_run_if_done(redis_conn, run_id)
+
+    await redis_conn.aclose()
+
+    # publish pipeline counters of this worker
+    await checker_stats.flush()
+
+    logger.debug(f"Finished batch check for {len(proxy_models)} proxies")
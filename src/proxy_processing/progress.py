@@ -0,0 +1,105 @@
+from redis import Redis
+from redis.client import Pipeline
+from redis.asyncio import Redis as AsyncRedis
+
+from configs.config import checker_config
+
+# Redis counters of checks.
+# "enqueued" is increased by dispatcher (see tasks.tasks.CheckEnqueuer), the rest by workers after every check,
+# so progress is read by one MGET without asking workers
+ENQUEUED_KEY = "progress:enqueued"
+STARTED_KEY = "progress:started"
+FINISHED_KEY = "progress:finished"
+ALIVE_KEY = "progress:alive"
+DEAD_KEY = "progress:dead"
+
+PROGRESS_KEYS: tuple[str, ...] = (ENQUEUED_KEY, STARTED_KEY, FINISHED_KEY, ALIVE_KEY, DEAD_KEY)
+
+# the same counters of one check run are fields of its hash (see proxy_processing.runs)
+RUN_COUNTERS: tuple[str, ...] = ("enqueued", "started", "finished", "alive", "dead")
+# seconds to keep redis hash of the run after its last check, summary stays in database
+RUN_TTL: int = checker_config["check_runs"]["ttl"]
+
+
+def run_key(run_id: int) -> str:
+    return f"check_run:{run_id}"
+
+
+def reset_if_idle(redis_conn: Redis) -> bool:
+    """
+    Resets counters if all enqueued checks are finished, so new check starts progress from zero
+    and proxies added during running check are added to its progress.
+    :return: True if counters were reset
+    """
+    def reset(pipe: Pipeline) -> bool:
+        enqueued, finished = (int(v or 0) for v in pipe.mget(ENQUEUED_KEY, FINISHED_KEY))
+        if enqueued > finished:
+            return False
+
+        pipe.multi()
+        pipe.delete(*PROGRESS_KEYS)
+        return True
+
+    # counters are watched, so check finished by worker between read and reset is not lost
+    return redis_conn.transaction(reset, ENQUEUED_KEY, FINISHED_KEY, value_from_callable=True)
+
+
+async def mark_started(redis_conn: AsyncRedis, amount: int = 1, run_id: int | None = None) -> None:
+    async with redis_conn.pipeline(transaction=False) as pipe:
+        pipe.incrby(STARTED_KEY, amount)
+        if run_id is not None:
+            pipe.hincrby(run_key(run_id), "started", amount)
+            # hash of running run does not expire while its checks are going
+            pipe.expire(run_key(run_id), RUN_TTL)
+        await pipe.execute()
+
+
+async def mark_finished(
+        redis_conn: AsyncRedis,
+        status: str | None = None,
+        amount: int = 1,
+        run_id: int | None = None
+) -> None:
+    """Increases finished counter and counter of status (alive/dead) in one round trip"""
+    names: list[str] = ["finished"]
+    if status in ("alive", "dead"):
+        names.append(status)
+
+    async with redis_conn.pipeline(transaction=False) as pipe:
+        for name in names:
+            pipe.incrby(f"progress:{name}", amount)
+            if run_id is not None:
+                pipe.hincrby(run_key(run_id), name, amount)
+        if run_id is not None:
+            pipe.expire(run_key(run_id), RUN_TTL)
+        await pipe.execute()
+
+
+async def get_counters(redis_conn: AsyncRedis) -> dict[str, int]:
+    """Returns all counters by one MGET, ex: {"enqueued": 10, "started": 5, "finished": 3, "alive": 1, "dead": 2}"""
+    values: list[str | None] = await redis_conn.mget(*PROGRESS_KEYS)
+    return {key.split(":", 1)[1]: int(value or 0) for key, value in zip(PROGRESS_KEYS, values)}
+
+
+def build_progress(counters: dict[str, int]) -> dict[str, int | float]:
+    """
+    Converts counters to information for progressbar (see frontend/js/progressbar.js)
+    current_len - proxies waiting in queue or being checked
+    initial_len - proxies enqueued since the last idle state
+    """
+    # checks which were running during purge of the queue can finish after counters were reset
+    finished: int = min(counters["finished"], counters["enqueued"])
+
+    progress: dict[str, int | float] = {
+        "current_len": counters["enqueued"] - finished,
+        "initial_len": counters["enqueued"],
+        "value_now": finished,
+        "running": max(0, counters["started"] - counters["finished"]),
+        **counters,
+    }
+
+    progress["progressbar_width"] = 100 - (
+        (100 * progress["current_len"] / progress["initial_len"]) if progress["initial_len"] > 0 else 0
+    )
+
+    return progress
@@ -3,15 +3,26 @@ import re
 # IP
 ip_expr = r"^(([0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\.){3}([0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])$"
 
+# hostname: labels separated by dots, the last one (TLD) starts with a letter, so "001.2.3.4" is not a hostname
+hostname_expr = r"(([a-z0-9]|[a-z0-9][a-z0-9-]{0,61}[a-z0-9])\.)+([a-z]|[a-z][a-z0-9-]{0,61}[a-z0-9])"
+
+# IPv6 literal, strictly validated by ipaddress module after match
+ipv6_expr = r"[0-9a-f]{0,4}(:[0-9a-f]{0,4}){2,7}(:(\d{1,3}\.){3}\d{1,3})?"
+
+# IPv4, IPv6 or hostname, used for /search validation
+host_expr = rf"(?i)^({ip_expr[1:-1]}|{ipv6_expr}|{hostname_expr})$"
+
 # Supported formats:
 # ip:port
 # username:password@ip:port
 # protocol://username:password@ip:port
 # and combinations
+# ip can be IPv4, hostname or IPv6 in brackets: [2001:db8::1]:8080
 proxy_expression = re.compile(
-    r"""^((?P<protocol>(socks(4|5|5h))|http(s)?)://)?
+    rf"""^((?P<protocol>(socks(4|5|5h))|http(s)?)://)?
     ((?P<username>.+):(?P<password>.+)@)?
-    (?P<ip>(([0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\.){3}([0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])):
-    (?P<port>\d{1,5})$""",
+    ((?P<ip>(([0-9]|[1-9][0-9]|1[0-9]{{2}}|2[0-4][0-9]|25[0-5])\.){{3}}([0-9]|[1-9][0-9]|1[0-9]{{2}}|2[0-4][0-9]|25[0-5])
+    |{hostname_expr})|\[(?P<ipv6>{ipv6_expr})\]):
+    (?P<port>\d{{1,5}})$""",
     re.IGNORECASE | re.VERBOSE
 )
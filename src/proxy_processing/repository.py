@@ -1,11 +1,15 @@
 from fastapi import Depends
-from sqlalchemy import select, and_, delete, or_, func, Select, Result
+from sqlalchemy import update as sql_update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import select, and_, delete, or_, func, values, column, cast, inspect, Select, Result, Row
 from datetime import datetime
 from functools import singledispatch
+from typing import AsyncIterator, Any
 
 from database import db_manager
-from proxy_processing.models import ProxyModel
+from proxy_processing.models import ProxyModel, CheckRunModel, RunStatus
 from proxy_processing.schemas import SAdvancedSearch
+from proxy_processing.payload import PAYLOAD_COLUMNS
 from base_utils import sync_compatible
 
 
@@ -66,6 +70,59 @@ async def get_sorted_by(sorted_by, limit: int = -1) -> list[ProxyModel]:
         return result.scalars().all()
 
 
+async def count_filtered(condition=None) -> int:
+    """Returns amount of proxies matching condition (all proxies if condition is None)"""
+    async with db_manager as session:
+        query = select(func.count(ProxyModel.id))
+        if condition is not None:
+            query = query.where(condition)
+
+        return (await session.execute(query)).scalar_one()
+
+
+async def stream_rows(
+        columns,
+        condition=None,
+        order_by=None,
+        limit: int = -1,
+        chunk_size: int = 1000
+) -> AsyncIterator[list[Row]]:
+    """
+    Streams selected columns of proxies by chunks from server-side cursor.
+    Only chunk_size rows are fetched at a time, so memory does not depend on table size
+    Example:
+        `async for rows in stream_rows((ProxyModel.id, ProxyModel.ip), ProxyModel.status == null()): ...`
+    :param columns: Model.value list
+    :param condition: filter, None - all proxies
+    :param order_by: Model.value, chunks are ordered by it and then by id
+    :param limit: limit of rows, -1 means infinite
+    :param chunk_size: rows in one chunk
+    """
+    async with db_manager as session:
+        query = select(*columns)
+        if condition is not None:
+            query = query.where(condition)
+
+        query = query.order_by(*([order_by] if order_by is not None else []), ProxyModel.id)
+        if limit > 0:
+            query = query.limit(limit)
+
+        result = await session.stream(query.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions(chunk_size):
+            yield list(rows)
+
+
+def alive_condition(time_limit: int = 0):
+    """
+    Condition of alive proxies where last_check_at > time_limit
+    :param time_limit: - unix timestamp (default: 0)
+    """
+    condition = ProxyModel.status == "alive"
+    if time_limit:
+        condition = and_(condition, ProxyModel.last_check_at > datetime.fromtimestamp(time_limit))
+    return condition
+
+
 @sync_compatible
 async def get_alive(time_limit: int = 0) -> list[ProxyModel]:
     """
@@ -74,32 +131,41 @@ async def get_alive(time_limit: int = 0) -> list[ProxyModel]:
     :return:
     """
     async with db_manager as session:
-        query = select(ProxyModel).where(ProxyModel.status == "alive")
-
-        if time_limit:
-            query = query.where(ProxyModel.last_check_at > datetime.fromtimestamp(time_limit))
-
+        query = select(ProxyModel).where(alive_condition(time_limit))
         result = await session.execute(query)
         return result.scalars().all()
 
 
-@sync_compatible
-async def get_model_by_dict(proxy_dict: dict) -> ProxyModel | None:
-    """Search proxy in database using information from dict"""
-    # async with async_session_maker() as session:
-    async with db_manager as session:
-        query = select(ProxyModel).where(
-            and_(
-                ProxyModel.ip == proxy_dict["ip"],
-                ProxyModel.port == proxy_dict["port"],
-                ProxyModel.username == proxy_dict.get("username", ""),
-                ProxyModel.password == proxy_dict.get("password", "")
-            )
-        )
+def paginate(query: Select, after_id: int = 0, limit: int = -1) -> Select:
+    """
+    Keyset pagination: proxies with id > after_id ordered by id (primary key index),
+    so every page costs the same, unlike OFFSET
+    :param query: select of ProxyModel without order
+    :param after_id: id of the last proxy of previous page, 0 - from the beginning
+    :param limit: limit of proxies, -1 means infinite
+    """
+    query = query.where(ProxyModel.id > after_id).order_by(ProxyModel.id)
+    if limit > 0:
+        query = query.limit(limit)
+    return query
+
+
+async def get_page(query: Select) -> list[ProxyModel]:
+    """Executes query of models, ex: `await get_page(paginate(select(ProxyModel), after_id, 100))`"""
+    async with db_manager as session:
         result = await session.execute(query)
-        proxy_model = result.scalars().first()
+        return result.scalars().all()
 
-        return proxy_model
+
+async def stream_models(query: Select, chunk_size: int = 1000) -> AsyncIterator[list[ProxyModel]]:
+    """
+    Streams models of query by chunks from server-side cursor,
+    only chunk_size models are loaded at a time (see stream_rows)
+    """
+    async with db_manager as session:
+        result = await session.stream_scalars(query.execution_options(yield_per=chunk_size))
+        async for models in result.partitions(chunk_size):
+            yield list(models)
 
 
 @sync_compatible
@@ -110,6 +176,16 @@ async def get_model_by_id(id_: int) -> ProxyModel | None:
         return proxy_model
 
 
+async def get_models_by_ids(ids: list[int]) -> list[ProxyModel]:
+    """Returns models by list of ids in one query"""
+    if not ids:
+        return []
+    async with db_manager as session:
+        query = select(ProxyModel).where(ProxyModel.id.in_(ids))
+        result = await session.execute(query)
+        return result.scalars().all()
+
+
 async def count_rows() -> int:
     """Counts rows in ProxyModel table"""
     async with db_manager as session:
@@ -138,15 +214,84 @@ async def get_min_max_latency() -> dict[str, float | int]:
         return result
 
 
+# columns of unique index idx_proxy_ip_port_username_password
+PROXY_KEY_COLUMNS: tuple[str, ...] = ("ip", "port", "username", "password")
+PROTOCOL_COLUMNS: tuple[str, ...] = ("socks5", "socks4", "https", "http")
+
+# proxies in one lookup and one upsert statement, postgres allows up to 32767 parameters in one statement
+INGEST_CHUNK_SIZE = 2000
+
+
+def proxy_key(proxy: dict[str, Any]) -> tuple[str, ...]:
+    """Returns (ip, port, username, password) of parsed proxy dict or row"""
+    return tuple(proxy.get(name) or "" for name in PROXY_KEY_COLUMNS)
+
+
+async def upsert_many(proxies: list[dict[str, Any]]) -> tuple[list[Row], int, int]:
+    """
+    Set-based ingestion of parsed proxies (see utils.parse_proxy_dict_from_string).
+    Every INGEST_CHUNK_SIZE proxies are looked up by one query joined with VALUES list of their keys,
+    then new proxies and proxies with new protocols are written by one
+    INSERT ... ON CONFLICT (ip, port, username, password) DO UPDATE ... RETURNING statement.
+    Known protocols are never reset, unchanged proxies are not written at all
+    :param proxies: dicts with ip, port, username, password and protocol flags, keys must be unique
+    :return: rows of PAYLOAD_COLUMNS of all proxies, amount of inserted and updated proxies
+    """
+    table = ProxyModel.__table__
+    returned_columns = [table.c[c.key] for c in PAYLOAD_COLUMNS]
+
+    rows: list[Row] = []
+    inserted: int = 0
+    updated: int = 0
 
-async def insert_many(proxies: list[ProxyModel]) -> list[ProxyModel]:
-    """Inserts list of proxies in one transaction for better performance."""
-    if not proxies:
-        return []
     async with db_manager as session:
-        session.add_all(proxies)
+        for start in range(0, len(proxies), INGEST_CHUNK_SIZE):
+            chunk: list[dict[str, Any]] = proxies[start:start + INGEST_CHUNK_SIZE]
+
+            keys = values(
+                *(column(name, table.c[name].type) for name in PROXY_KEY_COLUMNS),
+                name="k"
+            ).data([proxy_key(p) for p in chunk])
+
+            query: Select = select(*returned_columns).join(
+                keys, and_(*(table.c[name] == keys.c[name] for name in PROXY_KEY_COLUMNS))
+            )
+            existing: dict[tuple[str, ...], Row] = {
+                proxy_key(row._asdict()): row for row in (await session.execute(query)).all()
+            }
+
+            to_write: list[dict[str, Any]] = []
+            added_at: datetime = datetime.utcnow()
+            for proxy in chunk:
+                if (row := existing.get(proxy_key(proxy))) is None:
+                    inserted += 1
+                elif any(proxy.get(p) and not getattr(row, p) for p in PROTOCOL_COLUMNS):
+                    updated += 1
+                else:
+                    rows.append(row)
+                    continue
+
+                to_write.append({
+                    **dict(zip(PROXY_KEY_COLUMNS, proxy_key(proxy))),
+                    # only requested protocols are set, the rest stay unknown
+                    **{p: True if proxy.get(p) else None for p in PROTOCOL_COLUMNS},
+                    "added_at": added_at,
+                })
+
+            if not to_write:
+                continue
+
+            stmt = pg_insert(table).values(to_write)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(PROXY_KEY_COLUMNS),
+                set_={p: func.coalesce(stmt.excluded[p], table.c[p]) for p in PROTOCOL_COLUMNS}
+            ).returning(*returned_columns)
+
+            rows += (await session.execute(stmt)).all()
+
         await session.commit()
-        return proxies
+
+    return rows, inserted, updated
 
 
 async def get_filtered_by(condition) -> list[ProxyModel]:
@@ -161,75 +306,218 @@ async def get_filtered_by(condition) -> list[ProxyModel]:
         return result.scalars().all()
 
 
-async def search_with_multiple_params(search_query: SAdvancedSearch) -> list[ProxyModel]:
-    async with db_manager as session:
-        query: Select = select(ProxyModel)
+def build_search_query(search_query: SAdvancedSearch) -> Select:
+    """Builds select of proxies matching advanced search query"""
+    query: Select = select(ProxyModel)
 
-        and_conditions: list = []
+    and_conditions: list = []
 
-        # protocols
-        if len(search_query.protocols):
-            or_conditions: list = []
+    # protocols
+    if len(search_query.protocols):
+        or_conditions: list = []
 
-            if search_query.socks5:
-                or_conditions.append(ProxyModel.socks5 == True)
-            if search_query.socks4:
-                or_conditions.append(ProxyModel.socks4 == True)
-            if search_query.http:
-                or_conditions.append(ProxyModel.http == True)
-            if search_query.https:
-                or_conditions.append(ProxyModel.https == True)
+        if search_query.socks5:
+            or_conditions.append(ProxyModel.socks5 == True)
+        if search_query.socks4:
+            or_conditions.append(ProxyModel.socks4 == True)
+        if search_query.http:
+            or_conditions.append(ProxyModel.http == True)
+        if search_query.https:
+            or_conditions.append(ProxyModel.https == True)
 
-            if len(or_conditions):
-                and_conditions.append(or_(*or_conditions))
+        if len(or_conditions):
+            and_conditions.append(or_(*or_conditions))
 
-        # status
-        # if all statuses selected, we do not apply this filter
-        if not (search_query.not_checked and search_query.alive and search_query.dead):
-            or_conditions: list = []
-            if search_query.alive:
-                or_conditions.append(ProxyModel.status == "alive")
-            if search_query.dead:
-                or_conditions.append(ProxyModel.status == "dead")
-            if search_query.not_checked:
-                or_conditions.append(ProxyModel.status == None)
+    # status
+    # if all statuses selected, we do not apply this filter
+    if not (search_query.not_checked and search_query.alive and search_query.dead):
+        or_conditions: list = []
+        if search_query.alive:
+            or_conditions.append(ProxyModel.status == "alive")
+        if search_query.dead:
+            or_conditions.append(ProxyModel.status == "dead")
+        if search_query.not_checked:
+            or_conditions.append(ProxyModel.status == None)
 
-            if len(or_conditions):
-                and_conditions.append(or_(*or_conditions))
+        if len(or_conditions):
+            and_conditions.append(or_(*or_conditions))
 
-        # limit
-        if search_query.limit > 0:
-            query: Select = query.limit(search_query.limit)
+    # limit
+    if search_query.limit > 0:
+        query: Select = query.limit(search_query.limit)
 
-        # latency
-        if search_query.latency < 999:
-            and_conditions.append(ProxyModel.latency <= search_query.latency)
+    # latency
+    if search_query.latency < 999:
+        and_conditions.append(ProxyModel.latency <= search_query.latency)
 
-        # unite them all
-        if len(and_conditions):
-            query: Select = query.where(and_(*and_conditions))
+    # phases of check
+    for phase in ("connect_time", "handshake_time", "ttfb"):
+        if (max_value := getattr(search_query, phase)) is not None:
+            and_conditions.append(getattr(ProxyModel, phase) <= max_value)
 
-        result = await session.execute(query)
-        return result.scalars().all()
+    # throughput
+    if search_query.throughput is not None:
+        and_conditions.append(ProxyModel.throughput >= search_query.throughput)
+
+    # sorting, proxies with the same value are ordered by id
+    if search_query.sort_by is not None:
+        column = getattr(ProxyModel, search_query.sort_by)
+        query: Select = query.order_by((column.desc() if search_query.sort_desc else column.asc()).nulls_last())
+    query: Select = query.order_by(ProxyModel.id)
+
+    # keyset pagination, only without sorting (see SAdvancedSearch.after_id)
+    if search_query.after_id:
+        and_conditions.append(ProxyModel.id > search_query.after_id)
+
+    # unite them all
+    if len(and_conditions):
+        query: Select = query.where(and_(*and_conditions))
+
+    return query
+
+
+# columns written after check, see update_check_results
+CHECK_RESULT_COLUMNS: tuple[str, ...] = (
+    "status", "socks4", "socks5", "http", "https", "last_check_at",
+    "latency", "connect_time", "handshake_time", "ttfb",
+)
+
+
+# rows in one UPDATE ... FROM (VALUES ...), postgres allows up to 32767 parameters in one statement
+UPDATE_CHUNK_SIZE = 1000
+
+
+def build_update_from_values(columns: tuple[str, ...], rows: list[tuple]):
+    """
+    Builds one multi-row statement:
+    UPDATE proxy SET col = v.col, ... FROM (VALUES (id, col, ...), ...) AS v WHERE proxy.id = v.id
+    :param columns: names of updated columns
+    :param rows: tuples of (id, *values of columns)
+    """
+    table = ProxyModel.__table__
+    values_table = values(
+        *(column(name, table.c[name].type) for name in ("id", *columns)),
+        name="v"
+    ).data(rows)
+
+    return (
+        sql_update(table)
+        .where(table.c.id == values_table.c.id)
+        # values are typed, so enum status is casted explicitly
+        .values({name: cast(values_table.c[name], table.c[name].type) for name in columns})
+    )
+
+
+async def bulk_update(changes: list[tuple[int, dict[str, Any]]]) -> int:
+    """
+    Writes changed columns of many proxies by id without reading rows and without ORM identity map.
+    Changes with the same set of columns are written together,
+    every UPDATE_CHUNK_SIZE of them by one UPDATE ... FROM (VALUES ...) statement
+    Example:
+        `await bulk_update([(1, {"status": "dead"}), (2, {"status": "alive", "latency": 120.5})])`
+    :param changes: (proxy id, {column: new value}), changes without columns are skipped
+    :return: amount of written changes
+    """
+    # columns -> rows of (id, *values)
+    groups: dict[tuple[str, ...], list[tuple]] = {}
+    for proxy_id, columns_values in changes:
+        if not columns_values:
+            continue
+
+        columns: tuple[str, ...] = tuple(sorted(columns_values))
+        groups.setdefault(columns, []).append((proxy_id, *(columns_values[c] for c in columns)))
+
+    if not groups:
+        return 0
+
+    async with db_manager as session:
+        for columns, rows in groups.items():
+            for start in range(0, len(rows), UPDATE_CHUNK_SIZE):
+                await session.execute(build_update_from_values(columns, rows[start:start + UPDATE_CHUNK_SIZE]))
+        await session.commit()
+
+    return sum(len(rows) for rows in groups.values())
+
+
+def get_changes(proxy_model: ProxyModel) -> dict[str, Any]:
+    """
+    Returns changed columns of model (except id):
+    modified attributes of loaded (persistent or detached) model, all set attributes of new (transient) one
+    """
+    state = inspect(proxy_model)
+    columns: list[str] = [c.key for c in ProxyModel.__table__.columns if c.key != "id"]
+
+    if state.transient or state.pending:
+        changed: list[str] = [c for c in columns if c in proxy_model.__dict__]
+    else:
+        changed: list[str] = [c for c in columns if state.attrs[c].history.has_changes()]
+
+    return {c: getattr(proxy_model, c) for c in changed}
+
+
+async def update_check_results(proxies: list[ProxyModel], throughput: bool = False) -> None:
+    """
+    Writes results of check by id in one transaction without reading rows first,
+    so models do not have to be loaded from database (see proxy_processing.payload)
+    :param throughput: throughput was measured for alive proxies (checker_config["throughput"]["enabled"]),
+        otherwise it is written only for dead ones, check resets it
+    """
+    changes: list[tuple[int, dict[str, Any]]] = []
+    for proxy in proxies:
+        columns: tuple[str, ...] = CHECK_RESULT_COLUMNS
+        if throughput or proxy.status == "dead":
+            columns += ("throughput",)
+
+        changes.append((proxy.id, {c: getattr(proxy, c) for c in columns}))
+
+    await bulk_update(changes)
 
 
 async def update_many(proxies: list[ProxyModel]) -> list[ProxyModel]:
-    """Updates many proxies in one time for better performance."""
+    """Updates many proxies in one time for better performance, only changed columns are written (see bulk_update)"""
     if not proxies:
         return []
+
+    await bulk_update([(proxy.id, get_changes(proxy)) for proxy in proxies])
+    return proxies
+
+
+async def create_check_run(kind: str) -> CheckRunModel:
+    """Creates summary row of new check run, see proxy_processing.runs"""
     async with db_manager as session:
-        for proxy in proxies:
-            await session.merge(proxy)
+        run: CheckRunModel = CheckRunModel(kind=kind, status=RunStatus.running)
+        session.add(run)
         await session.commit()
-        return proxies
+        return run
 
 
+async def get_check_run(run_id: int) -> CheckRunModel | None:
+    async with db_manager as session:
+        return await session.get(CheckRunModel, run_id)
 
 
-async def get_by_ip(ip: str) -> list[ProxyModel]:
-    """Returns proxies sorted by ip"""
+async def get_running_check_run_ids() -> list[int]:
     async with db_manager as session:
-        query = select(ProxyModel).where(ProxyModel.ip == ip)
-        result = await session.execute(query)
+        query = select(CheckRunModel.id).where(CheckRunModel.status == RunStatus.running)
+        return list((await session.execute(query)).scalars().all())
 
-        return result.scalars().all()
+
+async def close_check_run(run_id: int, status: RunStatus, counters: dict[str, int]) -> bool:
+    """
+    Writes counters of finished or stopped run.
+    Only running run is updated, so several workers can try to close the same run
+    :return: True if run was closed by this call
+    """
+    async with db_manager as session:
+        stmt = (
+            sql_update(CheckRunModel)
+            .where(CheckRunModel.id == run_id, CheckRunModel.status == RunStatus.running)
+            .values(
+                status=status,
+                finished_at=datetime.utcnow(),
+                **{name: counters.get(name, 0) for name in ("enqueued", "finished", "alive", "dead")}
+            )
+        )
+        result = await session.execute(stmt)
+        await session.commit()
+        return result.rowcount > 0
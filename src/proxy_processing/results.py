@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+
+from redis.asyncio import Redis as AsyncRedis
+
+from configs.config import checker_config
+from proxy_processing.models import ProxyModel
+from proxy_processing.stats import checker_stats
+from proxy_processing.progress import mark_finished
+from proxy_processing.runs import finish_run_if_done
+from proxy_processing import repository as proxy_db
+from redis_manager.conn_manager import get_async_conn
+
+logger = logging.getLogger(__name__)
+
+
+class ResultBuffer:
+    """
+    Write-behind buffer of check results of one worker process.
+    Results are written by one bulk update (see repository.update_check_results)
+    when size results are collected or interval ms passed since the first buffered one.
+    Failed writes are retried, results which could not be written stay in buffer until the next flush.
+    Repeated results of the same proxy replace each other, only the last one is written.
+    Tracked checks are counted as finished in progress only after their results are written.
+    Buffering needs a long-lived loop: bind() it on worker start and call close() on worker shutdown
+    to write the rest. On any other loop (ex: run_until_complete per task) results are written immediately
+    Counters are published in checker stats with "results:" prefix
+    """
+
+    def __init__(self, size: int = 1000, interval: float = 500, retries: int = 3, retry_delay: float = 0.5):
+        self.size: int = size
+        self.interval: float = interval / 1000
+        self.retries: int = retries
+        self.retry_delay: float = retry_delay
+
+        # proxy id -> checked model
+        self._pending: dict[int, ProxyModel] = {}
+        # (run id, status) -> finished tracked checks of pending results
+        self._finished: Counter[tuple[int | None, str]] = Counter()
+        self._first_at: float | None = None
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+        self._timer: asyncio.TimerHandle | None = None
+        self._timer_loop: asyncio.AbstractEventLoop | None = None
+        self._flushes: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Loop which lives as long as the worker, only there timer flushes are sure to fire"""
+        self._loop = loop
+
+    async def add(self, proxy_model: ProxyModel, tracked: bool = False, run_id: int | None = None) -> None:
+        """
+        :param tracked: check is counted in progress, it is marked finished when result is written
+        :param run_id: check run of the proxy, its progress is increased too
+        """
+        if not self._pending:
+            self._first_at = time.monotonic()
+        self._pending[proxy_model.id] = proxy_model
+        if tracked:
+            self._finished[run_id, proxy_model.status] += 1
+
+        if (
+                asyncio.get_running_loop() is not self._loop
+                or len(self._pending) >= self.size
+                or time.monotonic() - self._first_at >= self.interval
+        ):
+            await self.flush()
+        else:
+            self._schedule()
+
+    def _schedule(self) -> None:
+        """Flushes buffer by timer, so results are written even if no more checks are finished"""
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+
+        # timer of another (closed) loop never fires
+        if self._timer is not None and self._timer_loop is loop:
+            return
+
+        self._timer = loop.call_later(self.interval, self._on_timer)
+        self._timer_loop = loop
+
+    def _on_timer(self) -> None:
+        self._timer = None
+
+        task: asyncio.Task = asyncio.get_running_loop().create_task(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self) -> None:
+        """Writes all buffered results, retries on failure"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if not self._pending:
+            return
+
+        # take results, so checks finished during write go to the next flush
+        results: dict[int, ProxyModel] = self._pending
+        finished: Counter[tuple[int | None, str]] = self._finished
+        self._pending = {}
+        self._finished = Counter()
+        self._first_at = None
+
+        for attempt in range(self.retries):
+            try:
+                await proxy_db.update_check_results(
+                    list(results.values()), throughput=checker_config["throughput"]["enabled"]
+                )
+            except Exception as e:
+                checker_stats.incr("results:errors")
+                logger.warning(f"Failed to write {len(results)} check results (attempt {attempt + 1}): {e!r}")
+                if attempt + 1 < self.retries:
+                    await asyncio.sleep(self.retry_delay * 2 ** attempt)
+            else:
+                checker_stats.incr("results:flushes")
+                checker_stats.incr("results:written", len(results))
+                logger.debug(f"Written {len(results)} check results")
+                await self._mark_finished(finished)
+                return
+
+        logger.error(f"Failed to write {len(results)} check results, they are kept until the next flush")
+        for proxy_id, proxy_model in results.items():
+            # newer result of the same proxy wins
+            self._pending.setdefault(proxy_id, proxy_model)
+        self._finished.update(finished)
+
+        if self._first_at is None:
+            self._first_at = time.monotonic()
+
+        # kept results are retried by timer even if no more checks are finished
+        self._schedule()
+
+    @staticmethod
+    async def _mark_finished(finished: Counter[tuple[int | None, str]]) -> None:
+        """Counts written checks in progress, the last written result of the run closes it"""
+        if not finished:
+            return
+
+        redis_conn: AsyncRedis = get_async_conn()
+        try:
+            for (run_id, status), amount in finished.items():
+                await mark_finished(redis_conn, status, amount, run_id)
+
+            for run_id in {run_id for run_id, _ in finished if run_id is not None}:
+                await finish_run_if_done(redis_conn, run_id)
+        except Exception as e:
+            logger.error(f"Failed to count {finished.total()} written check results in progress: {e!r}")
+        finally:
+            await redis_conn.aclose()
+
+    async def close(self) -> None:
+        """Waits for timer flushes and writes the rest of results"""
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        if flushes := [t for t in self._flushes if t.get_loop() is loop]:
+            await asyncio.gather(*flushes, return_exceptions=True)
+        await self.flush()
+
+
+# one buffer per worker process
+result_buffer: ResultBuffer = ResultBuffer(**checker_config["result_buffer"])
@@ -0,0 +1,143 @@
+import asyncio
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import Enum
+from typing import Iterator
+import aiohttp
+
+from configs.config import checker_config
+from proxy_processing.stats import checker_stats
+
+
+class Outcome(Enum):
+    """Classified result of one check attempt"""
+    success = "success"
+    refused = "refused"
+    reset = "reset"
+    timeout = "timeout"
+    protocol_mismatch = "protocol_mismatch"
+    auth_failure = "auth_failure"
+
+
+# only these failures can pass on the next attempt
+TRANSIENT_OUTCOMES: frozenset[Outcome] = frozenset({Outcome.timeout, Outcome.reset})
+
+
+class CheckFailed(Exception):
+    """Raised by checkers (or by on_timeout after last attempt) with classified reason of failure"""
+
+    def __init__(self, outcome: Outcome, details: str = ""):
+        super().__init__(details or outcome.value)
+        self.outcome: Outcome = outcome
+
+
+def classify_error(error: BaseException) -> Outcome:
+    """Converts exception raised by checker to outcome"""
+    if isinstance(error, CheckFailed):
+        return error.outcome
+
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return Outcome.timeout
+
+    # aiohttp wraps errors of connection to proxy
+    if isinstance(error, aiohttp.ClientHttpProxyError):
+        return Outcome.auth_failure if error.status == 407 else Outcome.protocol_mismatch
+    if isinstance(error, aiohttp.ClientConnectorError):
+        return classify_error(error.os_error)
+    if isinstance(error, aiohttp.ServerDisconnectedError):
+        return Outcome.reset
+
+    if isinstance(error, ConnectionRefusedError):
+        return Outcome.refused
+    if isinstance(error, (ConnectionResetError, ConnectionAbortedError, BrokenPipeError, asyncio.IncompleteReadError)):
+        return Outcome.reset
+    if isinstance(error, OSError):
+        # host or network is unreachable, it won't change in a second
+        return Outcome.refused
+
+    # proxy answered something we do not understand
+    return Outcome.protocol_mismatch
+
+
+class RetryPolicy:
+    """
+    Decides whether failed check attempt should be retried.
+    Retries only transient failures (see TRANSIENT_OUTCOMES) with exponential backoff and full jitter.
+    Retries share the budget: every started check adds budget_ratio tokens, every retry takes one,
+    so a batch of mostly dead proxies can not double the work.
+    Every batch has its own policy (see retry_scope), so concurrent batches do not spend budget of each other.
+    Counters of outcomes are published in checker stats with "retry:" prefix.
+    """
+
+    def __init__(
+            self,
+            base_delay: float = 0.2,
+            max_delay: float = 2,
+            budget_ratio: float = 0.2,
+            budget_min: int = 10
+    ):
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.budget_ratio: float = budget_ratio
+        self.budget_min: int = budget_min
+
+        self._tokens: float = budget_min
+
+    def reset(self) -> None:
+        """Resets retry budget"""
+        self._tokens = self.budget_min
+
+    def on_check_started(self) -> None:
+        """Every new check (first attempt) increases budget"""
+        self._tokens += self.budget_ratio
+
+    def record(self, outcome: Outcome) -> None:
+        checker_stats.incr(f"retry:{outcome.value}")
+
+    def should_retry(self, outcome: Outcome, attempt: int, retries: int) -> bool:
+        """
+        :param outcome: outcome of the last attempt
+        :param attempt: number of the last attempt, starts from 0
+        :param retries: max attempts
+        """
+        if outcome not in TRANSIENT_OUTCOMES or attempt >= retries - 1:
+            return False
+
+        if self._tokens < 1:
+            checker_stats.incr("retry:budget_exhausted")
+            return False
+
+        self._tokens -= 1
+        checker_stats.incr("retry:retries")
+        return True
+
+    def backoff(self, attempt: int) -> float:
+        """Returns delay (seconds) before the next attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+# policy of the running batch, it is set by retry_scope
+current_retry_policy: ContextVar[RetryPolicy | None] = ContextVar("current_retry_policy", default=None)
+
+
+@contextmanager
+def retry_scope() -> Iterator[RetryPolicy]:
+    """
+    Creates retry policy with own budget for checks started inside, ex: one per batch
+    Tasks created inside (asyncio.gather) copy context, so they share this policy
+    """
+    token = current_retry_policy.set(RetryPolicy(**checker_config["retry"]))
+    try:
+        yield current_retry_policy.get()
+    finally:
+        current_retry_policy.reset(token)
+
+
+def get_retry_policy() -> RetryPolicy:
+    """Returns policy of the running batch, check outside of retry_scope gets its own policy"""
+    if (policy := current_retry_policy.get()) is None:
+        policy = RetryPolicy(**checker_config["retry"])
+        current_retry_policy.set(policy)
+
+    return policy
@@ -1,22 +1,30 @@
 import asyncio
-from typing import Annotated, Any
+import ipaddress
+import json
+from typing import Annotated, Any, AsyncIterator, Callable, Literal
 import logging
-import brotli
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, Response, Depends
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, Response, Depends, UploadFile, \
+    Header
+from fastapi.responses import StreamingResponse
 from redis.asyncio import Redis as AsyncRedis
-from sqlalchemy import null
+from sqlalchemy import null, select, Row, Select
 from datetime import datetime
 
 from auth_jwt.dependencies import check_auth
 from proxy_processing.exceptions import ProxyProcessingError, NoFormatStringError, UnknownFormatType, \
-    CheckIsRunningError, NoProxiesError
+    CheckIsRunningError, NoProxiesError, ProxySearchQueryError, CheckRunNotFoundError
 from proxy_processing.models import ProxyModel
 from proxy_processing.schemas import SProxy, SAdvancedSearch
 from proxy_processing import repository as proxy_repo
-from proxy_processing.utils import predict_check_time, parse_proxy_dict_from_string
-from proxy_processing.regex import ip_expr
+from proxy_processing.payload import PAYLOAD_COLUMNS, row_to_payload
+from proxy_processing.utils import parse_proxy_dict_from_string
+from proxy_processing.stats import get_stats, reset_stats
+from proxy_processing.bulk_import import import_lines, iter_lines, read_chunks
+from proxy_processing.compression import IDENTITY, choose_encoding, compress_stream
+from proxy_processing.runs import start_run, seal_run, stop_run, stop_runs, get_run_progress
+from proxy_processing.regex import host_expr
 from redis_manager.conn_manager import get_async_conn
-from tasks.tasks import process_proxy_worker
+from tasks.tasks import async_enqueue_checks, CheckEnqueuer
 from tasks.manager import async_celery_manager, celery_manager
 from base_schemas import SResponseAPI
 from websocket import ws_manager
@@ -31,6 +39,53 @@ router = APIRouter(
 
 logger = logging.getLogger(__name__)
 
+# page size of listing endpoints with json output
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+# id of the last proxy of the page, pass it as after_id to get the next page
+NEXT_AFTER_ID_HEADER = "X-Next-After-Id"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# columns needed to write proxy line of downloaded file, id is not needed
+DOWNLOAD_COLUMNS = PAYLOAD_COLUMNS[1:]
+
+
+def dump_proxy(proxy_model: ProxyModel) -> str:
+    return model_to_pydantic(proxy_model, SProxy).model_dump_json()
+
+
+async def ndjson_lines(query: Select, dump: Callable[[ProxyModel], str]) -> AsyncIterator[str]:
+    """Writes proxies as they come from server-side cursor, one json per line"""
+    async for proxy_models in proxy_repo.stream_models(query):
+        yield "".join(f"{dump(m)}\n" for m in proxy_models)
+
+
+async def list_proxies(
+        query: Select,
+        after_id: int,
+        limit: int | None,
+        output: str,
+        response: Response
+) -> dict[str, Any] | StreamingResponse:
+    """
+    Returns proxies of query with keyset pagination by id
+    json - one page of limit proxies (DEFAULT_PAGE_SIZE by default, up to MAX_PAGE_SIZE),
+        if there can be more, id of the last proxy is returned in X-Next-After-Id header
+    ndjson - all proxies after after_id (up to limit) are streamed, neither result nor body is buffered
+    """
+    if output == "ndjson":
+        return StreamingResponse(
+            ndjson_lines(proxy_repo.paginate(query, after_id, limit or -1), dump_proxy),
+            media_type=NDJSON_MEDIA_TYPE
+        )
+
+    limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    proxies: list[ProxyModel] = await proxy_repo.get_page(proxy_repo.paginate(query, after_id, limit))
+
+    if len(proxies) == limit:
+        response.headers[NEXT_AFTER_ID_HEADER] = str(proxies[-1].id)
+
+    return {"status": 0, "data": [model_to_pydantic(m, SProxy) for m in proxies]}
+
 
 @router.post("/add", response_model=SResponseAPI, response_model_exclude_unset=True, tags=["checker"])
 async def add_proxies(
@@ -49,17 +104,13 @@ async def add_proxies(
     # remove duplicated strings
     proxies = list(set(proxies))
 
-
-    # we use two different lists for db optimization
-    # store model with provided protocol to return then proxy with protocol to user
-    to_update: list[tuple[ProxyModel, str] | None] = []
-
-    # key - unique index to prevent duplicate inserts
-    proxies_to_add_unique: dict[str, tuple[ProxyModel, str]] = {}
-
+    # proxy key (ip, port, username, password) -> parsed proxy,
+    # the same proxy with several protocols is written once with all of them
+    parsed: dict[tuple[str, ...], dict[str, Any]] = {}
+    # proxy key -> protocols requested by client, None if client asked to find alive protocols
+    requested: dict[tuple[str, ...], set[str | None]] = {}
 
     bad_proxies: list[str] = []
-    valid_proxies: list[tuple[ProxyModel, str] | None] = []
 
     for i in proxies:
         # validation
@@ -69,103 +120,77 @@ async def add_proxies(
             bad_proxies.append(proxy)
             continue
 
+        proxy.pop("unique_index")
         requested_protocol: str | None = proxy.pop("protocol", None)
 
-        # if proxy exists
-        proxy_model: ProxyModel | None = await proxy_repo.get_model_by_dict(proxy)
-
-        if proxy_model is not None:
-            # proxy exists
-            if requested_protocol:
-                # provided proxy string by client contains protocol
-
-                if getattr(proxy_model, requested_protocol):
-                    # client passed proxy with protocol which is already in database
-                    # or last check returned False on this protocol
-                    # that means client asked to do re-check
-                    logger.info(f"Not adding to db exact the same proxy: {proxy}")
-                else:
-                    # renew proxy with new protocols
-                    logger.debug(f"Added requested protocol {requested_protocol} for {proxy_model.credentials_ip_port}")
-                    proxy_model.protocols_list = list({*proxy_model.protocols_list, requested_protocol})
-
-                    to_update.append((proxy_model, requested_protocol))
-            else:
-                # proxy already exists in database and client didn't pass new protocols
-                logger.info(f"Bypassed exact the same proxy without protocol: {proxy}")
-                # so we just bypass it too
-
-            assert proxy_model is not None
-            valid_proxies.append((proxy_model, requested_protocol))
-        else:
-            # if there is no proxy in database we add it
-            logger.debug(f"Added new proxy {proxy}")
-            unique_index: str = proxy.pop("unique_index")
-            if proxies_to_add_unique.get(unique_index) is not None:
-                logger.warning("Duplicate proxy %s", i)
-                continue
-            proxy_model: ProxyModel = ProxyModel(**proxy)
-            assert proxy_model is not None
-            proxies_to_add_unique[unique_index] = (
-                    proxy_model,
-                    requested_protocol
-                )
-            valid_proxies.append((proxy_model, requested_protocol))
-
-    # update proxies
-    await proxy_repo.update_many([i[0] for i in to_update])
-
-    # convert dict to list
-    to_add: list[tuple[ProxyModel, str | None]] = []
-    for key, value in list(proxies_to_add_unique.items()):
-        to_add.append(
-            value
-        )
+        key: tuple[str, ...] = proxy_repo.proxy_key(proxy)
+        parsed.setdefault(key, {}).update(proxy)
+        requested.setdefault(key, set()).add(requested_protocol)
 
-    # and insert them in database
-    await proxy_repo.insert_many([i[0] for i in to_add])
+    # one lookup and one upsert per chunk instead of query per proxy,
+    # existing proxies get requested protocols, known ones are kept
+    rows, inserted, updated = await proxy_repo.upsert_many(list(parsed.values()))
 
+    logger.info(f"Inserted {inserted} new proxies, {updated} updated")
 
-    logger.info(f"Inserted {len(to_add)} new proxies, {len(to_update)} updated")
+    # every requested protocol of proxy is checked, so client gets proxy with protocol it asked for
+    valid_proxies: list[tuple[Row, str | None]] = [
+        (row, protocol) for row in rows for protocol in requested[proxy_repo.proxy_key(row._asdict())]
+    ]
 
-    # reset initial len
-    initial_len: int = await async_celery_manager.update_initial_len(len(proxies))
+    if not valid_proxies:
+        return {"status": 0, "data": {"incorrect_proxies": bad_proxies}}
 
-    # add proxies to celery
-    for p in valid_proxies:
-        process_proxy_worker.delay(p[0].id, p[1])
+    # add proxies to celery by chunks as a new check run
+    run_id: int = await start_run("add")
+    try:
+        enqueued: int = await async_enqueue_checks(
+            (row_to_payload(row, protocol) for row, protocol in valid_proxies), run_id=run_id
+        )
+    except Exception:
+        # run is never sealed, so workers would never close it
+        await stop_run(run_id)
+        raise
+    await seal_run(run_id)
 
-    logger.info(f"Set {initial_len=}")
+    logger.info(f"Enqueued {enqueued} proxies, check run {run_id}")
 
-    return {"status": 0, "data": {"incorrect_proxies": bad_proxies}}
+    return {"status": 0, "data": {"incorrect_proxies": bad_proxies, "run_id": run_id}}
 
 
 @router.post("/continue_check", response_model=SResponseAPI, response_model_exclude_unset=True, tags=["checker"])
 async def continue_check():
     """
     Starts proxy check for proxies where status is null
-    Returns progress info:
-    "progress": get_progress()
+    Returns progress info of the new check run:
+    "progress": get_progress(run_id)
     """
 
-    # get proxies list
-    proxies: list[ProxyModel] = await proxy_repo.get_filtered_by(ProxyModel.status == null())
+    # amount of proxies to check
+    proxies_len: int = await proxy_repo.count_filtered(ProxyModel.status == null())
 
-    if len(proxies) == 0:
+    if proxies_len == 0:
         return {"status": 0, "data": None}
 
-    # set initial queue len in redis
-    redis_conn: AsyncRedis = get_async_conn()
-    await redis_conn.set("initial_len", len(proxies), predict_check_time(len(proxies)))
+    run_id: int = await start_run("continue")
+    logger.info(f"Enqueue {proxies_len} not checked proxies, check run {run_id}")
 
-    logger.info(f"Set initial_len={len(proxies)}")
-
-    # add proxies to celery
-    for p in proxies:
-        process_proxy_worker.delay(p.id, None)
+    # stream proxies from database straight to celery by chunks, whole table is never loaded
+    try:
+        async with CheckEnqueuer(run_id=run_id) as enqueuer:
+            async for rows in proxy_repo.stream_rows(
+                    PAYLOAD_COLUMNS,
+                    ProxyModel.status == null(),
+                    chunk_size=enqueuer.chunk_size
+            ):
+                await enqueuer.aenqueue(row_to_payload(row, None) for row in rows)
+    except Exception:
+        await stop_run(run_id)
+        raise
+    await seal_run(run_id)
 
     # get actual progress
-    progress: dict[str, int | float] = await async_celery_manager.get_progress()
+    progress: dict[str, Any] = await get_run_progress(run_id)
 
     return {"status": 0, "data": {"progress": progress}}
 
@@ -202,153 +227,231 @@ async def re_run_check(limit: int = -1):
     """
     Restart check for all proxies in database.
     limit: int - cut database output, ordered by status. alive proxies superior to dead ones. -1 = infinite
-    WARNING: too many proxies can get your memory out
-    returns progress
-    "progress": get_progress()
+    Proxies are streamed from database by chunks, so memory does not depend on amount of proxies
+    returns progress of the new check run
+    "progress": get_progress(run_id)
     """
 
-    # get all proxies from database sorted by status (alive > dead)
-    proxies: list[ProxyModel] = await proxy_repo.get_sorted_by(ProxyModel.status, limit=limit)
+    # amount of proxies to check
+    proxies_len: int = await proxy_repo.count_filtered()
+    if limit > 0:
+        proxies_len = min(proxies_len, limit)
 
-    if len(proxies) == 0:
+    if proxies_len == 0:
         return {"status": 0, "data": None}
 
-    # set initial queue len in redis
-    await async_celery_manager.update_initial_len(len(proxies))
+    run_id: int = await start_run("rerun")
+    logger.info(f"Enqueue {proxies_len} proxies to rerun, check run {run_id}")
 
-    # get new len for logs
-    redis_conn: AsyncRedis = get_async_conn()
-    initial_len: int = await redis_conn.get("initial_len")
-    logger.info(f"initial_len={initial_len}")
+    # stream proxies sorted by status (alive > dead) straight to celery by chunks
+    try:
+        async with CheckEnqueuer(run_id=run_id) as enqueuer:
+            async for rows in proxy_repo.stream_rows(
+                    PAYLOAD_COLUMNS,
+                    order_by=ProxyModel.status,
+                    limit=limit,
+                    chunk_size=enqueuer.chunk_size
+            ):
+                await enqueuer.aenqueue(row_to_payload(row, None) for row in rows)
+    except Exception:
+        await stop_run(run_id)
+        raise
+    await seal_run(run_id)
+
+    progress: dict[str, Any] = await get_run_progress(run_id)
 
-    # add proxies to celery
-    for p in proxies:
-        process_proxy_worker.delay(p.id, None)
+    return {"status": 0, "data": {"progress": progress}}
 
-    progress: dict[str, int | float] = await async_celery_manager.get_progress()
 
-    return {"status": 0, "data": {"progress": progress}}
+@router.post("/import", response_model=SResponseAPI, response_model_exclude_unset=True, tags=["database"])
+async def import_proxies(file: UploadFile):
+    """
+    Imports big dump of proxies (one per line) by COPY without checking them,
+    use /continue_check to check imported proxies.
+    Returns counts of proxies:
+    "new": int, "updated": int (got new protocols), "invalid": int
+    """
+    counts: dict[str, int] = await import_lines(iter_lines(read_chunks(file.read)))
+    return {"status": 0, "data": counts}
+
+
+async def download_lines(condition, to_line: Callable[[ProxyModel], str]) -> AsyncIterator[bytes]:
+    """Writes proxies as they come from server-side cursor, one proxy per line"""
+    async for rows in proxy_repo.stream_rows(DOWNLOAD_COLUMNS, condition):
+        yield "".join(f"{to_line(ProxyModel(**row._asdict()))}\n" for row in rows).encode()
 
 
 @router.get("/{mode}/download", tags=["get"])
-async def download(mode: str) -> Response:
+async def download(
+        mode: str,
+        accept_encoding: Annotated[str | None, Header()] = None
+) -> StreamingResponse:
     """
-    Downloads proxies
+    Downloads proxies, file is streamed from server-side cursor and compressed on the fly
     :param mode: 'alive' only or 'all'
-    :return: Response with .txt file generated
+    :param accept_encoding: br (preferred) or gzip, without them file is not compressed
+    :return: StreamingResponse with .txt file generated
     """
-
-    # get proxies from database
     if mode == "alive":
-        proxies: list[ProxyModel] = await proxy_repo.get_alive()
-        # convert them to one string with newline separator
         # including protocol
-        content: str = '\n'.join(str(p) for p in proxies)
+        condition, to_line = proxy_repo.alive_condition(), str
     else:
-        proxies: list[ProxyModel] = await proxy_repo.get_all()
         # dead proxies do not have any protocol, so we return only credentials + ip:port
-        content: str = '\n'.join(p.credentials_ip_port for p in proxies)
+        condition, to_line = None, lambda p: p.credentials_ip_port
 
-    # create headers
-    headers: dict[str, str] = {"Content-Disposition": f"attachment; filename={datetime.utcnow()}.txt"}
+    encoding: str = choose_encoding(accept_encoding)
 
-    # compress it using brotli because brotli is better for text files
-    content: bytes = brotli.compress(content.encode())
-    headers["Content-Encoding"] = "br"
+    # create headers
+    headers: dict[str, str] = {
+        "Content-Disposition": f"attachment; filename={datetime.utcnow()}.txt",
+        "Vary": "Accept-Encoding",
+    }
+    if encoding != IDENTITY:
+        headers["Content-Encoding"] = encoding
 
-    return Response(content, media_type="text/plain", headers=headers)
+    return StreamingResponse(
+        compress_stream(download_lines(condition, to_line), encoding), media_type="text/plain", headers=headers
+    )
 
 
 @router.post("/stop", response_model=SResponseAPI, response_model_exclude_unset=True, tags=["checker"])
-def stop():
-    """Clears celery queue, but does not cancel active tasks"""
-    celery_manager.purge_queues()
-    return {"status": 0}
+async def stop():
+    """Clears celery queue and marks running check runs as stopped, but does not cancel active tasks"""
+    await asyncio.to_thread(celery_manager.purge_queues)
+    stopped: list[int] = await stop_runs()
+    return {"status": 0, "data": {"stopped_runs": stopped}}
 
 
 @router.get("/search", response_model=SResponseAPI, response_model_exclude_unset=True, tags=["get", "search"])
 async def search_ip(
         ip: Annotated[
             str,
-            Query(pattern=ip_expr)
-        ]
+            Query(pattern=host_expr)
+        ],
+        response: Response,
+        after_id: Annotated[int, Query(ge=0)] = 0,
+        limit: Annotated[int | None, Query(ge=1)] = None,
+        output: Literal["json", "ndjson"] = "json"
 ):
     """
-    Search proxies by ip
+    Search proxies by ip (IPv4, IPv6 or hostname)
     Returns list of proxy objects: list[ProxyModel] -> list[dict[str, Any]]
+    Paginated by after_id and limit, or streamed as NDJSON (see list_proxies)
     """
-    proxies: list[ProxyModel] = await proxy_repo.get_by_ip(ip)
-    return {"status": 0, "data": [model_to_pydantic(m, SProxy) for m in proxies]}
+    # stored in normalized form, see parse_proxy_dict_from_string
+    try:
+        ip = ipaddress.ip_address(ip).compressed if ":" in ip else ip.lower()
+    except ValueError:
+        raise ProxySearchQueryError(details=f"Invalid IPv6 address: {ip}")
+
+    return await list_proxies(select(ProxyModel).where(ProxyModel.ip == ip), after_id, limit, output, response)
+
+
+def get_formatter(search_query: SAdvancedSearch) -> Callable[[ProxyModel], str]:
+    """Returns function which formats proxy model to string by format_type of search query"""
+    if search_query.format_type == "normal":
+        return lambda p: p.credentials_ip_port
+    elif search_query.format_type == "url":
+        return str
+    elif search_query.format_type == "custom":
+        if search_query.format_string is None:
+            raise NoFormatStringError()
+
+        # user wants custom formatting
+        return lambda p: search_query.format_string\
+            .replace("%protocol%", p.proto)\
+            .replace("%credentials%", p.credentials)\
+            .replace("%username%", p.username)\
+            .replace("%password%", p.password)\
+            .replace("%ip%", p.ip)\
+            .replace("%port%", p.port)\
+            .replace("%id%", str(p.id))\
+            .replace("%status%", p.status.value if p.status else "")\
+            .replace("%added_at%", str(p.added_at))\
+            .replace("%last_check_at%", str(p.last_check_at))
+
+    # unknown formatting option
+    raise UnknownFormatType()
 
 
 @router.post("/search/advanced",
              response_model=SResponseAPI,
              response_model_exclude_unset=True,
              tags=["get", "search", "advanced"],)
-async def advanced_search(search_query: SAdvancedSearch):
+async def advanced_search(search_query: SAdvancedSearch, response: Response):
     """
     Makes deep search in database and returns formatted proxies
     Returns list of formatted strings: list[ProxyModel] -> list[str]
+    Without sort_by pages are ordered by id, pass X-Next-After-Id header as after_id to get the next page.
+    With output=ndjson strings are streamed, one json string per line
     """
 
-    # get proxy models by prepared query
-    proxy_models: list[ProxyModel] = await proxy_repo.search_with_multiple_params(search_query)
-    proxies: list[str] = []
+    # fails before anything is streamed
+    format_proxy: Callable[[ProxyModel], str] = get_formatter(search_query)
+    query: Select = proxy_repo.build_search_query(search_query)
 
-    # format proxies model -> str
-    if search_query.format_type == "normal":
-        proxies = [p.credentials_ip_port for p in proxy_models]
-    elif search_query.format_type == "url":
-        proxies = [str(p) for p in proxy_models]
-    elif search_query.format_type == "custom":
-        if search_query.format_string is None:
-            raise NoFormatStringError()
-        # user wants custom formatting
-        for p in proxy_models:
-            _ = search_query.format_string\
-                .replace("%protocol%", p.proto)\
-                .replace("%credentials%", p.credentials)\
-                .replace("%username%", p.username)\
-                .replace("%password%", p.password)\
-                .replace("%ip%", p.ip)\
-                .replace("%port%", p.port)\
-                .replace("%id%", str(p.id))\
-                .replace("%status%", p.status.value)\
-                .replace("%added_at%", str(p.added_at))\
-                .replace("%last_check_at%", str(p.last_check_at))
-            proxies.append(_)
+    if search_query.output == "ndjson":
+        return StreamingResponse(
+            ndjson_lines(query, lambda p: json.dumps(format_proxy(p))),
+            media_type=NDJSON_MEDIA_TYPE
+        )
 
-    # unknown formatting option
-    else:
-        raise UnknownFormatType()
+    # get proxy models by prepared query
+    proxy_models: list[ProxyModel] = await proxy_repo.get_page(query)
 
-    return {"status": 0, "data": proxies}
+    # keyset pagination is available only for order by id
+    if 0 < search_query.limit == len(proxy_models) and search_query.sort_by is None:
+        response.headers[NEXT_AFTER_ID_HEADER] = str(proxy_models[-1].id)
+
+    return {"status": 0, "data": [format_proxy(p) for p in proxy_models]}
 
 
 @router.get("/all", response_model=SResponseAPI, response_model_exclude_unset=True)
-async def get_all_proxies():
+async def get_all_proxies(
+        response: Response,
+        after_id: Annotated[int, Query(ge=0)] = 0,
+        limit: Annotated[int | None, Query(ge=1)] = None,
+        output: Literal["json", "ndjson"] = "json"
+):
     """
-    Returns all proxies stored in database
+    Returns proxies stored in database ordered by id
     Returns list of proxy objects: list[ProxyModel] -> list[dict[str, Any]]
+    json output returns one page (after_id, limit), next page starts after X-Next-After-Id header,
+    ndjson output streams all proxies, one object per line
     """
-    proxies: list[ProxyModel] = await proxy_repo.get_all()
-    return {"status": 0, "data": [model_to_pydantic(m, SProxy) for m in proxies]}
+    return await list_proxies(select(ProxyModel), after_id, limit, output, response)
 
 
 @router.get("/alive", response_model=SResponseAPI, response_model_exclude_unset=True)
-async def get_alive_proxies(time_limit: int = 0):
+async def get_alive_proxies(
+        response: Response,
+        time_limit: int = 0,
+        after_id: Annotated[int, Query(ge=0)] = 0,
+        limit: Annotated[int | None, Query(ge=1)] = None,
+        output: Literal["json", "ndjson"] = "json"
+):
     """
-    Returns all good (alive) proxies
+    Returns good (alive) proxies ordered by id
     Returns list of proxy objects: list[ProxyModel] -> list[dict[str, Any]]
+    Paginated by after_id and limit, or streamed as NDJSON (see get_all_proxies)
     """
-    proxies = await proxy_repo.get_alive(time_limit)
-    return {"status": 0, "data": [model_to_pydantic(m, SProxy) for m in proxies]}
+    return await list_proxies(
+        select(ProxyModel).where(proxy_repo.alive_condition(time_limit)), after_id, limit, output, response
+    )
 
 
 @router.get("/progress", response_model=SResponseAPI, response_model_exclude_unset=True)
-async def get_progress_data():
-    """Returns len of current queue and initial len"""
-    # inspects redis list and celery active tasks
+async def get_progress_data(run_id: int | None = None):
+    """
+    Returns len of current queue and initial len of all checks,
+    or progress of one check run with its status, rate (checks/s) and eta (seconds) if run_id is passed
+    """
+    if run_id is not None:
+        if (progress := await get_run_progress(run_id)) is None:
+            raise CheckRunNotFoundError()
+        return {"status": 0, "data": {"progress": progress}}
+
+    # reads progress counters from redis
     # returns dict with information for progressbar (see frontend/js/progressbar.js)
     progress: dict[str, int | float] = await async_celery_manager.get_progress()
     return {
@@ -359,6 +462,22 @@ async def get_progress_data():
     }
 
 
+@router.get("/stats", response_model=SResponseAPI, response_model_exclude_unset=True, tags=["checker"])
+async def get_checker_stats():
+    """
+    Returns counters of check pipeline summed from all workers
+    Ex: "prefilter:checked", "prefilter:timeouts", "prefilter:hit_rate"
+    """
+    return {"status": 0, "data": {"stats": await get_stats()}}
+
+
+@router.delete("/stats", response_model=SResponseAPI, response_model_exclude_unset=True, tags=["checker"])
+async def delete_checker_stats():
+    """Resets counters of check pipeline"""
+    await reset_stats()
+    return {"status": 0}
+
+
 @router.get("/purge/all", response_model=SResponseAPI, response_model_exclude_unset=True, tags=["database"])
 async def purge_all():
     """Purges all proxies from database"""
@@ -0,0 +1,174 @@
+import logging
+import time
+from datetime import datetime, timezone
+
+from redis.asyncio import Redis as AsyncRedis
+
+from proxy_processing.models import CheckRunModel, RunStatus
+from proxy_processing.progress import RUN_COUNTERS, RUN_TTL, run_key, build_progress
+from proxy_processing import repository as proxy_db
+from redis_manager.conn_manager import get_async_conn
+
+logger = logging.getLogger(__name__)
+
+############################################################################
+# Check run is one add, rerun or continue check.
+# Every run has summary row in database (CheckRunModel) and redis hash "check_run:<id>" with
+# counters (enqueued, started, finished, alive, dead), status, kind, creation time and "sealed" flag.
+# Dispatcher increases "enqueued" by chunks and seals the run when everything is enqueued,
+# workers increase the rest and close the run when all sealed checks are finished,
+# so several runs can proceed at the same time without touching each other
+############################################################################
+
+
+async def start_run(kind: str) -> int:
+    """
+    Creates run before its checks are enqueued (see tasks.tasks.CheckEnqueuer)
+    :param kind: add / rerun / continue
+    :return: id of the run
+    """
+    run: CheckRunModel = await proxy_db.create_check_run(kind)
+
+    redis_conn: AsyncRedis = get_async_conn()
+    async with redis_conn.pipeline(transaction=True) as pipe:
+        pipe.hset(run_key(run.id), mapping={
+            "kind": kind,
+            "status": RunStatus.running.value,
+            "created_at": time.time(),
+            "sealed": 0,
+            **{name: 0 for name in RUN_COUNTERS}
+        })
+        pipe.expire(run_key(run.id), RUN_TTL)
+        await pipe.execute()
+    await redis_conn.aclose()
+
+    logger.info(f"Started check run {run.id} ({kind})")
+    return run.id
+
+
+async def seal_run(run_id: int) -> None:
+    """Marks that all checks of the run are enqueued, closes it if workers have already finished them"""
+    redis_conn: AsyncRedis = get_async_conn()
+    await redis_conn.hset(run_key(run_id), "sealed", 1)
+    await finish_run_if_done(redis_conn, run_id)
+    await redis_conn.aclose()
+
+
+def parse_run_hash(data: dict[str, str]) -> dict[str, int]:
+    return {name: int(data.get(name) or 0) for name in RUN_COUNTERS}
+
+
+async def close_run(redis_conn: AsyncRedis, run_id: int, status: RunStatus, counters: dict[str, int]) -> bool:
+    """Writes summary of the run to database and its status to redis hash"""
+    if not await proxy_db.close_check_run(run_id, status, counters):
+        # already closed by another worker
+        return False
+
+    await redis_conn.hset(run_key(run_id), mapping={"status": status.value, "finished_at": time.time()})
+    logger.info(f"Check run {run_id} is {status.value}: {counters}")
+    return True
+
+
+async def finish_run_if_done(redis_conn: AsyncRedis, run_id: int) -> bool:
+    """
+    Closes run if it is sealed and all its checks are finished.
+    Called by dispatcher after sealing and by workers after every batch of the run
+    :return: True if run was closed by this call
+    """
+    data: dict[str, str] = await redis_conn.hgetall(run_key(run_id))
+    if not data or data.get("status") != RunStatus.running.value or data.get("sealed") != "1":
+        return False
+
+    counters: dict[str, int] = parse_run_hash(data)
+    if counters["finished"] < counters["enqueued"]:
+        return False
+
+    return await close_run(redis_conn, run_id, RunStatus.finished, counters)
+
+
+async def stop_run(run_id: int) -> None:
+    """Marks run as stopped, ex: when enqueueing of its checks failed, so it is not running forever"""
+    redis_conn: AsyncRedis = get_async_conn()
+    counters: dict[str, int] = parse_run_hash(await redis_conn.hgetall(run_key(run_id)))
+    await close_run(redis_conn, run_id, RunStatus.stopped, counters)
+    await redis_conn.aclose()
+
+
+async def stop_runs() -> list[int]:
+    """Marks all running runs as stopped, call it after queue is purged"""
+    redis_conn: AsyncRedis = get_async_conn()
+
+    stopped: list[int] = []
+    for run_id in await proxy_db.get_running_check_run_ids():
+        counters: dict[str, int] = parse_run_hash(await redis_conn.hgetall(run_key(run_id)))
+        if await close_run(redis_conn, run_id, RunStatus.stopped, counters):
+            stopped.append(run_id)
+
+    await redis_conn.aclose()
+    return stopped
+
+
+def build_run_progress(
+        run_id: int,
+        kind: str,
+        status: str,
+        counters: dict[str, int],
+        elapsed: float
+) -> dict[str, int | float | str | None]:
+    """
+    Progress of the run with ETA calculated from observed completion rate
+    rate - finished checks per second since the run was started
+    eta - seconds until all enqueued checks are finished, None until the first check is finished
+    """
+    progress: dict[str, int | float | str | None] = {
+        "run_id": run_id,
+        "kind": kind,
+        "status": status,
+        **build_progress(counters),
+        "elapsed": elapsed,
+    }
+
+    progress["rate"] = counters["finished"] / elapsed if elapsed > 0 and counters["finished"] else None
+
+    if status != RunStatus.running.value or progress["current_len"] == 0:
+        progress["eta"] = 0
+    elif progress["rate"]:
+        progress["eta"] = progress["current_len"] / progress["rate"]
+    else:
+        progress["eta"] = None
+
+    return progress
+
+
+async def get_run_progress(run_id: int) -> dict[str, int | float | str | None] | None:
+    """
+    Returns progress of the run from redis hash,
+    when hash is expired (or partially recreated) summary is read from database
+    :return: None if there is no such run
+    """
+    redis_conn: AsyncRedis = get_async_conn()
+    data: dict[str, str] = await redis_conn.hgetall(run_key(run_id))
+    await redis_conn.aclose()
+
+    # hash expired during long run could be recreated by counters of workers without the rest of fields
+    if "kind" in data and "created_at" in data:
+        end: float = float(data["finished_at"]) if "finished_at" in data else time.time()
+        return build_run_progress(
+            run_id, data["kind"], data["status"], parse_run_hash(data), end - float(data["created_at"])
+        )
+
+    if (run := await proxy_db.get_check_run(run_id)) is None:
+        return
+
+    counters: dict[str, int] = {
+        "enqueued": run.enqueued,
+        "started": run.finished,
+        "finished": run.finished,
+        "alive": run.alive,
+        "dead": run.dead
+    }
+    # timestamps are stored in utc
+    end: datetime = run.finished_at or datetime.utcnow()
+    elapsed: float = (end.replace(tzinfo=timezone.utc) - run.created_at.replace(tzinfo=timezone.utc)).total_seconds()
+
+    return build_run_progress(run.id, run.kind, run.status.value, counters, elapsed)
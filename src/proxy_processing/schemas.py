@@ -1,4 +1,7 @@
 from datetime import datetime
+from typing import Literal
+
+from pydantic import Field, model_validator
 
 from proxy_processing.models import Protocol
 from base_schemas import SBase
@@ -18,6 +21,11 @@ class SProxy(SBase):
     socks4: bool | None
     https: bool | None
     http: bool | None
+    latency: float | None = None
+    connect_time: float | None = None
+    handshake_time: float | None = None
+    ttfb: float | None = None
+    throughput: float | None = None
 
     def __repr__(self) -> str:
         return f"{self.ip}:{self.port}"
@@ -44,6 +52,28 @@ class SAdvancedSearch(SBase):
 
     latency: float | None = 999
 
+    # max time of check phases (ms), None means no filter
+    connect_time: float | None = None
+    handshake_time: float | None = None
+    ttfb: float | None = None
+
+    # min download speed (bytes/s), None means no filter
+    throughput: float | None = None
+
+    # sort by latency, phase or throughput, nulls are last
+    sort_by: Literal["latency", "connect_time", "handshake_time", "ttfb", "throughput"] | None = None
+    sort_desc: bool = False
+
+    # keyset pagination: proxies with id > after_id, pages are ordered by id, so it can not be used with sort_by
+    after_id: int = Field(default=0, ge=0)
+    # json - list in one response, ndjson - stream of proxy strings (one json string per line)
+    output: Literal["json", "ndjson"] = "json"
+
+    @model_validator(mode="after")
+    def check_pagination(self) -> "SAdvancedSearch":
+        if self.after_id and self.sort_by is not None:
+            raise ValueError("after_id can not be used with sort_by")
+        return self
 
     def __repr__(self) -> str:
         return str(self.model_dump())
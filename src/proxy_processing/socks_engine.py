@@ -0,0 +1,200 @@
+############################################################################
+# SOCKS4/SOCKS5 checkers implemented as asyncio.Protocol state machines.
+# They do not use StreamReader/StreamWriter, requests are built from
+# preallocated templates and replies are parsed from one buffer, so they are
+# cheaper with 10k+ simultaneous checks. Selected by checker_config["socks_engine"],
+# check_socks4_proxy/check_socks5_proxy from proxy_processing.check are the fallback.
+############################################################################
+
+import asyncio
+import struct
+
+from configs.config import checker_config
+from proxy_processing.utils import on_timeout, mark_and_measure_latency, mark_phase
+from proxy_processing.timeouts import get_adaptive_timeout
+from proxy_processing.retry import CheckFailed, Outcome
+
+SOCKS4_REQUEST_GRANTED = 0x5A
+
+SOCKS5_VERSION = 0x05
+SOCKS5_AUTH_NONE = 0x00
+SOCKS5_AUTH_PASSWORD = 0x02
+SOCKS5_AUTH_UNACCEPTABLE = 0xFF
+SOCKS5_REPLY_SUCCEEDED = 0x00
+
+# VER(1)=4 CMD(1)=connect DSTPORT(2)=80 DSTIP(4)=1.1.1.1, UserID is appended
+SOCKS4_REQUEST_PREFIX = b"\x04\x01\x00\x50\x01\x01\x01\x01"
+SOCKS4_REQUEST_NO_ID = SOCKS4_REQUEST_PREFIX + b"\x00"
+
+# VER NMETHODS METHODS...
+SOCKS5_GREETING_NO_AUTH = bytes((SOCKS5_VERSION, 1, SOCKS5_AUTH_NONE))
+SOCKS5_GREETING_AUTH = bytes((SOCKS5_VERSION, 2, SOCKS5_AUTH_NONE, SOCKS5_AUTH_PASSWORD))
+
+# VER CMD=connect RSV ATYP=IPv4 DST.ADDR=1.1.1.1 DST.PORT=80
+SOCKS5_CONNECT_REQUEST = b"\x05\x01\x00\x01\x01\x01\x01\x01\x00\x50"
+
+
+class SocksCheckProtocol(asyncio.Protocol):
+    """
+    Base state machine of socks check.
+    Sends first packet as soon as connection is made, collects replies in buffer
+    and resolves result future with True/False or exception
+    """
+
+    def __init__(self, result: asyncio.Future):
+        self.result: asyncio.Future = result
+        self.transport: asyncio.Transport | None = None
+        self.buffer: bytearray = bytearray()
+
+    def first_packet(self) -> bytes:
+        raise NotImplementedError
+
+    def parse(self) -> None:
+        """Parses buffer, called after every received chunk"""
+        raise NotImplementedError
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+        transport.write(self.first_packet())
+
+    def data_received(self, data: bytes) -> None:
+        self.buffer += data
+        try:
+            self.parse()
+        except CheckFailed as e:
+            self.finish(error=e)
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        if not self.result.done():
+            # reset is retried, but closed connection means proxy does not speak this protocol
+            self.result.set_exception(exc or CheckFailed(Outcome.protocol_mismatch, "Connection closed by proxy"))
+
+    def finish(self, result: bool | None = None, error: Exception | None = None) -> None:
+        if not self.result.done():
+            if error is not None:
+                self.result.set_exception(error)
+            else:
+                self.result.set_result(result)
+
+        self.transport.close()
+
+
+class Socks4CheckProtocol(SocksCheckProtocol):
+    """Sends connect request and waits for VN(1) REP(1) reply"""
+
+    def __init__(self, result: asyncio.Future, username: str | None = None, password: str | None = None):
+        super().__init__(result)
+
+        if username:
+            user_id: bytes = username.encode()
+            if password:
+                user_id += b":" + password.encode()
+            self.request: bytes = SOCKS4_REQUEST_PREFIX + user_id + b"\x00"
+        else:
+            self.request: bytes = SOCKS4_REQUEST_NO_ID
+
+    def first_packet(self) -> bytes:
+        return self.request
+
+    def parse(self) -> None:
+        if len(self.buffer) >= 2:
+            self.finish(self.buffer[1] == SOCKS4_REQUEST_GRANTED)
+
+
+class Socks5CheckProtocol(SocksCheckProtocol):
+    """
+    States:
+        greeting - waits for VER(1) METHOD(1)
+        auth - waits for VER(1) STATUS(1) of username/password auth (RFC 1929)
+        connect - waits for VER(1) REP(1) of connect request
+    """
+
+    def __init__(self, result: asyncio.Future, username: str | None = None, password: str | None = None):
+        super().__init__(result)
+        self.username: str | None = username
+        self.password: str | None = password
+        self.state: str = "greeting"
+
+    def first_packet(self) -> bytes:
+        return SOCKS5_GREETING_AUTH if self.username and self.password else SOCKS5_GREETING_NO_AUTH
+
+    def auth_packet(self) -> bytes:
+        username: bytes = self.username.encode()
+        password: bytes = self.password.encode()
+        return struct.pack("!BB", 1, len(username)) + username + struct.pack("!B", len(password)) + password
+
+    def parse(self) -> None:
+        while len(self.buffer) >= 2 and not self.result.done():
+            version, code = self.buffer[0], self.buffer[1]
+
+            if self.state == "greeting":
+                del self.buffer[:2]
+                if version != SOCKS5_VERSION:
+                    raise CheckFailed(Outcome.protocol_mismatch, "Unsupported socks5 version")
+
+                if code == SOCKS5_AUTH_NONE:
+                    self.state = "connect"
+                    self.transport.write(SOCKS5_CONNECT_REQUEST)
+                elif code == SOCKS5_AUTH_PASSWORD and self.username and self.password:
+                    self.state = "auth"
+                    self.transport.write(self.auth_packet())
+                elif code == SOCKS5_AUTH_UNACCEPTABLE:
+                    raise CheckFailed(Outcome.auth_failure, "No acceptable auth methods")
+                else:
+                    raise CheckFailed(Outcome.protocol_mismatch, "Unsupported auth method")
+
+            elif self.state == "auth":
+                del self.buffer[:2]
+                if code != 0:
+                    raise CheckFailed(Outcome.auth_failure, "Auth error")
+
+                self.state = "connect"
+                self.transport.write(SOCKS5_CONNECT_REQUEST)
+
+            else:
+                # connect reply, bound address is not needed
+                if version != SOCKS5_VERSION:
+                    raise CheckFailed(Outcome.protocol_mismatch, "Unsupported socks5 version")
+
+                self.finish(code == SOCKS5_REPLY_SUCCEEDED)
+
+
+async def run_protocol_check(
+        protocol_class: type[SocksCheckProtocol],
+        host: str,
+        port: int,
+        username: str | None = None,
+        password: str | None = None
+) -> bool:
+    """Connects protocol state machine to proxy and waits for its result"""
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    result: asyncio.Future = loop.create_future()
+
+    transport, _ = await loop.create_connection(
+        lambda: protocol_class(result, username, password),
+        host,
+        port
+    )
+    mark_phase("connect")
+
+    try:
+        res: bool = await result
+        mark_phase("handshake")
+        return res
+    finally:
+        # also closes connection on timeout (cancellation)
+        transport.close()
+
+
+@on_timeout(timeout=get_adaptive_timeout("socks4"), retries=checker_config["retries"])
+@mark_and_measure_latency("socks4")
+async def check_socks4_proxy(host: str, port: int, username: str = None, password: str = None) -> bool:
+    """socks4(a) proxy checker function, see proxy_processing.check.check_socks4_proxy"""
+    return await run_protocol_check(Socks4CheckProtocol, host, port, username, password)
+
+
+@on_timeout(timeout=get_adaptive_timeout("socks5"), retries=checker_config["retries"])
+@mark_and_measure_latency("socks5")
+async def check_socks5_proxy(host: str, port: int, username: str = None, password: str = None) -> bool:
+    """socks5(a) proxy checker function, see proxy_processing.check.check_socks5_proxy"""
+    return await run_protocol_check(Socks5CheckProtocol, host, port, username, password)
@@ -0,0 +1,65 @@
+from collections import Counter
+from redis.asyncio import Redis as AsyncRedis
+
+from redis_manager.conn_manager import get_async_conn
+from base_utils import sync_compatible
+
+# redis hash where counters of all workers are summed
+STATS_KEY = "checker_stats"
+
+
+class CheckerStats:
+    """
+    Counters of the check pipeline of one worker process.
+    They are accumulated in memory and flushed to redis hash after every task,
+    so redis contains sum of counters from all workers.
+    Names are prefixed with pipeline stage, ex: "prefilter:timeouts"
+    """
+
+    def __init__(self):
+        self._counters: Counter[str] = Counter()
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        self._counters[name] += amount
+
+    def snapshot(self) -> dict[str, int]:
+        """Returns not flushed counters"""
+        return dict(self._counters)
+
+    @sync_compatible
+    async def flush(self) -> None:
+        """Adds counters to redis hash and resets them"""
+        if not self._counters:
+            return
+
+        counters: dict[str, int] = self.snapshot()
+        self._counters.clear()
+
+        redis_conn: AsyncRedis = get_async_conn()
+        async with redis_conn.pipeline(transaction=False) as pipe:
+            for name, value in counters.items():
+                pipe.hincrby(STATS_KEY, name, value)
+            await pipe.execute()
+        await redis_conn.aclose()
+
+
+async def get_stats() -> dict[str, int | float]:
+    """Returns counters of all workers and rates calculated from them"""
+    redis_conn: AsyncRedis = get_async_conn()
+    stats: dict[str, int | float] = {k: int(v) for k, v in (await redis_conn.hgetall(STATS_KEY)).items()}
+    await redis_conn.aclose()
+
+    # part of proxies dropped by pre-filter before protocol checks
+    if stats.get("prefilter:checked"):
+        stats["prefilter:hit_rate"] = stats.get("prefilter:unreachable", 0) / stats["prefilter:checked"]
+
+    return stats
+
+
+async def reset_stats() -> None:
+    redis_conn: AsyncRedis = get_async_conn()
+    await redis_conn.delete(STATS_KEY)
+    await redis_conn.aclose()
+
+
+checker_stats: CheckerStats = CheckerStats()
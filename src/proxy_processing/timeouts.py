@@ -0,0 +1,132 @@
+import math
+
+from configs.config import checker_config
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies (ms) with logarithmic buckets.
+    Uses constant memory, so it can collect latencies of all checks during worker's life.
+    When histogram is full, all counts are halved, so old observations fade out.
+    """
+
+    def __init__(
+            self,
+            min_ms: float = 1,
+            max_ms: float = 60_000,
+            buckets_per_decade: int = 20,
+            window: int = 10_000
+    ):
+        self.min_ms: float = min_ms
+        self.window: int = window
+
+        # upper bounds of buckets: min_ms, min_ms * step, min_ms * step^2, ... max_ms
+        self._step: float = 10 ** (1 / buckets_per_decade)
+        buckets_len: int = math.ceil(math.log(max_ms / min_ms, self._step)) + 1
+        self.bounds: list[float] = [min_ms * self._step ** i for i in range(buckets_len)]
+
+        self._counts: list[int] = [0] * buckets_len
+        self.count: int = 0
+
+    def add(self, latency: float) -> None:
+        """Adds latency (ms) to histogram"""
+        if latency <= self.min_ms:
+            index: int = 0
+        else:
+            index: int = min(math.ceil(math.log(latency / self.min_ms, self._step)), len(self._counts) - 1)
+
+        self._counts[index] += 1
+        self.count += 1
+
+        if self.count >= self.window:
+            self._counts = [c // 2 for c in self._counts]
+            self.count = sum(self._counts)
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Returns upper bound of bucket where q-quantile is
+        :param q: 0..1, ex: 0.99 for p99
+        :return: latency in ms or None if histogram is empty
+        """
+        if not self.count:
+            return
+
+        rank: float = q * self.count
+        cumulative: int = 0
+        for bound, count in zip(self.bounds, self._counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+
+        return self.bounds[-1]
+
+
+class AdaptiveTimeout:
+    """
+    Timeout of protocol check derived from observed latencies of alive proxies:
+    quantile * factor limited by min_ratio of static timeout and ceiling.
+    Until enough latencies are collected, static checker_config["timeout"] is used.
+    Only proxies which answered in time are observed, so quantile tends to fall
+    and cut off slow but working proxies, the lower limit is tied to static timeout because of that
+    """
+
+    def __init__(
+            self,
+            default: float,
+            enabled: bool = True,
+            quantile: float = 0.99,
+            factor: float = 2,
+            ceiling: float = 10,
+            min_samples: int = 100,
+            growth: float = 2,
+            boundary: float = 0.9,
+            min_ratio: float = 0.1
+    ):
+        self.default: float = default
+        self.enabled: bool = enabled
+        self.q: float = quantile
+        self.factor: float = factor
+        self.ceiling: float = ceiling
+        self.min_samples: int = min_samples
+        self.growth: float = growth
+        self.boundary: float = boundary
+        self.min_ratio: float = min_ratio
+
+        self.histogram: LatencyHistogram = LatencyHistogram()
+
+    def observe(self, latency: float) -> None:
+        """Adds latency (ms) of successful check"""
+        self.histogram.add(latency)
+
+    def initial(self) -> float:
+        """Returns timeout (seconds) of the first attempt"""
+        if not self.enabled or self.histogram.count < self.min_samples:
+            return self.default
+
+        timeout: float = self.histogram.quantile(self.q) / 1000 * self.factor
+        return min(max(timeout, self.default * self.min_ratio), self.ceiling)
+
+    def next(self, timeout: float, elapsed: float) -> float:
+        """
+        Returns timeout (seconds) of the next attempt.
+        It is longer only if previous attempt ended near the boundary (most likely timed out),
+        fast failures are retried with the same timeout
+        :param timeout: timeout of previous attempt
+        :param elapsed: seconds spent by previous attempt
+        """
+        if not self.enabled or elapsed < timeout * self.boundary:
+            return timeout
+
+        return max(min(timeout * self.growth, self.ceiling), timeout)
+
+
+# protocol -> timeout, one per worker process
+adaptive_timeouts: dict[str, AdaptiveTimeout] = {}
+
+
+def get_adaptive_timeout(protocol: str) -> AdaptiveTimeout:
+    """Returns adaptive timeout of protocol, creates it on first call"""
+    if protocol not in adaptive_timeouts:
+        adaptive_timeouts[protocol] = AdaptiveTimeout(checker_config["timeout"], **checker_config["adaptive_timeout"])
+
+    return adaptive_timeouts[protocol]
@@ -1,10 +1,13 @@
 import asyncio
+import ipaddress
 import time
+from contextvars import ContextVar
 from functools import wraps
 from typing import Callable, TypeVar, cast, Coroutine, Awaitable
 
 from proxy_processing.regex import proxy_expression
-from configs.config import checker_config
+from proxy_processing.timeouts import AdaptiveTimeout, get_adaptive_timeout
+from proxy_processing.retry import RetryPolicy, Outcome, CheckFailed, classify_error, get_retry_policy
 
 T = TypeVar("T")
 RT = TypeVar("RT")
@@ -21,6 +24,16 @@ def parse_proxy_dict_from_string(proxy_str: str) -> dict[str, str | bool | list]
     # gets match dict and removes all keys where value is None
     proxy_dict: dict = {k: v for k, v in _.groupdict().items() if v is not None}
 
+    if (ipv6 := proxy_dict.pop("ipv6", None)) is not None:
+        # regex only checks charset of IPv6, so validate and normalize it
+        try:
+            proxy_dict["ip"] = ipaddress.IPv6Address(ipv6).compressed
+        except ValueError:
+            return proxy_str
+    else:
+        # hostnames are case-insensitive
+        proxy_dict["ip"] = proxy_dict["ip"].lower()
+
     if proxy_dict.get("protocol") is not None:
         proxy_dict[proxy_dict["protocol"]] = True
 
@@ -31,40 +44,109 @@ def parse_proxy_dict_from_string(proxy_str: str) -> dict[str, str | bool | list]
     return proxy_dict
 
 
-def predict_check_time(length: int) -> float | int:
-    return length * checker_config["timeout"] * checker_config["retries"]
-
-
-def on_timeout(timeout: float | int, retries: int = 3) -> Callable[..., Callable[..., Coroutine[T, T, RT]]]:
+def on_timeout(
+        timeout: float | int | AdaptiveTimeout,
+        retries: int = 3,
+        policy: RetryPolicy | None = None
+) -> Callable[..., Callable[..., Coroutine[T, T, RT]]]:
     """
     Set timeout and retries on async function
-    Timeout also applies if response is tuple with False second argument,
-    Ex: ("socks4", False) means that proxy check failed and we re-check it again
+    Every attempt is classified (see proxy_processing.retry.Outcome), policy decides which of them are retried.
+    By default policy of the running batch is used (see proxy_processing.retry.retry_scope)
+    Response is failed if it is falsy or tuple with False first argument,
+    Ex: (False, "socks4", 10.0, {}) means that proxy answered, but check failed
+    If timeout is AdaptiveTimeout, it is calculated before every call
+    and grows on retry only if previous attempt ended near the timeout
+    After the last failed attempt raises CheckFailed with outcome if function raised an exception
     """
 
     def decorator(func: Callable[..., Coroutine[T, T, RT]]) -> Callable[..., Coroutine[T, T, RT]]:
         @wraps(func)
         async def wrapper(*args: T, **kwargs: T) -> RT:
+            adaptive: bool = isinstance(timeout, AdaptiveTimeout)
+            current_timeout: float = timeout.initial() if adaptive else timeout
+
+            retry_policy: RetryPolicy = policy or get_retry_policy()
+            retry_policy.on_check_started()
+
+            res: RT | None = None
+            error: Exception | None = None
+            outcome: Outcome = Outcome.success
+
             for attempt in range(retries):
+                start_time: float = time.monotonic()
                 try:
-                    res: RT = await asyncio.wait_for(func(*args, **kwargs), timeout)
-                    # Example: ("socks4", False) means that proxy check failed
-                    if isinstance(res, tuple) and not res[1]:
-                        continue
-                    return res
+                    res = await asyncio.wait_for(func(*args, **kwargs), current_timeout)
+                    error = None
                 except Exception as e:
-                    if attempt == retries - 1:
-                        raise e
+                    error = e
+                    outcome = classify_error(e)
+                else:
+                    if res[0] if isinstance(res, tuple) else res:
+                        retry_policy.record(Outcome.success)
+                        return res
+                    outcome = Outcome.protocol_mismatch
+
+                retry_policy.record(outcome)
+
+                if adaptive:
+                    current_timeout = timeout.next(current_timeout, time.monotonic() - start_time)
+
+                if not retry_policy.should_retry(outcome, attempt, retries):
+                    break
+
+                await asyncio.sleep(retry_policy.backoff(attempt))
+
+            if error is not None:
+                raise CheckFailed(outcome, str(error)) from error
+
+            return res
 
         return wrapper
 
     return decorator
 
 
-def mark_and_measure_latency(protocol: str) -> Callable[..., Callable[..., Coroutine[T, T, tuple[RT, str, float]]]]:
+class PhaseTimer:
+    """
+    Measures phases of one check (connect, handshake, ttfb) with monotonic high-resolution clock.
+    Every mark stores time (ms) passed since the previous mark
+    """
+
+    def __init__(self):
+        self.started_at: float = time.perf_counter()
+        self._last_mark: float = self.started_at
+        self.phases: dict[str, float] = {}
+
+    def mark(self, phase: str) -> None:
+        now: float = time.perf_counter()
+        self.phases[phase] = (now - self._last_mark) * 1000
+        self._last_mark = now
+
+    @property
+    def elapsed(self) -> float:
+        """Returns ms passed since start"""
+        return (time.perf_counter() - self.started_at) * 1000
+
+
+# timer of the running check, it is set by mark_and_measure_latency
+current_phase_timer: ContextVar[PhaseTimer | None] = ContextVar("current_phase_timer", default=None)
+
+
+def mark_phase(phase: str) -> None:
+    """Marks end of phase of the running check, does nothing outside of mark_and_measure_latency"""
+    if (timer := current_phase_timer.get()) is not None:
+        timer.mark(phase)
+
+
+def mark_and_measure_latency(
+        protocol: str
+) -> Callable[..., Callable[..., Coroutine[T, T, tuple[RT, str, float, dict[str, float]]]]]:
     """
     Registers protocol on check function and measure latency of proxy
-    bool -> (bool, protocol: str, latency: float (ms))
+    Check function can measure its phases with mark_phase("connect"), mark_phase("handshake") etc.
+    Latencies of successful checks are collected by adaptive timeout of protocol
+    bool -> (bool, protocol: str, latency: float (ms), phases: dict[str, float (ms)])
     Ex:
     @mark_and_measure_latency("socks4")
     async def some_check(proxy) -> bool:
@@ -72,17 +154,26 @@ def mark_and_measure_latency(protocol: str) -> Callable[..., Callable[..., Corou
 
     res = await some_check(proxy)
     print(res)
-    # (True, "socks4", 1000.11)
+    # (True, "socks4", 1000.11, {"connect": 400.1, "handshake": 600.01})
     """
 
-    def decorator(func: Callable[..., Coroutine[T, T, RT]]) -> Callable[..., Coroutine[T, T, tuple[RT, str, float]]]:
+    def decorator(
+            func: Callable[..., Coroutine[T, T, RT]]
+    ) -> Callable[..., Coroutine[T, T, tuple[RT, str, float, dict[str, float]]]]:
         @wraps(func)
-        async def wrapper(*args: T, **kwargs: T) -> tuple[RT, str, float]:
-            start_time: float = time.time()
-            res: RT = await func(*args, **kwargs)
-            latency: float = time.time() - start_time
-            return res, protocol, latency * 1000  # convert latency from seconds to ms
-
-        return cast(Callable[..., Coroutine[T, T, tuple[RT, str, float]]], wrapper)
+        async def wrapper(*args: T, **kwargs: T) -> tuple[RT, str, float, dict[str, float]]:
+            timer: PhaseTimer = PhaseTimer()
+            token = current_phase_timer.set(timer)
+            try:
+                res: RT = await func(*args, **kwargs)
+            finally:
+                current_phase_timer.reset(token)
+
+            latency: float = timer.elapsed
+            if res:
+                get_adaptive_timeout(protocol).observe(latency)
+            return res, protocol, latency, timer.phases
+
+        return cast(Callable[..., Coroutine[T, T, tuple[RT, str, float, dict[str, float]]]], wrapper)
 
     return decorator
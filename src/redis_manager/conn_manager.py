@@ -1,11 +1,40 @@
-from redis.asyncio import Redis as AsyncRedis
-from redis import Redis
+import asyncio
+from weakref import WeakKeyDictionary
+
+from redis.asyncio import Redis as AsyncRedis, ConnectionPool as AsyncConnectionPool
+from redis import Redis, ConnectionPool
 from configs.config import redis_config
 
+# one pool per process, redis-py recreates its connections after fork
+_pool: ConnectionPool = ConnectionPool(**redis_config)
+
+# async connections are bound to event loop, so every loop has its own pool
+_async_pools: WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncConnectionPool] = WeakKeyDictionary()
+
 
 def get_async_conn() -> AsyncRedis:
-    return AsyncRedis(**redis_config)
+    """
+    Returns client which uses pool of the running event loop,
+    so connections are reused instead of being opened on every call.
+    Outside of event loop client has its own connections
+    """
+    try:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    except RuntimeError:
+        return AsyncRedis(**redis_config)
+
+    if (pool := _async_pools.get(loop)) is None:
+        pool = _async_pools[loop] = AsyncConnectionPool(**redis_config)
+
+    # aclose() of this client does not close shared pool
+    return AsyncRedis(connection_pool=pool)
+
+
+async def close_async_pool() -> None:
+    """Closes connections of the running event loop, call it before loop is closed"""
+    if (pool := _async_pools.pop(asyncio.get_running_loop(), None)) is not None:
+        await pool.disconnect()
 
 
 def get_conn() -> Redis:
-    return Redis(**redis_config)
+    return Redis(connection_pool=_pool)
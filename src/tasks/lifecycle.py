@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Coroutine, TypeVar
+
+from database import async_engine
+from redis_manager.conn_manager import close_async_pool
+from proxy_processing.context import checker_context
+from proxy_processing.results import result_buffer
+from proxy_processing.stats import checker_stats
+
+logger = logging.getLogger(__name__)
+
+RT = TypeVar("RT")
+
+
+async def close_worker_resources() -> None:
+    """
+    Writes buffered results and counters, then closes resources bound to the event loop of the worker:
+    aiohttp session, redis pool and database pool. Must be run on the loop which used them
+    """
+    await result_buffer.close()
+    await checker_stats.flush()
+    await checker_context.close()
+    await close_async_pool()
+    await async_engine.dispose()
+
+
+class WorkerLoop:
+    """
+    One persistent event loop per worker process.
+    Loop runs forever in background thread, tasks submit their coroutines to it,
+    so aiohttp session, database and redis pools live as long as the process
+    instead of being created (and leaked) by every task.
+    Loop is started on worker_process_init, or lazily by the first task (ex: solo pool)
+    """
+
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        # thread of parent process does not exist in forked child
+        return self._pid == os.getpid() and self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+
+            self._loop = asyncio.new_event_loop()
+            result_buffer.bind(self._loop)
+            self._thread = threading.Thread(target=self._run_forever, name="worker-loop", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+        logger.debug(f"Started event loop of worker process {self._pid}")
+
+    def _run_forever(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def run(self, coro: Coroutine[None, None, RT]) -> RT:
+        """Runs coroutine on the loop of the process and waits for its result"""
+        if not self.running:
+            self.start()
+
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def stop(self) -> None:
+        """Closes resources of the worker and stops the loop"""
+        if not self.running:
+            return
+
+        try:
+            self.run(close_worker_resources())
+        except Exception as e:
+            logger.error(f"Failed to close resources of worker process {self._pid}: {e!r}")
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+        logger.debug(f"Stopped event loop of worker process {self._pid}")
+        self._loop = self._thread = self._pid = None
+
+
+# one loop per worker process
+worker_loop: WorkerLoop = WorkerLoop()
@@ -2,7 +2,7 @@ from celery import Celery
 from redis import Redis
 from redis.asyncio import Redis as AsyncRedis
 
-from proxy_processing.utils import predict_check_time
+from proxy_processing.progress import PROGRESS_KEYS, get_counters, build_progress
 from redis_manager.conn_manager import get_conn, get_async_conn
 from tasks.tasks import broker
 from abc import ABC
@@ -10,90 +10,48 @@ from abc import ABC
 
 class AbstractCeleryManager(ABC):
     """
-    Abstract class that provides methods to control and inspect celery
+    Abstract class that provides methods to control celery
     """
     def __init__(self, celery: Celery):
         self.broker = celery
-        self.inspector = celery.control.inspect()
 
     def purge_queues(self) -> None:
-        """Purges celery queue"""
+        """Purges celery queue and progress counters"""
         self.broker.control.purge()
-
-    @property
-    def active_tasks_len(self) -> int:
-        """Returns active (running) tasks"""
-        counter: int = 0
-        if active := self.inspector.active():
-            for worker, tasks in active.items():
-                counter += len(tasks)
-
-        return counter
-
-    @property
-    def reserved_tasks_len(self) -> int:
-        """Returns reserved (scheduled) tasks"""
-        counter: int = 0
-        if reserved := self.inspector.reserved():
-            for worker, tasks in reserved.items():
-                counter += len(tasks)
-
-        return counter
+        get_conn().delete(*PROGRESS_KEYS)
 
 
 class AsyncCeleryManager(AbstractCeleryManager):
-    """Async class to control celery tasks queue"""
-    def __init__(self, celery, *args, **kwargs):
-        super().__init__(celery)
-        self.async_redis: AsyncRedis = get_async_conn()
+    """
+    Async class to control celery tasks queue.
+    Progress is read from redis counters (see proxy_processing.progress),
+    workers are never inspected, so endpoints do not wait for broadcast replies
+    """
 
     async def get_redis_celery_len(self) -> int:
         """
-        Returns amount of tasks from redis
-        NOTE: Celery stores tasks not only in redis, but also +- 4 in reserved mode for every worker.
-        So, actual formular should be redis['celery'] + workers + workers*4
+        Returns amount of task messages from redis
+        NOTE: one message contains a chunk of proxies (see tasks.tasks.enqueue_checks)
         """
-        return int(await self.async_redis.llen("celery") | 0)
-
-    async def set_redis_initial_len(self, value: int) -> None:
-        await self.async_redis.set("initial_len", value, predict_check_time(value))
-
-    async def get_initial_len(self) -> int:
-        return int(await self.async_redis.get("initial_len") or 0)
+        redis_conn: AsyncRedis = get_async_conn()
+        length: int = int(await redis_conn.llen("celery") or 0)
+        await redis_conn.aclose()
+        return length
 
     async def get_current_len(self) -> int:
-        """Returns total tasks in redis + celery"""
-        return await self.get_redis_celery_len() + self.active_tasks_len + self.reserved_tasks_len
-
-    async def update_initial_len(self, additional_proxies_len: int = 0) -> int:
-        current_len: int = await self.get_current_len()
-        await self.set_redis_initial_len(additional_proxies_len + current_len)
-        return additional_proxies_len + current_len
+        """Returns amount of proxies which are waiting in queue or being checked"""
+        return (await self.get_progress())["current_len"]
 
     async def get_progress(self) -> dict[str, int | float]:
-        context: dict[str, int | float] = {
-            "current_len": await self.get_current_len()
-        }
-
-        # how many proxies was pushed initially
-        # if there is no value in redis, we use current len
-        context["initial_len"] = int(await self.get_initial_len() or context["current_len"])
-
-        # width calc
-        context["progressbar_width"] = 100 - (
-            (100 * context["current_len"] / context["initial_len"]) if context["initial_len"] > 0 else 0
-        )
-
-        # value_now
-        context["value_now"] = context["initial_len"] - context["current_len"]
+        redis_conn: AsyncRedis = get_async_conn()
+        progress: dict[str, int | float] = build_progress(await get_counters(redis_conn))
 
         # if last check is finished, the list with fresh good proxies in cache is no longer required,
-        if context["progressbar_width"] >= 100:
-            await self.async_redis.expire("good_proxies", 120)
-
-        return context
-
+        if progress["progressbar_width"] >= 100:
+            await redis_conn.expire("good_proxies", 120)
 
+        await redis_conn.aclose()
+        return progress
 
 
 class CeleryManager(AbstractCeleryManager):
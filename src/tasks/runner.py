@@ -0,0 +1,223 @@
+############################################################################
+# Checker runner - alternative to celery worker for check tasks.
+# Starts one process per core, every process has one persistent event loop
+# which runs many check tasks from celery queue at the same time.
+# Celery prefork worker runs one task per process and blocks on run_until_complete.
+#
+# Usage: cd src && python -m tasks.runner --processes 4 --batches 8
+############################################################################
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from multiprocessing.synchronize import Event
+
+from kombu import Connection, Consumer, Message, Queue
+
+from proxy_processing.process import process_proxies_batch
+from proxy_processing.payload import CheckPayload
+from proxy_processing.results import result_buffer
+from tasks.lifecycle import close_worker_resources
+from tasks.tasks import broker, validate_protocols, process_proxy_worker, process_proxies_batch_worker
+
+logger = logging.getLogger(__name__)
+
+
+def count_sockets() -> int | None:
+    """Returns amount of open sockets of current process, None if /proc is not available"""
+    try:
+        fds: list[str] = os.listdir("/proc/self/fd")
+    except OSError:
+        return
+
+    sockets: int = 0
+    for fd in fds:
+        try:
+            if os.readlink(f"/proc/self/fd/{fd}").startswith("socket:"):
+                sockets += 1
+        except OSError:
+            # fd was closed while we were counting
+            continue
+
+    return sockets
+
+
+def parse_task(name: str, args: list, kwargs: dict) -> tuple[list[CheckPayload], bool, int | None]:
+    """
+    Converts arguments of check task to list of payloads (or old (proxy id, protocol) pairs),
+    flag if proxies are counted in progress (only batches are enqueued by enqueue_checks) and id of check run
+    """
+    run_id: int | None = None
+    if name == process_proxy_worker.name:
+        proxies: list[CheckPayload] = [[
+            kwargs.get("proxy_id", args[0] if args else None),
+            kwargs.get("protocol", args[1] if len(args) > 1 else None)
+        ]]
+    elif name == process_proxies_batch_worker.name:
+        proxies: list[CheckPayload] = list(kwargs.get("proxies", args[0] if args else []))
+        run_id = kwargs.get("run_id", args[1] if len(args) > 1 else None)
+    else:
+        raise ValueError(f"Unknown task: {name}")
+
+    validate_protocols(proxies)
+    return proxies, name == process_proxies_batch_worker.name, run_id
+
+
+class CheckerProcess:
+    """
+    One process of runner.
+    Consumer thread receives task messages and passes them to the event loop of the main thread,
+    at most max_batches tasks are run at the same time (every batch runs up to checker_config["concurrency"] checks)
+    """
+
+    def __init__(self, index: int, stop: Event, max_batches: int):
+        self.index: int = index
+        self.stop: Event = stop
+        self.max_batches: int = max_batches
+
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.slots: threading.BoundedSemaphore = threading.BoundedSemaphore(max_batches)
+        self.running: set[asyncio.Task] = set()
+
+        # report
+        self.tasks_done: int = 0
+        self.tasks_failed: int = 0
+        self.proxies_checked: int = 0
+        self.peak_sockets: int | None = None
+
+    def run(self) -> None:
+        """Enter point of child process"""
+        signal.signal(signal.SIGINT, lambda *_: self.stop.set())
+        signal.signal(signal.SIGTERM, lambda *_: self.stop.set())
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        result_buffer.bind(self.loop)
+
+        started_at: float = time.perf_counter()
+        consumer: threading.Thread = threading.Thread(target=self.consume, daemon=True)
+        consumer.start()
+
+        try:
+            self.loop.run_until_complete(self.watch(consumer))
+            self.loop.run_until_complete(close_worker_resources())
+        finally:
+            self.loop.close()
+
+        self.report(time.perf_counter() - started_at)
+
+    async def watch(self, consumer: threading.Thread) -> None:
+        """Samples sockets until stop, then waits for running tasks"""
+        while not self.stop.is_set():
+            self.sample_sockets()
+            await asyncio.sleep(1)
+
+        logger.info(f"Checker process {self.index} is stopping, waiting for {len(self.running)} tasks")
+        await self.loop.run_in_executor(None, consumer.join)
+
+        while self.running:
+            await asyncio.gather(*self.running, return_exceptions=True)
+
+    def sample_sockets(self) -> None:
+        sockets: int | None = count_sockets()
+        if sockets is not None:
+            self.peak_sockets = max(self.peak_sockets or 0, sockets)
+
+    def consume(self) -> None:
+        """Consumer thread: receives messages from celery queue until stop"""
+        queue: Queue = Queue(broker.conf.task_default_queue)
+
+        with broker.connection_for_read() as conn:
+            conn: Connection
+            with Consumer(conn, queues=[queue], callbacks=[self.on_message], accept=["json"]):
+                while not self.stop.is_set():
+                    try:
+                        conn.drain_events(timeout=1)
+                    except socket.timeout:
+                        continue
+
+    def on_message(self, body: list, message: Message) -> None:
+        # wait for a free slot, so prefetched messages are not piled up in memory
+        while not self.slots.acquire(timeout=1):
+            if self.stop.is_set():
+                # message is not acknowledged, broker will redeliver it
+                message.requeue()
+                return
+
+        name: str = message.headers.get("task", "")
+        args, kwargs = body[0], body[1]
+
+        try:
+            proxies, tracked, run_id = parse_task(name, args, kwargs)
+        except (ValueError, TypeError, IndexError) as e:
+            logger.error(f"Rejected task {name}: {e}")
+            self.slots.release()
+            message.reject()
+            return
+
+        # like celery (without acks_late) message is acknowledged before execution
+        message.ack()
+        self.loop.call_soon_threadsafe(self.start_task, proxies, tracked, run_id)
+
+    def start_task(self, proxies: list[CheckPayload], tracked: bool, run_id: int | None) -> None:
+        task: asyncio.Task = self.loop.create_task(self.check(proxies, tracked, run_id))
+        self.running.add(task)
+        task.add_done_callback(self.running.discard)
+
+    async def check(self, proxies: list[CheckPayload], tracked: bool, run_id: int | None) -> None:
+        try:
+            await process_proxies_batch(proxies, tracked, run_id)
+        except Exception as e:
+            self.tasks_failed += 1
+            logger.exception(f"Error during check of {len(proxies)} proxies: {e}")
+        else:
+            self.tasks_done += 1
+            self.proxies_checked += len(proxies)
+        finally:
+            self.slots.release()
+
+    def report(self, elapsed: float) -> None:
+        logger.info(
+            f"Checker process {self.index}: {self.tasks_done} tasks done, {self.tasks_failed} failed, "
+            f"{self.proxies_checked} proxies in {elapsed:.1f}s ({self.proxies_checked / elapsed:.1f} proxies/s), "
+            f"peak sockets: {self.peak_sockets if self.peak_sockets is not None else 'unknown'}"
+        )
+
+
+def run_process(index: int, stop: Event, max_batches: int) -> None:
+    CheckerProcess(index, stop, max_batches).run()
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Multi-process proxy checker runner")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="amount of processes, cores by default")
+    parser.add_argument("--batches", type=int, default=8, help="max simultaneous tasks of one process")
+    args: argparse.Namespace = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+
+    stop: Event = multiprocessing.Event()
+    processes: list[multiprocessing.Process] = [
+        multiprocessing.Process(target=run_process, args=(i, stop, args.batches), name=f"checker-{i}")
+        for i in range(args.processes)
+    ]
+
+    for process in processes:
+        process.start()
+
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    logger.info(f"Started {len(processes)} checker processes")
+
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,23 @@
+import asyncio
 import logging
 import time
+from contextlib import ExitStack
+from typing import Iterable
 
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
+from kombu import Producer
+from redis import Redis
 
-from configs.config import REDIS_HOST, REDIS_PORT
-from proxy_processing.process import process_proxy
+from configs.config import REDIS_HOST, REDIS_PORT, checker_config
+from database import async_engine
+from proxy_processing.process import process_proxy, process_proxies_batch
 from proxy_processing.models import Protocol
-
+from proxy_processing.payload import CheckPayload, get_id_and_protocol
+from proxy_processing.progress import ENQUEUED_KEY, RUN_TTL, reset_if_idle, run_key
+from redis_manager.conn_manager import get_conn
+from base_utils import chunked
+from tasks.lifecycle import worker_loop
 
 
 broker = Celery('tasks', broker=f'redis://{REDIS_HOST}:{REDIS_PORT}')
@@ -15,6 +26,31 @@ broker.conf.broker_connection_retry_on_startup = True
 logger = logging.getLogger(__name__)
 
 
+@worker_process_init.connect
+def on_worker_process_init(**_) -> None:
+    """Creates event loop of the process, all check tasks of this process run on it"""
+    # connections inherited from parent process must not be used (or closed) by child
+    async_engine.sync_engine.dispose(close=False)
+    worker_loop.start()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def on_worker_shutdown(**_) -> None:
+    """Writes buffered results and closes pools of the process (worker_shutdown covers solo pool)"""
+    worker_loop.stop()
+
+
+def validate_protocols(proxies: list[CheckPayload]) -> None:
+    """Raises ValueError if some requested protocol is unknown"""
+    valid_protocols: list[str] = [p.value for p in list(Protocol)]
+
+    for proxy_id, protocol in map(get_id_and_protocol, proxies):
+        if protocol is not None and protocol not in valid_protocols:
+            logger.error(f"Invalid protocol: {protocol} for proxy with {proxy_id=}")
+            raise ValueError(f"Invalid protocol: {protocol} for proxy with {proxy_id=}")
+
+
 @broker.task
 def process_proxy_worker(proxy_id: int, protocol: str | None) -> None:
     """
@@ -32,5 +68,130 @@ def process_proxy_worker(proxy_id: int, protocol: str | None) -> None:
 
     # proceed
     logger.debug(f"Processing proxy with args: {proxy_id=}, {protocol=}")
-    process_proxy(proxy_id, protocol)
+    worker_loop.run(process_proxy(proxy_id, protocol))
+
+
+@broker.task
+def process_proxies_batch_worker(proxies: list[CheckPayload], run_id: int | None = None) -> None:
+    """
+    Starts check of a chunk of proxies in one event loop using process_proxies_batch enter point
+    :param proxies: list of payloads with proxy data and requested protocol (see proxy_processing.payload)
+        or old (ProxyModel.id, socks4/5 or http(s) or None)
+    :param run_id: check run of these proxies (see proxy_processing.runs), None for old messages
+    :return: None
+    """
+    # verify if protocols are valid
+    validate_protocols(proxies)
+
+    # proceed
+    logger.debug(f"Processing batch of {len(proxies)} proxies")
+    worker_loop.run(process_proxies_batch(proxies, run_id=run_id))
+
+
+class CheckEnqueuer:
+    """
+    Publishes checks by chunks (process_proxies_batch_worker tasks) through one producer connection
+    instead of one message per proxy.
+    "progress:enqueued" counter is increased before publishing, workers count started and finished checks,
+    so progress is read from redis (see proxy_processing.progress).
+    If run_id is passed, chunks are counted in hash of that run too, seal the run after enqueuer is closed
+    Redis and broker clients are blocking, so in async code use `async with` and aenqueue,
+    they run every chunk in a thread and do not block the event loop.
+    Example:
+        run_id = await start_run("rerun")
+        async with CheckEnqueuer(run_id=run_id) as enqueuer:
+            async for rows in proxy_repo.stream_rows(PAYLOAD_COLUMNS):
+                await enqueuer.aenqueue(row_to_payload(row, None) for row in rows)
+        await seal_run(run_id)
+    """
+
+    def __init__(self, chunk_size: int | None = None, run_id: int | None = None):
+        self.chunk_size: int = chunk_size or checker_config["batch_size"]
+        self.run_id: int | None = run_id
+        self.enqueued: int = 0
+
+        self._redis: Redis | None = None
+        self._producer: Producer | None = None
+        self._stack: ExitStack = ExitStack()
+
+    def __enter__(self) -> "CheckEnqueuer":
+        self._redis = get_conn()
+
+        # new check starts progress from zero, proxies added during running check extend its progress
+        if reset_if_idle(self._redis):
+            logger.debug("Progress counters are reset")
+
+        self._producer = self._stack.enter_context(broker.producer_or_acquire())
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._stack.close()
+        self._redis.close()
+        logger.debug(f"Enqueued {self.enqueued} proxies")
+
+    async def __aenter__(self) -> "CheckEnqueuer":
+        return await asyncio.to_thread(self.__enter__)
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await asyncio.to_thread(self.__exit__, exc_type, exc, tb)
+
+    def _publish(self, chunk: list[CheckPayload]) -> None:
+        """Counts chunk in progress and publishes it as one task"""
+        kwargs: dict[str, int] = {"run_id": self.run_id} if self.run_id is not None else {}
+
+        with self._redis.pipeline(transaction=False) as pipe:
+            pipe.incrby(ENQUEUED_KEY, len(chunk))
+            if self.run_id is not None:
+                pipe.hincrby(run_key(self.run_id), "enqueued", len(chunk))
+                pipe.expire(run_key(self.run_id), RUN_TTL)
+            pipe.execute()
+
+        process_proxies_batch_worker.apply_async((chunk,), kwargs, producer=self._producer)
+        self.enqueued += len(chunk)
+
+    def enqueue(self, proxies: Iterable[CheckPayload]) -> int:
+        """
+        :param proxies: iterable of payloads (see proxy_processing.payload), can be a generator
+        :return: amount of enqueued proxies
+        """
+        enqueued: int = 0
+        for chunk in chunked(proxies, self.chunk_size):
+            self._publish(chunk)
+            enqueued += len(chunk)
+
+        return enqueued
+
+    async def aenqueue(self, proxies: Iterable[CheckPayload]) -> int:
+        """The same as enqueue, but every chunk is published in a thread, so event loop is not blocked"""
+        enqueued: int = 0
+        for chunk in chunked(proxies, self.chunk_size):
+            await asyncio.to_thread(self._publish, chunk)
+            enqueued += len(chunk)
+
+        return enqueued
+
+
+def enqueue_checks(
+        proxies: Iterable[CheckPayload],
+        chunk_size: int | None = None,
+        run_id: int | None = None
+) -> int:
+    """
+    Enqueues checks by chunks, see CheckEnqueuer
+    :param proxies: iterable of payloads (see proxy_processing.payload), can be a generator
+    :param chunk_size: proxies in one task, checker_config["batch_size"] by default
+    :param run_id: check run of these proxies, it must be sealed after that
+    :return: amount of enqueued proxies
+    """
+    with CheckEnqueuer(chunk_size, run_id) as enqueuer:
+        return enqueuer.enqueue(proxies)
+
 
+async def async_enqueue_checks(
+        proxies: Iterable[CheckPayload],
+        chunk_size: int | None = None,
+        run_id: int | None = None
+) -> int:
+    """enqueue_checks for async code, event loop is not blocked by publishing (see CheckEnqueuer.aenqueue)"""
+    async with CheckEnqueuer(chunk_size, run_id) as enqueuer:
+        return await enqueuer.aenqueue(proxies)
@@ -0,0 +1,121 @@
+from typing import Any, Callable
+
+import pytest
+
+###########################################################
+# in-memory redis shared by tests of progress, runs, stats and results
+# only commands used by the app are implemented
+###########################################################
+
+
+class FakePipeline:
+    """Commands are applied immediately, execute() only finishes the pipeline"""
+
+    def __init__(self, redis: "FakeRedis"):
+        self.redis: FakeRedis = redis
+
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        pass
+
+    async def execute(self) -> None:
+        pass
+
+    def multi(self) -> None:
+        pass
+
+    def incrby(self, key: str, amount: int = 1) -> None:
+        self.redis.values[key] = self.redis.values.get(key, 0) + amount
+
+    def mget(self, *keys: str) -> list[str | None]:
+        return [str(self.redis.values[key]) if key in self.redis.values else None for key in keys]
+
+    def hincrby(self, key: str, name: str, amount: int = 1) -> None:
+        values: dict[str, str] = self.redis.hashes.setdefault(key, {})
+        values[name] = str(int(values.get(name, 0)) + amount)
+
+    def hset(self, key: str, name: str | None = None, value: Any = None, mapping: dict | None = None) -> None:
+        values: dict[str, str] = self.redis.hashes.setdefault(key, {})
+        if name is not None:
+            values[name] = str(value)
+        values.update({k: str(v) for k, v in (mapping or {}).items()})
+
+    def hgetall(self, key: str) -> dict[str, str]:
+        return dict(self.redis.hashes.get(key, {}))
+
+    def expire(self, key: str, seconds: int) -> None:
+        self.redis.expires[key] = seconds
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.redis.values.pop(key, None)
+            self.redis.hashes.pop(key, None)
+
+    def rpush(self, key: str, *values: str) -> None:
+        self.redis.lists.setdefault(key, []).extend(values)
+
+
+class FakeRedis:
+    """Async client (see redis_manager.conn_manager.get_async_conn), every command is a coroutine"""
+
+    def __init__(self):
+        self.values: dict[str, int] = {}
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.lists: dict[str, list[str]] = {}
+        self.expires: dict[str, int] = {}
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    def __getattr__(self, name: str) -> Callable:
+        command: Callable = getattr(FakePipeline(self), name)
+
+        async def run(*args, **kwargs) -> Any:
+            return command(*args, **kwargs)
+
+        return run
+
+    async def aclose(self) -> None:
+        pass
+
+
+class FakeSyncPipeline(FakePipeline):
+    def __enter__(self) -> "FakeSyncPipeline":
+        return self
+
+    def __exit__(self, *_) -> None:
+        pass
+
+    def execute(self) -> None:
+        pass
+
+
+class FakeSyncRedis(FakeRedis):
+    """Blocking client (see redis_manager.conn_manager.get_conn)"""
+
+    def pipeline(self, transaction: bool = True) -> FakeSyncPipeline:
+        return FakeSyncPipeline(self)
+
+    def transaction(self, func: Callable, *_, value_from_callable: bool = False) -> Any:
+        result: Any = func(self.pipeline())
+        return result if value_from_callable else None
+
+    def __getattr__(self, name: str) -> Callable:
+        return getattr(FakeSyncPipeline(self), name)
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def fake_redis() -> FakeRedis:
+    """Patch get_async_conn of the module under test with `lambda: fake_redis`"""
+    return FakeRedis()
+
+
+@pytest.fixture
+def fake_sync_redis() -> FakeSyncRedis:
+    """Patch get_conn of the module under test with `lambda: fake_sync_redis`"""
+    return FakeSyncRedis()
@@ -1,5 +1,8 @@
 from typing import Any
 
+import pytest
+from pydantic import ValidationError
+
 from src.proxy_processing import repository as proxy_db
 from src.proxy_processing.schemas import SAdvancedSearch
 from src.proxy_processing.utils import parse_proxy_dict_from_string
@@ -64,97 +67,102 @@ async def test_partial_check_simulation():
     # convert strings to dicts
     proxy_dicts: list[dict[str, Any]] = [parse_proxy_dict_from_string(p) for p in proxies]
 
-    # convert dicts to ORM models
-    proxy_models: list[ProxyModel] = []
     for proxy in proxy_dicts:
         # pop protocol as we do in proxy_procession.router.add_proxies()
         proxy.pop("protocol", None)
 
         proxy.pop("unique_index")
 
-        proxy_models.append(ProxyModel(**proxy))
-
     # insert in test database
-    await proxy_db.insert_many(proxy_models)
-
-
-    # set status 'alive' for some proxies with ips from marked_as_alive
-    marked_as_alive: list[ProxyModel] = []
-    for ip in alive_ips:
-        marked_as_alive.extend(await proxy_db.get_by_ip(ip))
-
-    for p in marked_as_alive:
-        p.status = "alive"
-
-
-    # the same as above, but for 'dead' ips
-    marked_as_dead: list[ProxyModel] = []
-    for ip in dead_ips:
-        marked_as_dead.extend(await proxy_db.get_by_ip(ip))
+    _, inserted, _ = await proxy_db.upsert_many(proxy_dicts)
+    assert inserted == p_len
 
-    for p in marked_as_dead:
-        p.status = "dead"
+    # set status 'alive' for proxies with ips from alive_ips and 'dead' for ones from dead_ips
+    changes: list[tuple[int, dict[str, Any]]] = []
+    for ips, status in ((alive_ips, "alive"), (dead_ips, "dead")):
+        for p in await proxy_db.get_page(proxy_db.select(ProxyModel).where(ProxyModel.ip.in_(ips))):
+            changes.append((p.id, {"status": status}))
 
     # update test database
-    await proxy_db.update_many([*marked_as_alive, *marked_as_dead])
+    await proxy_db.bulk_update(changes)
 
 
+async def search(search_query: SAdvancedSearch) -> list[ProxyModel]:
+    """Runs advanced search like /proxies/search/advanced does"""
+    return await proxy_db.get_page(proxy_db.build_search_query(search_query))
 
-async def test_search_with_multiple_params_by_status():
+
+async def test_advanced_search_by_status():
     # create test search query with only one status param
     search_query: SAdvancedSearch = SAdvancedSearch(alive=True)
 
     # execute
-    results: list[ProxyModel] = await proxy_db.search_with_multiple_params(search_query)
+    results: list[ProxyModel] = await search(search_query)
 
     # and test it
     assert len(results) == len(alive_ips)
 
     # test query with two statuses (counts as alive OR dead)
     search_query: SAdvancedSearch = SAdvancedSearch(alive=True, dead=True)
-    results: list[ProxyModel] = await proxy_db.search_with_multiple_params(search_query)
+    results: list[ProxyModel] = await search(search_query)
 
     # so, the result must be the sum of dead ips and alive ones
     assert len(results) == (len(alive_ips) + len(dead_ips))
 
 
-async def test_search_with_multiple_params_by_protocol():
+async def test_advanced_search_by_protocol():
     """Tests search query by protocols"""
 
     # create test query with only one protocol to search
     search_query: SAdvancedSearch = SAdvancedSearch(socks5=True)
-    results: list[ProxyModel] = await proxy_db.search_with_multiple_params(search_query)
+    results: list[ProxyModel] = await search(search_query)
     assert len(results) == 4
 
     # same, but for socks4
     search_query: SAdvancedSearch = SAdvancedSearch(socks4=True)
-    results: list[ProxyModel] = await proxy_db.search_with_multiple_params(search_query)
+    results: list[ProxyModel] = await search(search_query)
     assert len(results) == 10
 
     # test two protocols (http OR https)
     search_query: SAdvancedSearch = SAdvancedSearch(http=True, https=True)
-    results: list[ProxyModel] = await proxy_db.search_with_multiple_params(search_query)
+    results: list[ProxyModel] = await search(search_query)
     assert len(results) == 6
 
 
-async def test_search_with_multiple_params_limit():
+async def test_advanced_search_limit():
     """Tests search with limits"""
 
     search_query: SAdvancedSearch = SAdvancedSearch(limit=10)
-    results: list[ProxyModel] = await proxy_db.search_with_multiple_params(search_query)
+    results: list[ProxyModel] = await search(search_query)
     assert len(results) == 10
 
     search_query: SAdvancedSearch = SAdvancedSearch(limit=-1)
-    results: list[ProxyModel] = await proxy_db.search_with_multiple_params(search_query)
+    results: list[ProxyModel] = await search(search_query)
     assert len(results) == len(proxies)
 
 
-async def test_search_with_multiple_params_together():
+async def test_advanced_search_after_id():
+    """Tests keyset pagination of search"""
+
+    first_page: list[ProxyModel] = await search(SAdvancedSearch(limit=10))
+    second_page: list[ProxyModel] = await search(
+        SAdvancedSearch(limit=10, after_id=first_page[-1].id)
+    )
+
+    ids: list[int] = [p.id for p in first_page + second_page]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(proxies)
+
+    with pytest.raises(ValidationError):
+        SAdvancedSearch(after_id=1, sort_by="latency")
+
+
+async def test_advanced_search_together():
     """Sets together two or more diverse params like status and protocol"""
 
     # first, we count how many alive proxies total
     search_query: SAdvancedSearch = SAdvancedSearch(alive=True)
-    results: list[ProxyModel] = await proxy_db.search_with_multiple_params(search_query)
+    results: list[ProxyModel] = await search(search_query)
 
     # and separate results by protocols
     # to know how many proxies we should get by query below
@@ -175,7 +183,7 @@ async def test_search_with_multiple_params_together():
 
     # execute query: ...WHERE status='alive' AND (socks4 IS true OR socks5 IS true)
     search_query: SAdvancedSearch = SAdvancedSearch(alive=True, socks5=True, socks4=True)
-    results: list[ProxyModel] = await proxy_db.search_with_multiple_params(search_query)
+    results: list[ProxyModel] = await search(search_query)
 
     # and compare complicated search query with the results from a simple one
     assert len(results) == (socks4 + socks5)
@@ -183,11 +191,11 @@ async def test_search_with_multiple_params_together():
 
     # test query with 3 statuses at the same time (equal to SELECT without any filters)
     search_query: SAdvancedSearch = SAdvancedSearch(alive=True, dead=True, not_checked=True)
-    results: list[ProxyModel] = await proxy_db.search_with_multiple_params(search_query)
+    results: list[ProxyModel] = await search(search_query)
 
     assert len(results) == len(proxies)
 
     # test getting only unchecked proxies (status is null)
     search_query: SAdvancedSearch = SAdvancedSearch(not_checked=True)
-    results: list[ProxyModel] = await proxy_db.search_with_multiple_params(search_query)
+    results: list[ProxyModel] = await search(search_query)
     assert len(results) == (len(proxies) - len(alive_ips) - len(dead_ips))
@@ -0,0 +1,290 @@
+import asyncio
+import socket
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import aiohttp
+import pytest
+
+from src.proxy_processing import check
+from proxy_processing.models import ProxyModel, Protocol
+
+ALL_PROTOCOLS: list[str] = [p.value for p in list(Protocol)]
+
+###########################################################
+# tests protocol sniffing and check pipeline of one proxy
+# proxies are local servers with canned replies
+###########################################################
+
+
+@asynccontextmanager
+async def serve(reply: bytes) -> AsyncIterator[int]:
+    """Runs server which reads probe, writes reply and closes connection, yields its port"""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await reader.read(64)
+        writer.write(reply)
+        await writer.drain()
+        writer.close()
+
+    server: asyncio.Server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    try:
+        yield server.sockets[0].getsockname()[1]
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def free_port() -> int:
+    """Returns port where nobody listens"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.parametrize("reply, expected", [
+    (b"HTTP/1.1 400 Bad Request\r\n\r\n", ["http", "https"]),
+    (b"\x05\x00", ["socks5"]),
+    (b"\x00\x5b\x00\x00\x00\x00\x00\x00", ["socks4"]),
+    # closed without answer
+    (b"", ALL_PROTOCOLS),
+    (b"SSH-2.0-OpenSSH_9.6\r\n", ALL_PROTOCOLS),
+])
+def test_sniff_protocols(reply: bytes, expected: list[str]):
+    async def sniff() -> list[str]:
+        async with serve(reply) as port:
+            return await check.sniff_protocols("127.0.0.1", port)
+
+    assert asyncio.run(sniff()) == expected
+
+
+def test_sniff_refused():
+    assert asyncio.run(check.sniff_protocols("127.0.0.1", free_port())) == []
+
+
+class FakeCheckers:
+    """Replaces protocol checks, protocols from working ones succeed"""
+
+    def __init__(self, monkeypatch, working: list[str], timings: dict[str, tuple[float, dict[str, float]]] = None):
+        self.working: list[str] = working
+        # protocol -> (latency, phases)
+        self.timings: dict[str, tuple[float, dict[str, float]]] = timings or {}
+        self.called: list[str] = []
+
+        for name, protocol in (
+                ("check_http_proxy", "http"),
+                ("check_https_proxy", "https"),
+                ("socks4_checker", "socks4"),
+                ("socks5_checker", "socks5"),
+        ):
+            monkeypatch.setattr(check, name, self.checker(protocol))
+
+    def checker(self, protocol: str):
+        async def check_protocol(**_) -> tuple[bool, str, float, dict[str, float]]:
+            self.called.append(protocol)
+            return protocol in self.working, protocol, *self.timings.get(protocol, (100.0, {}))
+
+        return check_protocol
+
+
+@pytest.fixture
+def sniffed(monkeypatch) -> list[str]:
+    """Protocols which sniff_protocols returns"""
+    protocols: list[str] = []
+
+    async def sniff_protocols(*_) -> list[str]:
+        return protocols
+
+    monkeypatch.setitem(check.checker_config, "prefilter", False)
+    monkeypatch.setitem(check.checker_config, "sniff", True)
+    monkeypatch.setattr(check, "sniff_protocols", sniff_protocols)
+    return protocols
+
+
+def run_check_proxy() -> ProxyModel:
+    async def run() -> ProxyModel:
+        return await check.check_proxy(ProxyModel(ip="127.0.0.1", port="1080", username="", password=""))
+
+    return asyncio.run(run())
+
+
+def test_sniffed_family_is_not_the_only_protocol(monkeypatch, sniffed: list[str]):
+    # port serves socks5 and socks4, but only socks5 answered the probe
+    sniffed.append("socks5")
+    checkers: FakeCheckers = FakeCheckers(monkeypatch, ["socks5", "socks4"])
+
+    proxy_model: ProxyModel = run_check_proxy()
+
+    assert proxy_model.status == "alive"
+    assert sorted(proxy_model.protocols_list) == ["socks4", "socks5"]
+    assert checkers.called[0] == "socks5"
+    assert sorted(checkers.called) == sorted(ALL_PROTOCOLS)
+
+
+def test_other_protocols_are_not_checked_if_family_fails(monkeypatch, sniffed: list[str]):
+    sniffed.extend(["http", "https"])
+    checkers: FakeCheckers = FakeCheckers(monkeypatch, [])
+
+    proxy_model: ProxyModel = run_check_proxy()
+
+    assert proxy_model.status == "dead"
+    assert sorted(checkers.called) == ["http", "https"]
+
+
+def test_phases_of_the_fastest_check(monkeypatch, sniffed: list[str]):
+    sniffed.extend(ALL_PROTOCOLS)
+    FakeCheckers(monkeypatch, ["http", "socks4", "socks5"], {
+        "http": (150.0, {"connect": 20.0, "ttfb": 130.0}),
+        "socks4": (90.0, {"connect": 50.0, "handshake": 40.0}),
+        # failed check is not the fastest one
+        "https": (10.0, {"connect": 10.0}),
+        "socks5": (120.0, {"connect": 30.0, "handshake": 90.0}),
+    })
+
+    proxy_model: ProxyModel = run_check_proxy()
+
+    # phases are not mixed from different checks
+    assert proxy_model.latency == 90.0
+    assert proxy_model.connect_time == 50.0
+    assert proxy_model.handshake_time == 40.0
+    assert proxy_model.ttfb is None
+
+
+@pytest.fixture
+def stats(monkeypatch) -> dict[str, int]:
+    """Counters of checker stats incremented during test"""
+    counters: dict[str, int] = {}
+
+    def incr(name: str, amount: int = 1) -> None:
+        counters[name] = counters.get(name, 0) + amount
+
+    monkeypatch.setattr(check.checker_stats, "incr", incr)
+    return counters
+
+
+def test_reachable(stats: dict[str, int]):
+    async def run() -> bool:
+        async with serve(b"") as port:
+            return await check.check_reachable("127.0.0.1", port)
+
+    assert asyncio.run(run())
+    assert stats == {"prefilter:checked": 1, "prefilter:reachable": 1}
+
+
+def test_refused_is_not_retried(stats: dict[str, int]):
+    assert not asyncio.run(check.check_reachable("127.0.0.1", free_port()))
+    assert stats == {"prefilter:checked": 1, "prefilter:refused": 1, "prefilter:unreachable": 1}
+
+
+def test_timeout_is_retried(monkeypatch, stats: dict[str, int]):
+    async def open_connection(*_):
+        await asyncio.sleep(1)
+
+    monkeypatch.setitem(check.checker_config, "prefilter_timeout", 0.01)
+    monkeypatch.setitem(check.checker_config, "prefilter_retries", 3)
+    monkeypatch.setattr(check.asyncio, "open_connection", open_connection)
+
+    assert not asyncio.run(check.check_reachable("127.0.0.1", 1080))
+    assert stats == {
+        "prefilter:checked": 1,
+        "prefilter:timeouts": 3,
+        "prefilter:retries": 2,
+        "prefilter:unreachable": 1
+    }
+
+
+def test_sniff_reuses_prefilter_connection(stats: dict[str, int]):
+    connections: list[int] = []
+
+    async def run() -> list[str]:
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            connections.append(1)
+            if await reader.read(64):
+                writer.write(b"\x05\x00")
+                await writer.drain()
+            writer.close()
+
+        server: asyncio.Server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        async with server:
+            port: int = server.sockets[0].getsockname()[1]
+            connection = await check.open_reachable("127.0.0.1", port)
+            return await check.sniff_protocols("127.0.0.1", port, connection)
+
+    assert asyncio.run(run()) == ["socks5"]
+    assert len(connections) == 1
+
+
+@asynccontextmanager
+async def judge() -> AsyncIterator[int]:
+    """Runs judge server, it also serves absolute urls of proxied requests, yields its port"""
+    from aiohttp import web
+    from judge.app import create_app
+
+    runner: web.AppRunner = web.AppRunner(create_app())
+    await runner.setup()
+    site: web.TCPSite = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    try:
+        yield runner.addresses[0][1]
+    finally:
+        await runner.cleanup()
+
+
+@pytest.fixture
+def throughput(monkeypatch, stats: dict[str, int]) -> dict:
+    config: dict = {"enabled": True, "url": "http://judge.test/bytes/1048576", "timeout": 5}
+    monkeypatch.setitem(check.checker_config, "throughput", config)
+    return config
+
+
+def test_throughput_through_http_proxy(throughput: dict, stats: dict[str, int]):
+    async def measure() -> float | None:
+        context: check.CheckerContext = check.CheckerContext()
+        try:
+            async with judge() as port:
+                proxy_model: ProxyModel = ProxyModel(ip="localhost", port=str(port), username="", password="")
+                return await check.measure_throughput(proxy_model, "127.0.0.1", "http", context)
+        finally:
+            await context.close()
+
+    assert asyncio.run(measure()) > 0
+    assert stats == {"throughput:measured": 1}
+
+
+def test_throughput_through_socks_proxy(throughput: dict, stats: dict[str, int]):
+    proxy_urls: list[str] = []
+
+    class SocksContext:
+        def create_socks_session(self, proxy_url: str) -> aiohttp.ClientSession:
+            proxy_urls.append(proxy_url)
+            return aiohttp.ClientSession()
+
+    async def measure() -> float | None:
+        proxy_model: ProxyModel = ProxyModel(
+            ip="proxy.example.com", port="1080", username="user", password="pass", socks4=True, socks5=True
+        )
+        return await check.measure_throughput(proxy_model, "2001:db8::1", "socks4", SocksContext())
+
+    async def run() -> float | None:
+        async with judge() as port:
+            throughput["url"] = f"http://127.0.0.1:{port}/bytes/1048576"
+            return await measure()
+
+    assert asyncio.run(run()) > 0
+    # protocol which passed the check and address from dns cache
+    assert proxy_urls == ["socks4://user:pass@[2001:db8::1]:1080"]
+
+
+def test_throughput_failed(throughput: dict, stats: dict[str, int]):
+    async def measure() -> float | None:
+        context: check.CheckerContext = check.CheckerContext()
+        try:
+            async with judge() as port:
+                throughput["url"] = "http://judge.test/bytes/not-a-number"
+                proxy_model: ProxyModel = ProxyModel(ip="127.0.0.1", port=str(port), username="", password="")
+                return await check.measure_throughput(proxy_model, "127.0.0.1", "https", context)
+        finally:
+            await context.close()
+
+    assert asyncio.run(measure()) is None
+    assert stats == {"throughput:failed": 1}
@@ -0,0 +1,133 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from src.proxy_processing import check
+from src.proxy_processing.context import CheckerContext
+
+###########################################################
+# tests shared http session of checker and its usage by http(s) checks
+###########################################################
+
+
+def test_session_is_reused_in_loop():
+    context: CheckerContext = CheckerContext()
+
+    async def get_sessions() -> tuple[aiohttp.ClientSession, aiohttp.ClientSession]:
+        sessions = context.session, context.session
+        await context.close()
+        return sessions
+
+    first, second = asyncio.run(get_sessions())
+
+    assert first is second
+    assert first.closed
+
+
+def test_session_of_previous_loop_is_closed():
+    context: CheckerContext = CheckerContext()
+
+    async def get_session() -> aiohttp.ClientSession:
+        return context.session
+
+    # every run_until_complete of sync_compatible has its own loop
+    old: aiohttp.ClientSession = asyncio.run(get_session())
+
+    async def get_new_session() -> aiohttp.ClientSession:
+        session: aiohttp.ClientSession = context.session
+        await context.close()
+        return session
+
+    new: aiohttp.ClientSession = asyncio.run(get_new_session())
+
+    assert new is not old
+    assert old.closed
+    assert new.closed
+
+
+class FakeResponse:
+    def __init__(self, status: int, text: str):
+        self.status: int = status
+        self._text: str = text
+
+    async def text(self) -> str:
+        return self._text
+
+    async def __aenter__(self) -> "FakeResponse":
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        pass
+
+
+class FakeSession:
+    """Records arguments of requests and echoes X-Test header like judge"""
+
+    def __init__(self):
+        self.requests: list[tuple[str, dict]] = []
+
+    def get(self, url: str, **kwargs) -> FakeResponse:
+        self.requests.append((url, kwargs))
+        return FakeResponse(200, kwargs["headers"]["X-Test"])
+
+
+class FakeContext:
+    def __init__(self):
+        self.session: FakeSession = FakeSession()
+
+
+def test_http_check_uses_proxy_of_shared_session():
+    context: FakeContext = FakeContext()
+
+    result = asyncio.run(check.check_http_proxy("1.2.3.4", 8080, "user", "pass", context=context))
+
+    assert result[:2] == (True, "http")
+
+    url, kwargs = context.session.requests[0]
+    assert url in check.checker_config["judges"]["http"]
+    assert kwargs["proxy"] == "http://1.2.3.4:8080"
+    assert kwargs["proxy_auth"] == aiohttp.BasicAuth("user", "pass")
+    assert kwargs["ssl"] is True
+
+
+def test_https_check_without_auth():
+    context: FakeContext = FakeContext()
+
+    result = asyncio.run(check.check_https_proxy("2001:db8::1", 3128, context=context))
+
+    assert result[:2] == (True, "https")
+
+    url, kwargs = context.session.requests[0]
+    assert url in check.checker_config["judges"]["https"]
+    # https proxy is reached by http and tunnels request with CONNECT
+    assert kwargs["proxy"] == "http://[2001:db8::1]:3128"
+    assert kwargs["proxy_auth"] is None
+
+
+@pytest.fixture
+def judges(monkeypatch) -> dict[str, list]:
+    pool: dict[str, list] = {
+        "http": ["http://judge1/get", "http://judge2/get"],
+        "https": ["https://judge3/get", {"url": "https://127.0.0.1:8443/get", "verify": False}],
+    }
+    monkeypatch.setitem(check.checker_config, "judges", pool)
+    return pool
+
+
+def test_judge_is_chosen_randomly(judges: dict[str, list]):
+    chosen: set[str] = {check.choose_judge("http")[0] for _ in range(100)}
+
+    assert chosen == set(judges["http"])
+
+
+def test_self_signed_judge_is_not_verified(judges: dict[str, list]):
+    chosen: dict[str, bool] = dict(check.choose_judge("https") for _ in range(100))
+
+    assert chosen == {"https://judge3/get": True, "https://127.0.0.1:8443/get": False}
+
+    context: FakeContext = FakeContext()
+    for _ in range(20):
+        asyncio.run(check.check_https_proxy("1.2.3.4", 3128, context=context))
+
+    assert {(url, kwargs["ssl"]) for url, kwargs in context.session.requests} == set(chosen.items())
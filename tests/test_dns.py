@@ -0,0 +1,67 @@
+import asyncio
+import socket
+
+import pytest
+
+from src.proxy_processing.dns import DNSCache, format_host
+
+###########################################################
+# tests process-wide dns cache of checker
+###########################################################
+
+
+class CountingDNSCache(DNSCache):
+    """Resolves from dict instead of system resolver and counts lookups"""
+
+    def __init__(self, records: dict[str, str], **kwargs):
+        super().__init__(**kwargs)
+        self.records: dict[str, str] = records
+        self.lookups: int = 0
+
+    async def _lookup(self, host: str) -> str | None:
+        self.lookups += 1
+        await asyncio.sleep(0.01)
+        return self.records.get(host)
+
+
+def test_ip_is_not_resolved():
+    cache: CountingDNSCache = CountingDNSCache({})
+
+    assert asyncio.run(cache.resolve("1.2.3.4")) == "1.2.3.4"
+    assert asyncio.run(cache.resolve("2001:db8::1")) == "2001:db8::1"
+    assert cache.lookups == 0
+
+
+def test_concurrent_lookups_are_shared():
+    cache: CountingDNSCache = CountingDNSCache({"proxy.example.com": "1.2.3.4"})
+
+    async def resolve_many() -> list[str]:
+        return await asyncio.gather(*(cache.resolve("Proxy.Example.com") for _ in range(10)))
+
+    assert asyncio.run(resolve_many()) == ["1.2.3.4"] * 10
+    assert asyncio.run(cache.resolve("proxy.example.com")) == "1.2.3.4"
+    assert cache.lookups == 1
+
+
+def test_negative_caching():
+    cache: CountingDNSCache = CountingDNSCache({}, negative_ttl=60)
+
+    for _ in range(3):
+        with pytest.raises(socket.gaierror):
+            asyncio.run(cache.resolve("dead.example.com"))
+
+    assert cache.lookups == 1
+
+
+def test_expired():
+    cache: CountingDNSCache = CountingDNSCache({"proxy.example.com": "1.2.3.4"}, ttl=0)
+
+    asyncio.run(cache.resolve("proxy.example.com"))
+    asyncio.run(cache.resolve("proxy.example.com"))
+
+    assert cache.lookups == 2
+
+
+def test_format_host():
+    assert format_host("1.2.3.4") == "1.2.3.4"
+    assert format_host("2001:db8::1") == "[2001:db8::1]"
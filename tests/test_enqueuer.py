@@ -0,0 +1,55 @@
+import asyncio
+import threading
+from contextlib import nullcontext
+
+import pytest
+
+from src.proxy_processing.progress import ENQUEUED_KEY, run_key
+from src.tasks import tasks
+from src.tasks.tasks import CheckEnqueuer
+
+###########################################################
+# tests publishing of checks by chunks
+# redis is replaced with fake_sync_redis, broker with fake which records calls
+###########################################################
+
+
+@pytest.fixture
+def published(monkeypatch, fake_sync_redis) -> list[tuple[list, dict, str]]:
+    """(chunk, kwargs, name of thread) of every published task"""
+    messages: list[tuple[list, dict, str]] = []
+
+    def apply_async(args: tuple, kwargs: dict, producer=None) -> None:
+        messages.append((args[0], kwargs, threading.current_thread().name))
+
+    monkeypatch.setattr(tasks, "get_conn", lambda: fake_sync_redis)
+    monkeypatch.setattr(tasks.broker, "producer_or_acquire", lambda: nullcontext(object()))
+    monkeypatch.setattr(tasks.process_proxies_batch_worker, "apply_async", apply_async)
+    return messages
+
+
+def test_enqueue_by_chunks(published: list[tuple[list, dict, str]], fake_sync_redis):
+    with CheckEnqueuer(chunk_size=2, run_id=7) as enqueuer:
+        assert enqueuer.enqueue([i, "http"] for i in range(5)) == 5
+
+    assert [m[0] for m in published] == [[[0, "http"], [1, "http"]], [[2, "http"], [3, "http"]], [[4, "http"]]]
+    assert all(m[1] == {"run_id": 7} for m in published)
+    assert enqueuer.enqueued == 5
+    assert fake_sync_redis.values[ENQUEUED_KEY] == 5
+    assert fake_sync_redis.hashes[run_key(7)] == {"enqueued": "5"}
+
+
+def test_aenqueue_does_not_block_loop(published: list[tuple[list, dict, str]]):
+    async def run() -> int:
+        async with CheckEnqueuer(chunk_size=2) as enqueuer:
+            return await enqueuer.aenqueue([i, None] for i in range(3))
+
+    assert asyncio.run(run()) == 3
+    assert [len(m[0]) for m in published] == [2, 1]
+    # chunks are published outside of event loop thread
+    assert all(m[2] != threading.main_thread().name for m in published)
+
+
+def test_async_enqueue_checks(published: list[tuple[list, dict, str]]):
+    assert asyncio.run(tasks.async_enqueue_checks([[1, None]], run_id=3)) == 1
+    assert published[0][:2] == ([[1, None]], {"run_id": 3})
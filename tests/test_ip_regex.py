@@ -1,7 +1,7 @@
 import pytest
 import re
 
-from src.proxy_processing.regex import ip_expr
+from src.proxy_processing.regex import ip_expr, host_expr
 
 ########################################################
 # tests ip regex that is used for /search ip validation
@@ -35,4 +35,28 @@ def test_invalid_addresses(address: str):
     assert bool(ip_pattern.match(address)) is False
 
 
+host_pattern = re.compile(host_expr)
 
+valid_hosts = valid_ips + [
+    "2001:db8::1",
+    "::1",
+    "proxy.example.com",
+    "Host-1.Example.co.uk",
+]
+
+invalid_hosts = invalid_ips + [
+    "localhost",
+    "-bad.example.com",
+    "bad host.com",
+    "2001:db8::1::g",
+]
+
+
+@pytest.mark.parametrize("address", valid_hosts)
+def test_valid_hosts(address: str):
+    assert bool(host_pattern.match(address)) is True
+
+
+@pytest.mark.parametrize("address", invalid_hosts)
+def test_invalid_hosts(address: str):
+    assert bool(host_pattern.match(address)) is False
@@ -0,0 +1,30 @@
+import asyncio
+
+from src.tasks.lifecycle import WorkerLoop
+
+###########################################################
+# tests persistent event loop of celery worker process
+###########################################################
+
+
+async def get_loop() -> asyncio.AbstractEventLoop:
+    return asyncio.get_running_loop()
+
+
+def test_worker_loop():
+    worker_loop: WorkerLoop = WorkerLoop()
+    assert not worker_loop.running
+
+    # loop is started lazily and reused by all tasks
+    loop: asyncio.AbstractEventLoop = worker_loop.run(get_loop())
+    assert worker_loop.running
+    assert worker_loop.run(get_loop()) is loop
+    assert worker_loop.run(asyncio.sleep(0, "result")) == "result"
+
+    worker_loop.stop()
+    assert not worker_loop.running
+    assert loop.is_closed()
+
+    # the next task starts new loop
+    assert worker_loop.run(get_loop()) is not loop
+    worker_loop.stop()
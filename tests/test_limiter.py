@@ -0,0 +1,145 @@
+import asyncio
+
+from src.proxy_processing import process
+from src.proxy_processing.limiter import KeyedLimiter, HostLimiter, interleave_by_key, subnet_key
+from proxy_processing.models import ProxyModel
+
+##############################################################
+# tests per-host limiter used by batch checks
+# see proxy_processing.process.process_proxies_batch
+##############################################################
+
+
+async def run_limited(limiter: KeyedLimiter, keys: list[str]) -> dict[str, int]:
+    """Runs fake work for every key and returns max simultaneous work per key"""
+    max_active: dict[str, int] = {}
+
+    async def work(key: str):
+        async with limiter.acquire(key):
+            max_active[key] = max(max_active.get(key, 0), limiter.active(key))
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(work(k) for k in keys))
+    return max_active
+
+
+def test_keyed_limiter():
+    limiter: KeyedLimiter = KeyedLimiter(2)
+    max_active: dict[str, int] = asyncio.run(run_limited(limiter, ["a"] * 10 + ["b"] * 3))
+
+    assert max_active == {"a": 2, "b": 2}
+
+    # all keys are released
+    assert limiter.active("a") == 0
+    assert not limiter._active and not limiter._waiters
+
+
+def test_keyed_limiter_cancel():
+    async def run():
+        limiter: KeyedLimiter = KeyedLimiter(1)
+
+        async def work():
+            async with limiter.acquire("a"):
+                await asyncio.sleep(0.05)
+
+        tasks = [asyncio.create_task(work()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        tasks[1].cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        return limiter
+
+    limiter: KeyedLimiter = asyncio.run(run())
+    assert not limiter._active and not limiter._waiters
+
+
+def test_host_limiter_subnet():
+    async def run() -> int:
+        limiter: HostLimiter = HostLimiter(per_host=10, per_subnet=3)
+        max_active: int = 0
+
+        async def work(ip: str):
+            nonlocal max_active
+            async with limiter.acquire(ip):
+                max_active = max(max_active, limiter.subnets.active("1.2.3.0/24"))
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(work(f"1.2.3.{i}") for i in range(10)))
+        return max_active
+
+    assert asyncio.run(run()) == 3
+
+
+def test_subnet_key():
+    assert subnet_key("1.2.3.4") == "1.2.3.0/24"
+    assert subnet_key("1.2.3.4", 16) == "1.2.0.0/16"
+    assert subnet_key("example.com") == "example.com"
+
+
+def test_subnet_key_ipv6():
+    assert subnet_key("2001:db8:0:1::10") == "2001:db8:0:1::/64"
+    assert subnet_key("2001:db8:0:1::10", prefix6=48) == "2001:db8::/48"
+    # different hosts of one /64 share the subnet
+    assert subnet_key("2001:db8::1") == subnet_key("2001:db8::ffff:1") != subnet_key("2001:db8:0:2::1")
+
+
+def test_host_limiter_ipv6_subnet():
+    async def run() -> int:
+        limiter: HostLimiter = HostLimiter(per_host=10, per_subnet=2)
+        max_active: int = 0
+
+        async def work(ip: str):
+            nonlocal max_active
+            async with limiter.acquire(ip):
+                max_active = max(max_active, limiter.subnets.active("2001:db8::/64"))
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(work(f"2001:db8::{i + 1}") for i in range(6)))
+        return max_active
+
+    assert asyncio.run(run()) == 2
+
+
+def test_interleave_by_key():
+    items = ["a1", "a2", "a3", "b1", "c1", "c2"]
+    assert interleave_by_key(items, lambda i: i[0]) == ["a1", "b1", "c1", "a2", "c2", "a3"]
+
+
+def test_limits_are_shared_by_batches(monkeypatch, fake_redis):
+    active: dict[str, int] = {}
+    max_active: dict[str, int] = {}
+
+    async def check_proxy(proxy_model: ProxyModel) -> ProxyModel:
+        active[proxy_model.ip] = active.get(proxy_model.ip, 0) + 1
+        max_active[proxy_model.ip] = max(max_active.get(proxy_model.ip, 0), active[proxy_model.ip])
+        await asyncio.sleep(0.01)
+        active[proxy_model.ip] -= 1
+        proxy_model.status = "dead"
+        return proxy_model
+
+    async def resolve(host: str) -> str:
+        return host
+
+    async def add(*_) -> None:
+        pass
+
+    monkeypatch.setattr(process, "host_limiter", HostLimiter(per_host=2, per_subnet=0))
+    monkeypatch.setattr(process, "check_proxy", check_proxy)
+    monkeypatch.setattr(process, "get_async_conn", lambda: fake_redis)
+    monkeypatch.setattr(process.dns_cache, "resolve", resolve)
+    monkeypatch.setattr(process.result_buffer, "add", add)
+    monkeypatch.setattr(process.checker_stats, "flush", add)
+
+    async def run() -> None:
+        # many ports of one host are split between concurrent batches
+        await asyncio.gather(*(
+            process.process_proxies_batch(
+                [[batch * 10 + i, "1.2.3.4", str(1000 + batch * 10 + i), "", "", [], None] for i in range(5)],
+                tracked=False
+            )
+            for batch in range(3)
+        ))
+
+    asyncio.run(run())
+
+    assert max_active == {"1.2.3.4": 2}
@@ -0,0 +1,26 @@
+from src.proxy_processing.payload import to_payload, from_payload, is_embedded, get_id_and_protocol
+from proxy_processing.models import ProxyModel
+
+###########################################################
+# tests compact check messages, see process_proxies_batch
+###########################################################
+
+
+def test_payload_round_trip():
+    proxy_model: ProxyModel = ProxyModel(id=7, ip="1.2.3.4", port="1080", username="user", password="pass")
+    proxy_model.protocols_list = ["socks5", "http"]
+
+    payload: list = to_payload(proxy_model, "socks5")
+    assert payload == [7, "1.2.3.4", "1080", "user", "pass", ["socks5", "http"], "socks5"]
+    assert is_embedded(payload)
+    assert get_id_and_protocol(payload) == (7, "socks5")
+
+    restored: ProxyModel = from_payload(payload)
+    assert restored.id == 7
+    assert restored.credentials_ip_port == "user:pass@1.2.3.4:1080"
+    assert restored.protocols_list == ["socks5", "http"]
+
+
+def test_old_message():
+    assert not is_embedded([7, None])
+    assert get_id_and_protocol([7, None]) == (7, None)
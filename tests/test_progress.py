@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.proxy_processing import router, runs
+from src.proxy_processing.progress import RUN_TTL, build_progress, mark_finished, mark_started
+from src.proxy_processing.runs import build_run_progress
+from proxy_processing.models import CheckRunModel, RunStatus
+
+###########################################################
+# tests progressbar information built from redis counters
+# and progress of check runs, redis is replaced with fake_redis
+###########################################################
+
+
+def counters(enqueued: int = 0, started: int = 0, finished: int = 0, alive: int = 0, dead: int = 0) -> dict[str, int]:
+    return {"enqueued": enqueued, "started": started, "finished": finished, "alive": alive, "dead": dead}
+
+
+@pytest.mark.parametrize("values, current_len, value_now, width, running", [
+    (counters(), 0, 0, 100, 0),
+    (counters(enqueued=10), 10, 0, 0, 0),
+    (counters(enqueued=10, started=6, finished=4, alive=1, dead=3), 6, 4, 40, 2),
+    (counters(enqueued=10, started=10, finished=10, alive=5, dead=5), 0, 10, 100, 0),
+    # checks from purged queue finished after reset of counters
+    (counters(enqueued=2, started=5, finished=5), 0, 2, 100, 0),
+])
+def test_build_progress(values: dict[str, int], current_len: int, value_now: int, width: float, running: int):
+    progress: dict[str, int | float] = build_progress(values)
+
+    assert progress["current_len"] == current_len
+    assert progress["initial_len"] == values["enqueued"]
+    assert progress["value_now"] == value_now
+    assert progress["progressbar_width"] == width
+    assert progress["running"] == running
+    assert progress["alive"] == values["alive"]
+
+
+@pytest.mark.parametrize("status, values, elapsed, rate, eta", [
+    # nothing is finished yet, rate is unknown
+    ("running", counters(enqueued=100, started=10), 5, None, None),
+    ("running", counters(enqueued=100, started=30, finished=20), 10, 2, 40),
+    ("finished", counters(enqueued=100, started=100, finished=100), 50, 2, 0),
+    # stopped run is never finished
+    ("stopped", counters(enqueued=100, started=30, finished=20), 10, 2, 0),
+])
+def test_build_run_progress(status: str, values: dict[str, int], elapsed: float, rate: float | None, eta: float | None):
+    progress: dict = build_run_progress(1, "rerun", status, values, elapsed)
+
+    assert progress["run_id"] == 1
+    assert progress["status"] == status
+    assert progress["initial_len"] == values["enqueued"]
+    assert progress["rate"] == rate
+    assert progress["eta"] == eta
+
+
+def test_workers_refresh_ttl_of_run(fake_redis):
+    async def mark() -> None:
+        await mark_started(fake_redis, run_id=1)
+        await mark_finished(fake_redis, "alive", run_id=2)
+        # not tracked by run
+        await mark_finished(fake_redis, "dead")
+
+    asyncio.run(mark())
+
+    assert fake_redis.expires == {"check_run:1": RUN_TTL, "check_run:2": RUN_TTL}
+
+
+def test_partial_run_hash_is_read_from_database(monkeypatch, fake_redis):
+    # hash expired during the run and was recreated by counters of workers
+    fake_redis.hashes["check_run:1"] = {"finished": "3", "alive": "3"}
+    run: CheckRunModel = CheckRunModel(
+        id=1, kind="rerun", status=RunStatus.running, enqueued=10, finished=0, alive=0, dead=0,
+        created_at=datetime.utcnow() - timedelta(minutes=1)
+    )
+
+    async def get_check_run(run_id: int) -> CheckRunModel | None:
+        return run if run_id == 1 else None
+
+    monkeypatch.setattr(runs, "get_async_conn", lambda: fake_redis)
+    monkeypatch.setattr(runs.proxy_db, "get_check_run", get_check_run)
+
+    progress: dict = asyncio.run(runs.get_run_progress(1))
+
+    assert progress["kind"] == "rerun"
+    assert progress["status"] == "running"
+    assert progress["initial_len"] == 10
+    assert asyncio.run(runs.get_run_progress(2)) is None
+
+
+def test_run_is_stopped_if_enqueueing_fails(monkeypatch):
+    calls: list[tuple[str, int]] = []
+
+    async def count_filtered(*_) -> int:
+        return 10
+
+    async def start_run(kind: str) -> int:
+        return 1
+
+    async def seal_run(run_id: int) -> None:
+        calls.append(("seal", run_id))
+
+    async def stop_run(run_id: int) -> None:
+        calls.append(("stop", run_id))
+
+    class CheckEnqueuer:
+        chunk_size: int = 5
+
+        def __init__(self, run_id: int):
+            pass
+
+        async def __aenter__(self) -> "CheckEnqueuer":
+            raise ConnectionError("broker is down")
+
+        async def __aexit__(self, *_) -> None:
+            pass
+
+    monkeypatch.setattr(router.proxy_repo, "count_filtered", count_filtered)
+    monkeypatch.setattr(router, "start_run", start_run)
+    monkeypatch.setattr(router, "seal_run", seal_run)
+    monkeypatch.setattr(router, "stop_run", stop_run)
+    monkeypatch.setattr(router, "CheckEnqueuer", CheckEnqueuer)
+
+    for endpoint in (router.continue_check, router.re_run_check):
+        with pytest.raises(ConnectionError):
+            asyncio.run(endpoint())
+
+    assert calls == [("stop", 1), ("stop", 1)]
@@ -2,11 +2,13 @@ import random
 from enum import Enum
 from typing import Any
 import pytest
+from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 from src.proxy_processing.schemas import SAdvancedSearch
 from src.proxy_processing import repository as proxy_db
 from src.proxy_processing.utils import parse_proxy_dict_from_string
+from src.proxy_processing.bulk_import import import_lines
 from src.configs.config import DB_PASS, DB_PORT, DB_HOST, DB_USER
 
 ######################################
@@ -17,6 +19,8 @@ from src.configs.config import DB_PASS, DB_PORT, DB_HOST, DB_USER
 TEST_DB_NAME = "test_database"
 # fixes error when metadata with name proxy already exists
 ProxyModel = proxy_db.ProxyModel
+RunStatus = proxy_db.RunStatus
+PAYLOAD_COLUMNS = proxy_db.PAYLOAD_COLUMNS
 
 # if you want to test your own proxies be sure
 # that ips 127.0.0.1 and 1.2.3.4 are reserved for tests bellow
@@ -80,27 +84,28 @@ proxies = [i for i in filter(lambda p: p != "", proxies)]  # makes list of proxy
 p_len = len(proxies)
 
 
+async def get_by_ip(ip: str) -> list[ProxyModel]:
+    return await proxy_db.get_page(proxy_db.select(ProxyModel).where(ProxyModel.ip == ip))
+
+
 @pytest.mark.dependcy(depends=["test_parse_proxy_dict_from_string_good", "test_parse_proxy_dict_from_string_bad"])
-async def test_insert_many():
+async def test_insert():
     # proxies must be all valid
     proxy_dicts: list[dict[str, Any]] = [parse_proxy_dict_from_string(p) for p in proxies]
 
-    proxy_models: list[ProxyModel] = []
-
     for proxy in proxy_dicts:
         # pop protocol as we do in proxy_procession.router.add_proxies()
         proxy.pop("protocol", None)
 
         proxy.pop("unique_index")
 
-        proxy_models.append(ProxyModel(**proxy))
+    assert len(proxy_dicts) == p_len
 
-    assert len(proxy_models) == p_len
-
-    await proxy_db.insert_many(proxy_models)
+    rows, inserted, updated = await proxy_db.upsert_many(proxy_dicts)
+    assert (len(rows), inserted, updated) == (p_len, p_len, 0)
 
 
-@pytest.mark.dependency(depends=["test_insert_many"])
+@pytest.mark.dependency(depends=["test_insert"])
 async def test_get_all():
     proxy_models: list[ProxyModel] = await proxy_db.get_all()
 
@@ -112,21 +117,10 @@ async def test_count_rows():
     assert rows_len == len(proxies)
 
 
-async def test_get_model_by_dict():
-    # choose random proxy which exists in database
-    proxy_dict: dict[str, Any] = parse_proxy_dict_from_string(random.choice(proxies))
-
-    proxy: ProxyModel = await proxy_db.get_model_by_dict(proxy_dict)
-
-    assert proxy is not None
-    assert proxy.ip == proxy_dict["ip"]
-    assert proxy.port == proxy_dict["port"]
-
-
 async def test_get_model_by_id():
     # choose random proxy which exists in database
     proxy_dict: dict[str, Any] = parse_proxy_dict_from_string(random.choice(proxies))
-    proxy: ProxyModel = await proxy_db.get_model_by_dict(proxy_dict)
+    proxy: ProxyModel = next(p for p in await get_by_ip(proxy_dict["ip"]) if p.port == proxy_dict["port"])
 
     id_ = proxy.id
     del proxy
@@ -136,15 +130,6 @@ async def test_get_model_by_id():
     assert proxy.id == id_
 
 
-async def test_get_by_ip():
-    ip = "1.2.3.4"
-
-    proxy: list[ProxyModel] = await proxy_db.get_by_ip(ip)
-
-    assert proxy
-    assert proxy[0].ip == ip
-
-
 async def test_update_many():
     proxy_models: list[ProxyModel] = await proxy_db.get_all()
 
@@ -164,6 +149,24 @@ async def test_update_many():
         assert proxy_model.https
 
 
+async def test_bulk_update():
+    proxy_models: list[ProxyModel] = (await proxy_db.get_all())[:3]
+
+    written: int = await proxy_db.bulk_update([
+        (proxy_models[0].id, {"latency": 120.5}),
+        (proxy_models[1].id, {"latency": 99.0, "socks5": True}),
+        (proxy_models[2].id, {}),
+    ])
+    assert written == 2
+
+    first: ProxyModel = await proxy_db.get_model_by_id(proxy_models[0].id)
+    second: ProxyModel = await proxy_db.get_model_by_id(proxy_models[1].id)
+    assert first.latency == 120.5
+    assert second.latency == 99.0 and second.socks5
+    # other columns are not touched
+    assert first.ip == proxy_models[0].ip and first.last_check_at is None
+
+
 async def test_update_with_check_timestamp():
     proxy_models: list[ProxyModel] = await proxy_db.get_all()
     assert proxy_models
@@ -216,6 +219,85 @@ async def test_get_sorted_by():
     assert proxy_models[-1].ip == "1.2.3.4"
 
 
+async def test_stream_rows():
+    total: int = await proxy_db.count_filtered()
+
+    chunks: list[list[Row]] = [rows async for rows in proxy_db.stream_rows(PAYLOAD_COLUMNS, chunk_size=3)]
+    ids: list[int] = [row.id for chunk in chunks for row in chunk]
+
+    assert len(ids) == total
+    assert ids == sorted(ids)
+    assert all(len(chunk) <= 3 for chunk in chunks)
+
+    limited: list[Row] = [
+        row async for chunk in proxy_db.stream_rows(PAYLOAD_COLUMNS, limit=2, chunk_size=3) for row in chunk
+    ]
+    assert len(limited) == min(2, total)
+
+
+async def test_upsert_many():
+    existing: dict[str, Any] = parse_proxy_dict_from_string("1.2.3.4:9050")
+    new: dict[str, Any] = parse_proxy_dict_from_string("socks5://127.0.0.1:1080")
+    for proxy in (existing, new):
+        proxy.pop("unique_index")
+        proxy.pop("protocol", None)
+
+    # https of existing proxy is known, so it is not written again
+    rows, inserted, updated = await proxy_db.upsert_many([existing, new])
+    assert (inserted, updated) == (1, 0)
+    assert {(r.ip, r.port) for r in rows} == {("1.2.3.4", "9050"), ("127.0.0.1", "1080")}
+    assert all(r.socks5 for r in rows if r.ip == "127.0.0.1")
+
+    # new protocol is added, known one is kept
+    existing["socks4"] = True
+    rows, inserted, updated = await proxy_db.upsert_many([existing])
+    assert (inserted, updated) == (0, 1)
+    assert rows[0].socks4 and rows[0].https
+
+    assert await proxy_db.count_rows() == p_len + 1
+
+
+async def test_import_lines():
+    async def lines():
+        for line in ("socks5://1.2.3.4:9050", "8.8.8.8:53", "8.8.8.8:53", "socks5://8.8.8.8:53", "bad", ""):
+            yield line
+
+    counts: dict[str, int] = await import_lines(lines())
+
+    # duplicates of dump are merged, existing proxy 1.2.3.4 got new protocol
+    assert counts == {"new": 1, "updated": 1, "invalid": 1}
+
+    proxy: ProxyModel = (await get_by_ip("8.8.8.8"))[0]
+    assert proxy.socks5
+
+
+async def test_check_run():
+    run = await proxy_db.create_check_run("rerun")
+    assert run.id is not None
+    assert run.id in await proxy_db.get_running_check_run_ids()
+
+    counters: dict[str, int] = {"enqueued": 10, "finished": 10, "alive": 4, "dead": 6}
+    assert await proxy_db.close_check_run(run.id, RunStatus.finished, counters)
+    # run is closed only once
+    assert not await proxy_db.close_check_run(run.id, RunStatus.stopped, counters)
+
+    run = await proxy_db.get_check_run(run.id)
+    assert run.status == RunStatus.finished
+    assert run.alive == 4
+    assert run.finished_at is not None
+
+
+async def test_paginate():
+    query = proxy_db.select(ProxyModel)
+
+    first_page: list[ProxyModel] = await proxy_db.get_page(proxy_db.paginate(query, limit=5))
+    second_page: list[ProxyModel] = await proxy_db.get_page(proxy_db.paginate(query, first_page[-1].id, 5))
+    assert [p.id for p in first_page + second_page] == sorted({p.id for p in first_page + second_page})
+
+    streamed: list[int] = [m.id async for models in proxy_db.stream_models(query, chunk_size=4) for m in models]
+    assert len(streamed) == await proxy_db.count_rows()
+
+
 async def test_purge_all():
     await proxy_db.purge_all()
 
@@ -0,0 +1,179 @@
+import asyncio
+
+import pytest
+
+from src.proxy_processing import results
+from src.proxy_processing.results import ResultBuffer
+from proxy_processing.models import ProxyModel
+
+###########################################################
+# tests write-behind buffer of check results
+# database writes are replaced with list
+###########################################################
+
+
+@pytest.fixture
+def written(monkeypatch) -> list[list[int]]:
+    """ids of every bulk update"""
+    writes: list[list[int]] = []
+
+    async def update_check_results(proxies: list[ProxyModel], throughput: bool = False) -> None:
+        writes.append([p.id for p in proxies])
+
+    monkeypatch.setattr(results.proxy_db, "update_check_results", update_check_results)
+    return writes
+
+
+def test_flush_by_size(written: list[list[int]]):
+    buffer: ResultBuffer = ResultBuffer(size=3, interval=10_000)
+
+    async def add() -> None:
+        buffer.bind(asyncio.get_running_loop())
+        for i in range(7):
+            await buffer.add(ProxyModel(id=i))
+
+    asyncio.run(add())
+
+    assert written == [[0, 1, 2], [3, 4, 5]]
+    assert len(buffer) == 1
+
+
+def test_flush_by_timer(written: list[list[int]]):
+    buffer: ResultBuffer = ResultBuffer(size=100, interval=10)
+
+    async def add() -> None:
+        buffer.bind(asyncio.get_running_loop())
+        await buffer.add(ProxyModel(id=1))
+        await buffer.add(ProxyModel(id=1))  # the same proxy is written once
+        await asyncio.sleep(0.05)
+
+    asyncio.run(add())
+
+    assert written == [[1]]
+
+
+def test_retry_and_close(monkeypatch):
+    calls: list[int] = []
+
+    async def update_check_results(proxies: list[ProxyModel], throughput: bool = False) -> None:
+        calls.append(len(proxies))
+        if len(calls) < 3:
+            raise ConnectionError("database is down")
+
+    monkeypatch.setattr(results.proxy_db, "update_check_results", update_check_results)
+    buffer: ResultBuffer = ResultBuffer(size=100, interval=10_000, retries=2, retry_delay=0)
+
+    async def add_and_close() -> None:
+        buffer.bind(asyncio.get_running_loop())
+        await buffer.add(ProxyModel(id=1))
+        await buffer.flush()
+
+        # both attempts failed, results are kept
+        assert len(buffer) == 1
+
+        await buffer.close()
+
+    asyncio.run(add_and_close())
+
+    assert calls == [1, 1, 1]
+    assert len(buffer) == 0
+
+
+def test_kept_results_are_retried_by_timer(monkeypatch):
+    calls: list[int] = []
+
+    async def update_check_results(proxies: list[ProxyModel], throughput: bool = False) -> None:
+        calls.append(len(proxies))
+        if len(calls) <= 2:
+            raise ConnectionError("database is down")
+
+    monkeypatch.setattr(results.proxy_db, "update_check_results", update_check_results)
+    buffer: ResultBuffer = ResultBuffer(size=100, interval=10, retries=2, retry_delay=0)
+
+    async def add() -> None:
+        buffer.bind(asyncio.get_running_loop())
+        await buffer.add(ProxyModel(id=1))
+        # the first timer flush fails twice, database is back for the next one
+        await asyncio.sleep(0.1)
+
+    asyncio.run(add())
+
+    assert calls == [1, 1, 1]
+    assert len(buffer) == 0
+
+def test_unbound_loop_writes_immediately(written: list[list[int]]):
+    buffer: ResultBuffer = ResultBuffer(size=100, interval=10_000)
+
+    async def add() -> None:
+        await buffer.add(ProxyModel(id=1))
+
+    # loop of run_until_complete is not running between tasks, so timer would never fire
+    asyncio.run(add())
+
+    assert written == [[1]]
+    assert len(buffer) == 0
+
+
+@pytest.fixture
+def progress(monkeypatch, fake_redis) -> list[tuple]:
+    """Calls of mark_finished and finish_run_if_done"""
+    calls: list[tuple] = []
+
+    async def mark_finished(_, status: str | None = None, amount: int = 1, run_id: int | None = None) -> None:
+        calls.append(("finished", run_id, status, amount))
+
+    async def finish_run_if_done(_, run_id: int) -> bool:
+        calls.append(("finish_run", run_id))
+        return False
+
+    monkeypatch.setattr(results, "get_async_conn", lambda: fake_redis)
+    monkeypatch.setattr(results, "mark_finished", mark_finished)
+    monkeypatch.setattr(results, "finish_run_if_done", finish_run_if_done)
+    return calls
+
+
+def test_finished_after_write(written: list[list[int]], progress: list[tuple]):
+    buffer: ResultBuffer = ResultBuffer(size=3, interval=10_000)
+
+    async def add() -> None:
+        buffer.bind(asyncio.get_running_loop())
+        await buffer.add(ProxyModel(id=1, status="alive"), tracked=True, run_id=7)
+        await buffer.add(ProxyModel(id=2, status="dead"), tracked=True, run_id=7)
+
+        # results are not written yet
+        assert progress == []
+
+        await buffer.add(ProxyModel(id=3, status="alive"), tracked=True, run_id=7)
+        # not tracked check is not counted
+        await buffer.add(ProxyModel(id=4, status="alive"))
+        await buffer.close()
+
+    asyncio.run(add())
+
+    assert written == [[1, 2, 3], [4]]
+    assert progress == [("finished", 7, "alive", 2), ("finished", 7, "dead", 1), ("finish_run", 7)]
+
+
+def test_not_finished_until_written(monkeypatch, progress: list[tuple]):
+    calls: list[int] = []
+
+    async def update_check_results(proxies: list[ProxyModel], throughput: bool = False) -> None:
+        calls.append(len(proxies))
+        if len(calls) == 1:
+            raise ConnectionError("database is down")
+
+    monkeypatch.setattr(results.proxy_db, "update_check_results", update_check_results)
+    buffer: ResultBuffer = ResultBuffer(size=100, interval=10_000, retries=1, retry_delay=0)
+
+    async def add() -> None:
+        buffer.bind(asyncio.get_running_loop())
+        await buffer.add(ProxyModel(id=1, status="dead"), tracked=True)
+        await buffer.flush()
+
+        assert progress == []
+
+        await buffer.close()
+
+    asyncio.run(add())
+
+    assert progress == [("finished", None, "dead", 1)]
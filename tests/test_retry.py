@@ -0,0 +1,88 @@
+import asyncio
+import aiohttp
+import pytest
+
+from src.proxy_processing.retry import Outcome, CheckFailed, RetryPolicy, classify_error
+
+################################################################
+# tests classification of check errors and retry policy
+# see proxy_processing.utils.on_timeout
+################################################################
+
+
+@pytest.mark.parametrize("error, expected", [
+    (asyncio.TimeoutError(), Outcome.timeout),
+    (ConnectionRefusedError(), Outcome.refused),
+    (ConnectionResetError(), Outcome.reset),
+    (asyncio.IncompleteReadError(b"", 2), Outcome.reset),
+    (OSError("Network is unreachable"), Outcome.refused),
+    (aiohttp.ServerDisconnectedError(), Outcome.reset),
+    (CheckFailed(Outcome.auth_failure), Outcome.auth_failure),
+    (ValueError(), Outcome.protocol_mismatch),
+])
+def test_classify_error(error: Exception, expected: Outcome):
+    assert classify_error(error) is expected
+
+
+def test_retry_only_transient():
+    policy: RetryPolicy = RetryPolicy(budget_min=10)
+
+    assert policy.should_retry(Outcome.timeout, 0, 2)
+    assert policy.should_retry(Outcome.reset, 0, 2)
+
+    assert not policy.should_retry(Outcome.refused, 0, 2)
+    assert not policy.should_retry(Outcome.auth_failure, 0, 2)
+    assert not policy.should_retry(Outcome.protocol_mismatch, 0, 2)
+
+    # last attempt
+    assert not policy.should_retry(Outcome.timeout, 1, 2)
+
+
+def test_retry_budget():
+    policy: RetryPolicy = RetryPolicy(budget_ratio=0.5, budget_min=1)
+
+    assert policy.should_retry(Outcome.timeout, 0, 2)
+    assert not policy.should_retry(Outcome.timeout, 0, 2)
+
+    # two started checks give one more retry
+    policy.on_check_started()
+    policy.on_check_started()
+    assert policy.should_retry(Outcome.timeout, 0, 2)
+    assert not policy.should_retry(Outcome.timeout, 0, 2)
+
+    policy.reset()
+    assert policy.should_retry(Outcome.timeout, 0, 2)
+
+
+def test_backoff():
+    policy: RetryPolicy = RetryPolicy(base_delay=0.1, max_delay=1)
+
+    for attempt in range(10):
+        assert 0 <= policy.backoff(attempt) <= min(1, 0.1 * 2 ** attempt)
+
+
+def test_batches_have_own_budget(monkeypatch):
+    # the same modules which checkers use
+    from proxy_processing import retry
+    from proxy_processing.utils import on_timeout
+
+    monkeypatch.setitem(retry.checker_config, "retry", {"base_delay": 0, "budget_ratio": 0, "budget_min": 1})
+    attempts: list[str] = []
+
+    @on_timeout(timeout=1, retries=2)
+    async def reset_by_proxy(batch: str) -> bool:
+        attempts.append(batch)
+        raise ConnectionResetError()
+
+    async def run_batch(batch: str) -> None:
+        with retry.retry_scope():
+            await asyncio.gather(*(reset_by_proxy(batch) for _ in range(3)), return_exceptions=True)
+
+    async def run_batches() -> None:
+        await asyncio.gather(run_batch("a"), run_batch("b"))
+
+    asyncio.run(run_batches())
+
+    # 3 first attempts and the only retry of the budget in every batch
+    assert attempts.count("a") == 4
+    assert attempts.count("b") == 4
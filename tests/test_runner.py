@@ -0,0 +1,42 @@
+import pytest
+
+from src.tasks.runner import parse_task, count_sockets
+
+###########################################################
+# tests conversion of celery task messages in checker runner
+###########################################################
+
+
+@pytest.mark.parametrize("name, args, kwargs, expected", [
+    ("tasks.tasks.process_proxy_worker", [1, "socks5"], {}, ([[1, "socks5"]], False, None)),
+    ("tasks.tasks.process_proxy_worker", [], {"proxy_id": 1, "protocol": None}, ([[1, None]], False, None)),
+    (
+        "tasks.tasks.process_proxies_batch_worker",
+        [[[1, "http"], [2, None]]],
+        {},
+        ([[1, "http"], [2, None]], True, None)
+    ),
+    (
+        "tasks.tasks.process_proxies_batch_worker",
+        [[[1, "1.2.3.4", "1080", "", "", ["socks5"], "socks5"]]],
+        {"run_id": 7},
+        ([[1, "1.2.3.4", "1080", "", "", ["socks5"], "socks5"]], True, 7)
+    ),
+])
+def test_parse_task(name: str, args: list, kwargs: dict, expected: tuple):
+    assert parse_task(name, args, kwargs) == expected
+
+
+@pytest.mark.parametrize("name, args", [
+    ("tasks.tasks.unknown", [1, None]),
+    ("tasks.tasks.process_proxy_worker", [1, "ftp"]),
+    ("tasks.tasks.process_proxies_batch_worker", [[[1, "1.2.3.4", "1080", "", "", [], "ftp"]]]),
+])
+def test_parse_task_invalid(name: str, args: list):
+    with pytest.raises(ValueError):
+        parse_task(name, args, {})
+
+
+def test_count_sockets():
+    sockets: int | None = count_sockets()
+    assert sockets is None or sockets >= 0
@@ -0,0 +1,29 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.proxy_processing import repository as proxy_db
+from src.proxy_processing.schemas import SAdvancedSearch
+
+############################################
+# tests sql of advanced search without database
+# complete searches are in test_advanced_search
+############################################
+
+
+def compile_search(**params) -> str:
+    query = proxy_db.build_search_query(SAdvancedSearch(**params))
+    return str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+@pytest.mark.parametrize("phase", ["connect_time", "handshake_time", "ttfb"])
+def test_phase_filter(phase: str):
+    assert f"proxy.{phase} <= 150.0" in compile_search(**{phase: 150})
+    assert f"proxy.{phase} <=" not in compile_search()
+
+
+@pytest.mark.parametrize("sort_desc, order", [(False, "ASC"), (True, "DESC")])
+def test_sort_by_phase(sort_desc: bool, order: str):
+    sql: str = compile_search(sort_by="ttfb", sort_desc=sort_desc)
+
+    # proxies without measured phase are the last ones, equal values are ordered by id
+    assert f"ORDER BY proxy.ttfb {order} NULLS LAST, proxy.id" in sql
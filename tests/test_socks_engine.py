@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from src.proxy_processing.socks_engine import (
+    Socks4CheckProtocol,
+    Socks5CheckProtocol,
+    SOCKS4_REQUEST_NO_ID,
+    SOCKS5_GREETING_NO_AUTH,
+    SOCKS5_GREETING_AUTH,
+    SOCKS5_CONNECT_REQUEST,
+    # the same classes which engine raises
+    CheckFailed,
+    Outcome,
+)
+
+###########################################################
+# tests socks state machines of protocol engine
+# replies are fed chunk by chunk without real connection
+###########################################################
+
+
+class FakeTransport:
+    def __init__(self):
+        self.written: list[bytes] = []
+        self.closed: bool = False
+
+    def write(self, data: bytes) -> None:
+        self.written.append(data)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def run_protocol(protocol_class, replies: list[bytes], **credentials):
+    loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+    try:
+        result: asyncio.Future = loop.create_future()
+        transport: FakeTransport = FakeTransport()
+
+        protocol = protocol_class(result, **credentials)
+        protocol.connection_made(transport)
+        for reply in replies:
+            protocol.data_received(reply)
+
+        if not result.done():
+            protocol.connection_lost(None)
+
+        return result, transport
+    finally:
+        loop.close()
+
+
+@pytest.mark.parametrize("reply, expected", [(b"\x00\x5a", True), (b"\x00\x5b", False)])
+def test_socks4(reply: bytes, expected: bool):
+    result, transport = run_protocol(Socks4CheckProtocol, [reply[:1], reply[1:] + b"\x00" * 6])
+
+    assert transport.written == [SOCKS4_REQUEST_NO_ID]
+    assert result.result() is expected
+    assert transport.closed
+
+
+def test_socks4_user_id():
+    _, transport = run_protocol(Socks4CheckProtocol, [b"\x00\x5a"], username="user", password="pass")
+
+    assert transport.written[0].endswith(b"user:pass\x00")
+
+
+def test_socks5_no_auth():
+    result, transport = run_protocol(Socks5CheckProtocol, [b"\x05\x00", b"\x05\x00\x00\x01"])
+
+    assert transport.written == [SOCKS5_GREETING_NO_AUTH, SOCKS5_CONNECT_REQUEST]
+    assert result.result() is True
+
+
+def test_socks5_auth():
+    # greeting and auth replies in one chunk
+    result, transport = run_protocol(
+        Socks5CheckProtocol,
+        [b"\x05\x02\x01\x00", b"\x05\x00"],
+        username="user",
+        password="pass"
+    )
+
+    assert transport.written == [SOCKS5_GREETING_AUTH, b"\x01\x04user\x04pass", SOCKS5_CONNECT_REQUEST]
+    assert result.result() is True
+
+
+@pytest.mark.parametrize("replies, outcome", [
+    ([b"\x05\xff"], Outcome.auth_failure),
+    ([b"\x05\x02", b"\x01\x01"], Outcome.auth_failure),
+    ([b"HTTP/1.1 400"], Outcome.protocol_mismatch),
+    ([b"\x05"], Outcome.protocol_mismatch),  # closed in the middle of reply
+])
+def test_socks5_failures(replies: list[bytes], outcome: Outcome):
+    result, _ = run_protocol(Socks5CheckProtocol, replies, username="user", password="pass")
+
+    with pytest.raises(CheckFailed) as e:
+        result.result()
+    assert e.value.outcome == outcome
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from src.proxy_processing import router
+# the same module which router uses
+from proxy_processing import stats
+from proxy_processing.stats import CheckerStats, STATS_KEY
+
+###########################################################
+# tests counters of check pipeline and /proxies/stats endpoints
+# redis is replaced with fake_redis
+###########################################################
+
+
+@pytest.fixture
+def redis_hashes(monkeypatch, fake_redis) -> dict[str, dict[str, str]]:
+    monkeypatch.setattr(stats, "get_async_conn", lambda: fake_redis)
+    return fake_redis.hashes
+
+
+def test_counters_of_workers_are_summed(redis_hashes: dict[str, dict[str, str]]):
+    workers: list[CheckerStats] = [CheckerStats(), CheckerStats()]
+
+    async def flush() -> None:
+        for worker_stats in workers:
+            worker_stats.incr("prefilter:checked", 2)
+            worker_stats.incr("prefilter:unreachable")
+            await worker_stats.flush()
+
+    asyncio.run(flush())
+
+    assert redis_hashes[STATS_KEY] == {"prefilter:checked": "4", "prefilter:unreachable": "2"}
+    # flushed counters are reset
+    assert all(w.snapshot() == {} for w in workers)
+
+
+def test_get_and_delete_stats_endpoints(redis_hashes: dict[str, dict[str, str]]):
+    redis_hashes[STATS_KEY] = {"prefilter:checked": "4", "prefilter:unreachable": "1", "dns:hits": "3"}
+
+    response: dict = asyncio.run(router.get_checker_stats())
+
+    assert response["status"] == 0
+    assert response["data"]["stats"] == {
+        "prefilter:checked": 4,
+        "prefilter:unreachable": 1,
+        "dns:hits": 3,
+        "prefilter:hit_rate": 0.25
+    }
+
+    assert asyncio.run(router.delete_checker_stats())["status"] == 0
+    assert asyncio.run(router.get_checker_stats())["data"]["stats"] == {}
@@ -0,0 +1,75 @@
+import pytest
+
+from src.proxy_processing.timeouts import LatencyHistogram, AdaptiveTimeout
+
+###########################################################
+# tests latency histogram and adaptive timeout of checker
+# see proxy_processing.utils.on_timeout
+###########################################################
+
+
+def test_histogram_quantile():
+    histogram: LatencyHistogram = LatencyHistogram()
+
+    assert histogram.quantile(0.99) is None
+
+    for latency in range(1, 1001):  # 1..1000 ms
+        histogram.add(latency)
+
+    # buckets are logarithmic, so result is upper bound of bucket (+12% at most with 20 buckets per decade)
+    assert 990 <= histogram.quantile(0.99) <= 990 * 1.13
+    assert 500 <= histogram.quantile(0.5) <= 500 * 1.13
+
+
+def test_histogram_window():
+    histogram: LatencyHistogram = LatencyHistogram(window=100)
+
+    for _ in range(150):
+        histogram.add(10)
+
+    assert histogram.count < 100
+
+
+def test_adaptive_timeout_default():
+    timeout: AdaptiveTimeout = AdaptiveTimeout(10, min_samples=100)
+
+    for _ in range(99):
+        timeout.observe(100)
+
+    # not enough latencies yet
+    assert timeout.initial() == 10
+
+    timeout.observe(100)
+    assert timeout.initial() < 10
+
+
+@pytest.mark.parametrize("latency, expected", [(5, 1), (1000, 2), (30_000, 10)])
+def test_adaptive_timeout_bounds(latency: float, expected: float):
+    timeout: AdaptiveTimeout = AdaptiveTimeout(10, factor=2, ceiling=10, min_samples=1, min_ratio=0.1)
+    timeout.observe(latency)
+
+    assert timeout.initial() == pytest.approx(expected, rel=0.13)
+
+
+def test_adaptive_timeout_next():
+    timeout: AdaptiveTimeout = AdaptiveTimeout(10, growth=2, ceiling=10)
+
+    # fast failure, the same timeout
+    assert timeout.next(2, 0.1) == 2
+
+    # timed out
+    assert timeout.next(2, 2) == 4
+    assert timeout.next(8, 8) == 10
+
+    # disabled adaptive timeout never grows
+    assert AdaptiveTimeout(10, enabled=False).next(2, 2) == 2
+
+
+def test_adaptive_timeout_min_ratio():
+    timeout: AdaptiveTimeout = AdaptiveTimeout(10, factor=2, min_samples=1, min_ratio=0.3)
+
+    # only fast proxies answered in time
+    for _ in range(1000):
+        timeout.observe(50)
+
+    assert timeout.initial() == 3
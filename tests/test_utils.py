@@ -1,7 +1,13 @@
+import asyncio
+import time
 from typing import Any
 import pytest
 from proxy_processing.models import ProxyModel
-from src.proxy_processing.utils import parse_proxy_dict_from_string
+from src.proxy_processing.utils import parse_proxy_dict_from_string, PhaseTimer, mark_phase, mark_and_measure_latency
+from src.base_utils import chunked
+# the same module which utils uses
+from proxy_processing import timeouts
+from proxy_processing.timeouts import AdaptiveTimeout
 
 ################################################
 # tests that convert function works as expected
@@ -21,3 +27,49 @@ def test_model_to_pydantic():
     assert proxy_model.socks5 is True
     assert proxy_model.ip == proxy_dict["ip"]
 
+
+@pytest.mark.parametrize("items, size, expected", [
+    (range(5), 2, [[0, 1], [2, 3], [4]]),
+    (range(4), 2, [[0, 1], [2, 3]]),
+    ([], 2, []),
+])
+def test_chunked(items, size: int, expected: list[list]):
+    assert list(chunked(items, size)) == expected
+
+
+def test_phase_timer():
+    timer: PhaseTimer = PhaseTimer()
+
+    time.sleep(0.01)
+    timer.mark("connect")
+    time.sleep(0.02)
+    timer.mark("handshake")
+
+    # every phase is measured from the previous mark (ms)
+    assert timer.phases["connect"] >= 10
+    assert timer.phases["handshake"] >= 20
+    assert timer.elapsed >= sum(timer.phases.values())
+
+
+def test_mark_phase(monkeypatch):
+    # latency of successful check is observed by adaptive timeout, global one is kept clean
+    adaptive_timeout: AdaptiveTimeout = AdaptiveTimeout(10)
+    monkeypatch.setitem(timeouts.adaptive_timeouts, "socks5", adaptive_timeout)
+
+    @mark_and_measure_latency("socks5")
+    async def check() -> bool:
+        await asyncio.sleep(0.01)
+        mark_phase("connect")
+        mark_phase("handshake")
+        return True
+
+    ok, protocol, latency, phases = asyncio.run(check())
+
+    assert ok and protocol == "socks5"
+    assert list(phases) == ["connect", "handshake"]
+    assert phases["connect"] >= 10
+    assert latency >= phases["connect"] + phases["handshake"]
+    assert adaptive_timeout.histogram.count == 1
+
+    # nothing is measured outside of check
+    mark_phase("connect")